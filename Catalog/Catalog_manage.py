@@ -1,40 +1,303 @@
-import json
-import threading
-import os
-import shutil
+import bisect
 import cherrypy
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Catalog.config_loader import RoomConfigLoader
+from Catalog.catalog_store import CatalogStore
+from Catalog.catalog_backends import make_backend
+from Catalog.response_cache import ResponseCache
+from Catalog.content_codec import negotiate, variant_etag, etag_match, encode
 
 # ==========================================
-# 第一部分：数据仓库 (CatalogStore)
-# 负责读写 catalog.json 文件
+# 第一部分：校验逻辑 (单条注册和 _bulk 批量注册共用)
+# 返回错误信息字符串，校验通过返回 None
 # ==========================================
-class CatalogStore:
-    def __init__(self, path):
-        self.path = path
-        self.lock = threading.RLock()
-        self.catalog = {} 
-
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                self.catalog = json.load(f)
+def validate_device(obj):
+    if not isinstance(obj, dict):
+        return "Device must be a JSON object"
+    if "id" not in obj:
+        return "Missing required field: id"
+    # /api/devices/_bulk, _query, _changes 等接口占用了 "_" 开头的路径
+    if str(obj["id"]).startswith("_"):
+        return "Device id must not start with '_'"
+
+    required_keys = ["type", "resources", "mqtt_topics", "location"]
+    for key in required_keys:
+        if key not in obj:
+            return f"Missing required field: {key}"
+
+    loc = obj.get("location", {})
+    required_loc_keys = ["campus", "building", "floor", "room"]
+    for key in required_loc_keys:
+        if key not in loc:
+            return f"Missing location info: {key}"
+
+    # 可选: ttl (秒)，超过 ttl 没有心跳的设备会被自动删除
+    ttl = obj.get("ttl")
+    if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0):
+        return "ttl must be a positive number of seconds"
+    return None
+
+
+def validate_user(obj):
+    if not isinstance(obj, dict):
+        return "User must be a JSON object"
+    if "id" not in obj:
+        return "Missing required field: id"
+
+    required_keys = ["name", "role"]
+    for key in required_keys:
+        if key not in obj:
+            return f"Missing required field: {key}"
+    return None
+
+
+def validate_service(obj):
+    if not isinstance(obj, dict):
+        return "Service must be a JSON object"
+    for key in ["id", "service_type", "endpoint"]:
+        if key not in obj:
+            return f"Missing required field: {key}"
+    return None
+
+
+def register_one(store, collection, label, obj, validator):
+    """单条注册的公共实现：校验失败抛 400，成功返回 id。"""
+    error = validator(obj)
+    if error:
+        raise cherrypy.HTTPError(400, error)
+
+    target_id = str(obj["id"])
+    if store.put(collection, obj):
+        print(f"[{label}] Register new: {target_id}")
+    else:
+        print(f"[{label}] Update existing: {target_id}")
+    return target_id
+
+
+def apply_bulk(store, collection, label, items, validator):
+    """
+    POST .../_bulk 的公共实现，返回 (HTTP 状态码, 响应体)：
+    - 先校验全部条目，只要有一条不合法就整体拒绝 (400)，不写入任何数据
+    - 全部合法时一次性写入 (只产生一次持久化)，返回每条的结果
+    """
+    if not isinstance(items, list):
+        raise cherrypy.HTTPError(400, "Bulk body must be a JSON array")
+
+    errors = []
+    for i, obj in enumerate(items):
+        error = validator(obj)
+        if error:
+            item_id = obj.get("id") if isinstance(obj, dict) else None
+            errors.append({"index": i, "id": item_id, "status": "invalid", "error": error})
+
+    if errors:
+        return 400, {"message": "Rejected, nothing was registered", "results": errors}
+
+    created_flags = store.put_many(collection, items)
+    results = []
+    for i, (obj, created) in enumerate(zip(items, created_flags)):
+        results.append({"index": i, "id": str(obj["id"]), "status": "created" if created else "updated"})
+
+    print(f"[{label}] Bulk registered {len(items)} items "
+          f"({sum(created_flags)} new, {len(items) - sum(created_flags)} updated)")
+    return 201, {"message": "Registered", "count": len(items), "results": results}
+
+
+def bulk_register(store, collection, label, items, validator):
+    status, body = apply_bulk(store, collection, label, items, validator)
+    cherrypy.response.status = status
+    return body
+
+
+# 长轮询最长等待时间。每个等待中的请求会占用一个 CherryPy 工作线程，
+# 所以 run() 里把线程池调大了。
+MAX_LONG_POLL_SECONDS = 30
+
+
+def parse_changes_params(since=None, epoch=None, timeout="0", **params):
+    """GET /api/devices/_changes 的参数 -> (since, epoch, timeout)，timeout 截断到 MAX_LONG_POLL_SECONDS。"""
+    try:
+        since = int(since) if since is not None else None
+        timeout = min(max(float(timeout), 0.0), MAX_LONG_POLL_SECONDS)
+    except ValueError:
+        raise cherrypy.HTTPError(400, "since must be an integer and timeout a number")
+    return since, epoch, timeout
+
+
+def check_etag(store, collection, etag=None):
+    """
+    如果客户端带的 If-None-Match 与当前版本一致，直接回 304 Not Modified，
+    不再序列化整个列表；否则返回这个版本的 ETag，交给 cached_json_response 加上编码后缀。
+    etag 不给时使用 collection 的版本 (store.etag)。
+    JSON / MessagePack、gzip / 不压缩是不同的表示，ETag 各不相同。
+    """
+    etag = etag or store.etag(collection)
+    matched = etag_match(cherrypy.request.headers.get("If-None-Match"), etag, request_variant())
+    if matched:
+        cherrypy.response.headers["ETag"] = matched
+        raise cherrypy.HTTPRedirect([], 304)
+    return etag
+
+
+def request_variant():
+    """按请求的 Accept / Accept-Encoding 选择响应的编码 (见 content_codec)。"""
+    headers = cherrypy.request.headers
+    return negotiate(headers.get("Accept"), headers.get("Accept-Encoding"))
+
+
+def send_encoded(encoded):
+    body, headers = encoded
+    cherrypy.response.headers.update(headers)
+    return body
+
+
+def json_response(obj):
+    # 默认是 JSON；客户端要求时返回 MessagePack / gzip
+    return send_encoded(encode(obj, request_variant()))
+
+
+def cached_json_response(store, cache, collection, params, build, revision=None, etag=None):
+    """
+    GET 查询走响应缓存：同一个 (path, query, 编码) 在集合没有被写入之前
+    直接返回上次编码好的 bytes，不再重复做 JSON 编码 / gzip 压缩。
+    先读版本号再生成数据，所以缓存里的内容只会比版本号新，不会更旧。
+    给了 etag (check_etag 的返回值) 时按实际使用的编码加上 ETag 响应头。
+    """
+    if revision is None:
+        revision = store.collection_revision(collection)
+    # path_info 是相对于挂载点的，要加上 script_name 才能区分 /api/devices 和 /api/services
+    variant = request_variant()
+    key = cache.make_key(cherrypy.request.script_name + cherrypy.request.path_info, params) + (variant,)
+    body, headers = cache.get_or_build(key, revision, lambda: encode(build(), variant))
+    if etag:
+        cherrypy.response.headers["ETag"] = variant_etag(etag, variant, headers)
+    return send_encoded((body, headers))
+
+
+# 分页时单页最多返回的记录数 (limit 超过时按这个值截断)
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(params):
+    """fields=id,type,location.room -> ["id", "type", "location.room"]，没有给返回 None。"""
+    fields = params.get("fields")
+    if not fields:
+        return None
+    if isinstance(fields, str):
+        fields = [fields]
+    # ?fields=a,b 和 ?fields=a&fields=b 都支持
+    return [f.strip() for value in fields for f in value.split(",") if f.strip()]
+
+
+def project(doc, fields):
+    """只保留 fields 里列出的字段，用 . 表示嵌套字段 (location.room)。不存在的字段直接忽略。"""
+    out = {}
+    for path in fields:
+        parts = path.split(".")
+        value = doc
+        for part in parts:
+            if not isinstance(value, dict) or part not in value:
+                break
+            value = value[part]
         else:
-            self.catalog = {
-                "project_info": {},
-                "system_settings": {},
-                "devices": [], 
-                "users": [],  
-                "services": [] 
-            }
+            target = out
+            for part in parts[:-1]:
+                target = target.setdefault(part, {})
+            target[parts[-1]] = value
+    return out
+
+
+def shape_listing(items, params):
+    """
+    列表查询的公共后处理 (DevicesAPI / UsersAPI)：
+    - fields=...           字段投影，只返回客户端需要的字段
+    - limit=N&cursor=<id>  按 id 排序分页，返回 {"items": [...], "next_cursor": <id 或 null>}，
+                           next_cursor 原样带到下一次请求；它是上一页最后一条的 id，
+                           翻页期间有注册或删除也不会重复或漏掉其他记录
+    没有 limit / cursor 时保持原来的返回格式 (按注册顺序的完整列表)。
+    items 没有现成的排序索引 (例如 users 按 name / role 过滤的结果)，翻页时每次排序；
+    能用索引的请求走 paginate()。
+    """
+    if not is_paginated(params):
+        fields = parse_fields(params)
+        return [project(item, fields) for item in items] if fields else items
+
+    by_id = {str(item.get("id")): item for item in items}
+    return paginate(by_id, sorted(by_id), params)
+
+
+def is_paginated(params):
+    return "limit" in params or "cursor" in params
+
+
+def paginate(by_id, sorted_ids, params):
+    """
+    按 id 分页：by_id 是 id -> 记录，sorted_ids 是排好序的 id 列表 (CatalogStore.sorted_listing 每个版本只排序一次)。
+    用 bisect 定位 cursor，只取出这一页，每页 O(log n + limit)。
+    """
+    fields = parse_fields(params)
+    try:
+        limit = int(params.get("limit", MAX_PAGE_SIZE))
+    except (TypeError, ValueError):
+        raise cherrypy.HTTPError(400, "limit must be an integer")
+    if limit <= 0:
+        raise cherrypy.HTTPError(400, "limit must be positive")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    start = 0
+    cursor = params.get("cursor")
+    if cursor is not None and not isinstance(cursor, str):
+        raise cherrypy.HTTPError(400, "cursor must be a single value")
+    if cursor:
+        start = bisect.bisect_right(sorted_ids, cursor)
+
+    page = [by_id[item_id] for item_id in sorted_ids[start:start + limit]]
+    has_more = start + limit < len(sorted_ids)
+    return {
+        "items": [project(item, fields) for item in page] if fields else page,
+        "next_cursor": str(page[-1].get("id")) if has_more else None,
+    }
+
+
+# POST /api/devices/_query 的过滤字段，每个都是一组可选值 (IN 语义)
+DEVICE_QUERY_KEYS = ("ids", "rooms", "types", "roles")
+
+
+def device_batch_query(store, obj):
+    """
+    POST /api/devices/_query 的公共实现：
+      {"rooms": [...], "types": [...], "roles": [...], "ids": [...], "fields": "id,mqtt_topics"}
+    没给 (或 null) 的字段不过滤，字段之间是 AND。
+    返回 {"revision", "count", "rooms": {room_id: [device, ...]}}，
+    请求里列出的房间即使没有匹配的设备也会出现 (空列表)。
+    """
+    if not isinstance(obj, dict):
+        raise cherrypy.HTTPError(400, "Query must be a JSON object")
+    unknown = set(obj) - set(DEVICE_QUERY_KEYS) - {"fields"}
+    if unknown:
+        raise cherrypy.HTTPError(400, f"Unknown query field(s): {', '.join(sorted(unknown))}")
+
+    filters = {}
+    for key in DEVICE_QUERY_KEYS:
+        values = obj.get(key)
+        if isinstance(values, str):
+            values = [values]
+        if values is not None and (not isinstance(values, list) or not all(isinstance(v, str) for v in values)):
+            raise cherrypy.HTTPError(400, f"{key} must be a list of strings")
+        filters[key] = values
+    fields = parse_fields(obj)
+
+    # 先读版本号再查询，结果只会比 revision 新
+    revision = store.collection_revision("devices")
+    devices = store.query_devices(**filters)
+
+    grouped = {room: [] for room in filters["rooms"] or ()}
+    for dev in devices:
+        room = dev.get("location", {}).get("room")
+        grouped.setdefault(room, []).append(project(dev, fields) if fields else dev)
+    return {"revision": revision, "count": len(devices), "rooms": grouped}
 
-    def save(self):
-        with self.lock:
-            tmp = self.path + ".tmp"
-            with open(tmp, "w", encoding="utf-8") as f:
-                json.dump(self.catalog, f, indent=2, ensure_ascii=False)
-            shutil.move(tmp, self.path)
 
 # ==========================================
 # 第二部分：API 接口 (Devices)
@@ -42,82 +305,83 @@ class CatalogStore:
 # ==========================================
 class DevicesAPI:
     exposed = True
-    def __init__(self, store: CatalogStore):
+    def __init__(self, store: CatalogStore, cache: ResponseCache = None):
         self.store = store
+        self.cache = cache if cache is not None else ResponseCache()
 
-    @cherrypy.tools.json_out()
     def GET(self, *uri, **params):
-        with self.store.lock:
-            original_list = self.store.catalog.get("devices", [])
-            devices_list = original_list[:] 
+        # GET /api/devices/_changes?since=<rev>&epoch=<epoch>&timeout=<s> : 增量变更 (长轮询)
+        if len(uri) > 0 and uri[0] == "_changes":
+            return json_response(self._changes(**params))
 
+        etag = check_etag(self.store, "devices")
+        return cached_json_response(self.store, self.cache, "devices", params,
+                                    lambda: self._query(uri, params), etag=etag)
 
+    def _query(self, uri, params):
         if len(uri) > 0:
-            device_id = uri[0]
-            for item in devices_list:
-                if item['id'] == device_id:
-                    return item
+            device = self.store.get("devices", uri[0])
+            if device is None:
+                raise cherrypy.HTTPError(404, "Device not found")
+            fields = parse_fields(params)
+            return project(device, fields) if fields else device
+
+        # 走 CatalogStore 的 id / room / type 索引，不再线性扫描
+        if is_paginated(params) and params.get('id') is None:
+            # 翻页直接用索引桶的排序 id 列表，不取出整个结果
+            listing = self.store.sorted_listing("devices", room=params.get('room'), device_type=params.get('type'))
+            if listing is not None:
+                return paginate(*listing, params)
+        devices = self.store.find_devices(
+            device_id=params.get('id'),
+            room=params.get('room'),
+            device_type=params.get('type'),
+        )
+        return shape_listing(devices, params)
+
+    def _changes(self, **params):
+        since, epoch, timeout = parse_changes_params(**params)
+        return self.store.changes_since(since, epoch=epoch, collection="devices", timeout=timeout)
 
-            raise cherrypy.HTTPError(404, "Device not found")
-    
-        if not params:
-            return devices_list
+    @cherrypy.tools.json_out()
+    def PUT(self, *uri, **params):
+        # PUT /api/devices/{id}/heartbeat : 只续期租约，不重写设备记录
+        if len(uri) == 2 and uri[1] == "heartbeat":
+            lease = self.store.heartbeat(uri[0])
+            if lease is None:
+                raise cherrypy.HTTPError(404, "Device not found, please register again")
+            return lease
 
-        filtered_results = []
-        for dev in devices_list:
-            match = True
-            
-            if 'id' in params and dev['id'] != params['id']:
-                match = False
+        raise cherrypy.HTTPError(404, "Unknown device operation")
 
-            if 'room' in params:
-                if dev.get('location', {}).get('room') != params['room']:
-                    match = False
-            
-            if 'type' in params and dev.get('type') != params['type']:
-                match = False
-            
-            if match:
-                filtered_results.append(dev)
+    @cherrypy.tools.json_out()
+    def DELETE(self, *uri, **params):
+        if len(uri) == 0:
+            raise cherrypy.HTTPError(400, "Missing device id")
 
-        return filtered_results
+        removed = self.store.remove("devices", uri[0])
+        if removed is None:
+            raise cherrypy.HTTPError(404, "Device not found")
+
+        print(f"[Device] Removed: {uri[0]}")
+        return {"message": "Removed", "id": str(uri[0])}
 
     @cherrypy.tools.json_in()
     @cherrypy.tools.json_out()
     def POST(self, *uri, **params):
         obj = cherrypy.request.json
-        
-        # --- 校验逻辑 ---
-        if "id" not in obj:
-            raise cherrypy.HTTPError(400, "Missing required field: id")
-
-        required_keys = ["type", "resources", "mqtt_topics", "location"]
-        for key in required_keys:
-            if key not in obj:
-                raise cherrypy.HTTPError(400, f"Missing required field: {key}")
-
-        loc = obj.get("location", {}) 
-        required_loc_keys = ["campus", "building", "floor", "room"]
-        for key in required_loc_keys:
-            if key not in loc:
-                raise cherrypy.HTTPError(400, f"Missing location info: {key}")
-
-        # --- 写入逻辑 ---
-        with self.store.lock:
-            data_list = self.store.catalog.setdefault("devices", [])
-            target_id = str(obj["id"])
-
-            for i, item in enumerate(data_list):
-                if str(item.get("id")) == target_id:
-                    print(f"[Device] Update existing: {target_id}")
-                    data_list[i] = obj
-                    break
-            else:
-                print(f"[Device] Register new: {target_id}")
-                data_list.append(obj)
-            
-            self.store.save()
-        
+
+        # POST /api/devices/_bulk : 一次注册一组设备
+        if len(uri) > 0 and uri[0] == "_bulk":
+            return bulk_register(self.store, "devices", "Device", obj, validate_device)
+
+        # POST /api/devices/_query : 多个房间 / 类型 / role / id 的批量查询，按房间分组返回
+        if len(uri) > 0 and uri[0] == "_query":
+            return device_batch_query(self.store, obj)
+
+        # --- 校验 + 写入 ---
+        target_id = register_one(self.store, "devices", "Device", obj, validate_device)
+
         cherrypy.response.status = 201
         return {"message": "Registered", "id": target_id}
 
@@ -127,23 +391,26 @@ class DevicesAPI:
 # ==========================================
 class UsersAPI:
     exposed = True
-    def __init__(self, store: CatalogStore):
+    def __init__(self, store: CatalogStore, cache: ResponseCache = None):
         self.store = store
+        self.cache = cache if cache is not None else ResponseCache()
 
-    @cherrypy.tools.json_out()
     def GET(self, *uri, **params):
-        with self.store.lock:
-            original_list = self.store.catalog.get("users", [])
-            user_list = original_list[:]
+        etag = check_etag(self.store, "users")
+        return cached_json_response(self.store, self.cache, "users", params,
+                                    lambda: self._query(uri, params), etag=etag)
 
+    def _query(self, uri, params):
         if len(uri) > 0:
-            user_id = uri[0]
-            for u in user_list:
-                if str(u.get("id")) == str(user_id):
-                    return u
-                
-            raise cherrypy.HTTPError(404, "User not found")
-        
+            user = self.store.get("users", uri[0])
+            if user is None:
+                raise cherrypy.HTTPError(404, "User not found")
+            fields = parse_fields(params)
+            return project(user, fields) if fields else user
+
+        if is_paginated(params) and 'name' not in params and 'role' not in params:
+            return paginate(*self.store.sorted_listing("users"), params)
+        user_list = self.store.list("users")
         if not params:
             return user_list
         filtered_results = []
@@ -158,37 +425,19 @@ class UsersAPI:
             if match:
                 filtered_results.append(user)
 
-        return filtered_results
+        return shape_listing(filtered_results, params)
 
 
     @cherrypy.tools.json_in()
     @cherrypy.tools.json_out()
     def POST(self, *uri, **params):
         obj = cherrypy.request.json
-        
-        if "id" not in obj:
-            raise cherrypy.HTTPError(400, "Missing required field: id")
-
-        required_keys = ["name", "role"]
-        for key in required_keys:
-            if key not in obj:
-                raise cherrypy.HTTPError(400, f"Missing required field: {key}")
-
-        with self.store.lock:
-            data_list = self.store.catalog.setdefault("users", [])
-            target_id = str(obj["id"])
-
-            for i, item in enumerate(data_list):
-                if str(item.get("id")) == target_id:
-                    print(f"[User] Update existing: {target_id}") # 修正了日志文字
-                    data_list[i] = obj
-                    break
-            else:
-                print(f"[User] Register new: {target_id}") # 修正了日志文字
-                data_list.append(obj)
-            
-            self.store.save()
-        
+
+        if len(uri) > 0 and uri[0] == "_bulk":
+            return bulk_register(self.store, "users", "User", obj, validate_user)
+
+        register_one(self.store, "users", "User", obj, validate_user)
+
         cherrypy.response.status = 201
     
 # ==========================================
@@ -197,12 +446,24 @@ class UsersAPI:
 # ==========================================
 class ServicesAPI:
     exposed = True
-    def __init__(self, store: CatalogStore, config_loader):
+    def __init__(self, store: CatalogStore, config_loader, cache: ResponseCache = None):
         self.store = store
         self.config_loader = config_loader
+        self.cache = cache if cache is not None else ResponseCache()
         
-    @cherrypy.tools.json_out()
     def GET(self, *uri, **params):
+        etag = check_etag(self.store, "services", self.etag())
+        return cached_json_response(self.store, self.cache, "services", params,
+                                    lambda: self._query(uri, params), self.revision(), etag)
+
+    # 静态服务来自配置文件 (会热加载)，所以版本 = (配置文件版本, 已注册 services 的版本)
+    def revision(self):
+        return self.config_loader.version, self.store.collection_revision("services")
+
+    def etag(self):
+        return f'"{self.store.epoch}-{self.store.collection_revision("services")}-{self.config_loader.version:x}"'
+
+    def _query(self, uri, params):
         broker_info = self.config_loader.get_broker_info() 
         catalog_info = self.config_loader.get_catalog_info()
         
@@ -225,21 +486,16 @@ class ServicesAPI:
             }
         ]
 
-        with self.store.lock:
-            
-            registered_services = self.store.catalog.get("services", [])[:]
-
-        
         if len(uri) > 0:
             target_id = uri[0]
             for s in static_services:
                 if str(s['id']) == str(target_id): return s
-            for s in registered_services:
-                if str(s['id']) == str(target_id): return s
+            registered = self.store.get("services", target_id)
+            if registered is not None:
+                return registered
             raise cherrypy.HTTPError(404, "Service not found")
 
-      
-        return static_services + registered_services
+        return static_services + self.store.list("services")
     
     
     @cherrypy.tools.json_in()
@@ -247,46 +503,74 @@ class ServicesAPI:
     def POST(self, *uri, **params):
         obj = cherrypy.request.json
 
-        if "id" not in obj:
-            raise cherrypy.HTTPError(400, "Missing required field: id")
-        if "service_type" not in obj:
-            raise cherrypy.HTTPError(400, "Missing required field: service_type")
-        if "endpoint" not in obj:
-            raise cherrypy.HTTPError(400, "Missing required field: endpoint")
-        
-        with self.store.lock:
-            data_list = self.store.catalog.setdefault("services", [])
-            target_id = str(obj["id"])
-
-            for i, item in enumerate(data_list):
-                if str(item.get("id")) == target_id:
-                    print(f"[Service] Update existing: {target_id}")
-                    data_list[i] = obj
-                    break
-            else:
-                print(f"[Service] Register new: {target_id}")
-                data_list.append(obj)
-            
-            self.store.save()
+        if len(uri) > 0 and uri[0] == "_bulk":
+            return bulk_register(self.store, "services", "Service", obj, validate_service)
+
+        target_id = register_one(self.store, "services", "Service", obj, validate_service)
 
         cherrypy.response.status = 201
         return {"message": "Registered", "id": target_id}
 
 # ==========================================
-# 第四部分：服务器启动与路由挂载
+# 运行状态 (/api/stats)
 # ==========================================
-def run(host="0.0.0.0", port=8080):
+class StatsAPI:
+    exposed = True
+    def __init__(self, store: CatalogStore, cache: ResponseCache):
+        self.store = store
+        self.cache = cache
 
+    @cherrypy.tools.json_out()
+    def GET(self, *uri, **params):
+        return self.stats()
+
+    def stats(self):
+        return {
+            "revision": self.store.revision,
+            "response_cache": self.cache.stats(),
+            "leases": {
+                "active": self.store.lease_count(),
+                "expired": self.store.expired_count,
+            },
+        }
+
+# ==========================================
+# topic 路由表 (/api/topics)
+# GET /api/topics?room=&type=&role=&resource= : topic 路由表
+# 订阅方直接拿到 topic -> (room, type, role, index, resource, device)，
+# 不用再下载设备文档、按 id 后缀 (_sensor_1 / _actuator_1) 自己匹配。
+# 返回的 revision 可以直接作为 /api/devices/_changes 的 since；ETag 跟随 devices 集合。
+# ==========================================
+class TopicsAPI:
+    exposed = True
+    def __init__(self, store: CatalogStore, cache: ResponseCache = None):
+        self.store = store
+        self.cache = cache if cache is not None else ResponseCache()
+
+    def GET(self, *uri, **params):
+        etag = check_etag(self.store, "devices")
+        return cached_json_response(self.store, self.cache, "devices", params,
+                                    lambda: self._query(uri, params), etag=etag)
+
+    def _query(self, uri, params):
+        revision, table = self.store.topic_routes(
+            room=params.get("room"),
+            device_type=params.get("type"),
+            role=params.get("role"),
+            resource=params.get("resource"),
+        )
+        return {"epoch": self.store.epoch, "revision": revision, "topics": table}
+
+# ==========================================
+# 第四部分：服务器启动与路由挂载
+# ==========================================
+def open_catalog(path=None, config_filename="setting_config.json"):
+    """读取系统配置并打开 CatalogStore，两种服务器模式共用。返回 (loader, store, catalog_info)。"""
     current_dir = os.path.dirname(os.path.abspath(__file__))
-    path = os.path.join(current_dir, "catalog_script.json")
-    
-    config_filename = "setting_config.json"
-    
+    if path is None:
+        path = os.path.join(current_dir, "catalog_script.json")
+
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    
-    store = CatalogStore(path)
-    
-    loader = None 
 
     loader = None  # <12.27修改，因在运行OccupancyAnalyzer时找不到loader：在 try 之前先定义它，哪怕是空的
     try:
@@ -298,29 +582,93 @@ def run(host="0.0.0.0", port=8080):
         print(f"[!] Warning: Failed to load settings ({e}).")
         print("[!] ServicesAPI will NOT be mounted because config is missing.")
 
+    # 持久化模式: "snapshot" (每次写入重写整个文件)、"wal" (追加日志 + 后台合并)
+    # 或 "sqlite" (SQLite WAL 模式，第一次启动时自动导入 catalog_script.json)
+    catalog_info = loader.get_catalog_info() if loader else {}
+    persistence = catalog_info.get("persistence", "snapshot")
+    sqlite_path = catalog_info.get("sqlite_path")
+    if sqlite_path and not os.path.isabs(sqlite_path):
+        sqlite_path = os.path.join(current_dir, sqlite_path)
+    store = CatalogStore(path, backend=make_backend(persistence, path, sqlite_path))
+    print(f"[*] Catalog persistence mode: {persistence}")
+    return loader, store, catalog_info
+
+
+def run(host="0.0.0.0", port=8080, server=None, catalog_path=None):
+    """
+    server: "cherrypy" (默认) 或 "asyncio"，不给时读 catalog_config.server。
+    两种模式提供完全相同的 REST 接口。
+    """
+    loader, store, catalog_info = open_catalog(catalog_path)
+    server = server or catalog_info.get("server", "cherrypy")
+
+    # replica.enabled = true 时定期写快照文件，供只读副本进程 (catalog_replica.py) 使用。
+    # 默认关闭：没有副本时不需要每次写入后都把整个 catalog 序列化一遍
+    replica = catalog_info.get("replica") or {}
+    publisher = None
+    if replica.get("enabled", False):
+        from Catalog.catalog_replica import SnapshotPublisher
+        snapshot_path = replica.get("snapshot_path", "catalog_snapshot.bin")
+        if not os.path.isabs(snapshot_path):
+            snapshot_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), snapshot_path)
+        publisher = SnapshotPublisher(store, snapshot_path, replica.get("publish_interval", 0.5)).start()
+        print(f"[*] Publishing replica snapshots to {snapshot_path}")
+
+    if server == "asyncio":
+        from Catalog.catalog_async import serve
+        try:
+            serve(store, loader, host, port)
+        finally:
+            if publisher:
+                publisher.close()
+        return
+    if server != "cherrypy":
+        raise ValueError(f"Unknown server mode: {server}")
+
     conf = {
         '/': {
             'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
-            'tools.sessions.on': True,
+            # 接口是无状态的，不需要 session (否则每个请求都要读写一次 session 并加锁)
+            'tools.sessions.on': False,
         }
     }
 
-    cherrypy.tree.mount(DevicesAPI(store), '/api/devices', config=conf)
-    cherrypy.tree.mount(UsersAPI(store),   '/api/users',   config=conf)
+    # 所有 GET 接口共用一个响应缓存
+    cache = ResponseCache()
+
+    cherrypy.tree.mount(DevicesAPI(store, cache), '/api/devices', config=conf)
+    cherrypy.tree.mount(UsersAPI(store, cache),   '/api/users',   config=conf)
+    cherrypy.tree.mount(StatsAPI(store, cache),   '/api/stats',   config=conf)
+    cherrypy.tree.mount(TopicsAPI(store, cache),  '/api/topics',  config=conf)
     
     if loader:
-        cherrypy.tree.mount(ServicesAPI(store, loader), '/api/services', config=conf)
+        cherrypy.tree.mount(ServicesAPI(store, loader, cache), '/api/services', config=conf)
     else:
         print("[!] SKIP: /api/services not mounted due to config error.")
 
     cherrypy.config.update({
         'server.socket_host': host,
         'server.socket_port': port,
+        # /api/devices/_changes 的长轮询会占住线程，默认的 10 个不够用
+        'server.thread_pool': 30,
     })
 
+    # 退出时把剩余的 WAL 合并进 catalog_script.json
+    if publisher:
+        cherrypy.engine.subscribe('stop', publisher.close)
+    cherrypy.engine.subscribe('stop', store.close)
+
     print(f"[*] Catalog Server started at http://{host}:{port}")
     cherrypy.engine.start()
     cherrypy.engine.block()
 
 if __name__ == '__main__':
-    run()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Smart campus Catalog REST server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--server", choices=["cherrypy", "asyncio"], default=None,
+                        help="HTTP front end (default: catalog_config.server)")
+    args = parser.parse_args()
+    run(args.host, args.port, args.server)
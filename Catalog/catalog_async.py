@@ -0,0 +1,277 @@
+import asyncio
+import functools
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import cherrypy
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Catalog.catalog_store import CatalogStore
+from Catalog.response_cache import ResponseCache
+from Catalog.content_codec import negotiate, variant_etag, etag_match, encode
+from Catalog.Catalog_manage import (
+    DevicesAPI, UsersAPI, ServicesAPI, StatsAPI, TopicsAPI,
+    validate_device, validate_user, validate_service,
+    register_one, apply_bulk, parse_changes_params, device_batch_query,
+)
+
+# ==========================================
+# asyncio 前端 (catalog_config.server = "asyncio")
+#
+# 用标准库 asyncio 实现一个最小的 HTTP/1.1 服务器 (keep-alive, Content-Length)，
+# 提供和 CherryPy 版本完全相同的 /api/devices, /api/users, /api/services, /api/stats, /api/topics。
+# 查询逻辑、校验、分页、ETag、响应缓存都直接复用 Catalog_manage 里的实现。
+#
+# - 读请求: CatalogStore 的读是无锁的，直接在事件循环里执行
+# - 写请求: 可能有磁盘 I/O (snapshot / sqlite)，放到线程池执行，不阻塞事件循环
+# - 需要 store.lock 的调用 (心跳、变更日志) 也放到线程池：写线程落盘时一直持有这把锁
+# - 长轮询 /api/devices/_changes: 不占线程，等待 asyncio.Event (store 写入时通过回调唤醒)
+# ==========================================
+REASONS = {
+    200: "OK", 201: "Created", 304: "Not Modified", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway",
+}
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+def _params(query):
+    # 和 CherryPy 一样: 重复的 key 变成列表，其余是字符串
+    return {k: v[0] if len(v) == 1 else v for k, v in parse_qs(query, keep_blank_values=True).items()}
+
+
+def _encode(obj):
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+class AsyncCatalogServer:
+    def __init__(self, store: CatalogStore, config_loader=None, cache: ResponseCache = None, write_workers=4):
+        self.store = store
+        self.cache = cache if cache is not None else ResponseCache()
+        self.devices = DevicesAPI(store, self.cache)
+        self.users = UsersAPI(store, self.cache)
+        self.services = ServicesAPI(store, config_loader, self.cache) if config_loader else None
+        self.stats = StatsAPI(store, self.cache)
+        self.topics = TopicsAPI(store, self.cache)
+        self.writer_pool = ThreadPoolExecutor(max_workers=write_workers, thread_name_prefix="catalog-write")
+
+        self.loop = None
+        self.server = None
+        self._changed = None
+
+    async def start(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.store.add_listener(self._on_store_change)
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server
+
+    # ------------------------------------------
+    # 变更通知: 写线程 -> 事件循环
+    # ------------------------------------------
+    def _on_store_change(self, revision):
+        # 在写线程里调用 (持有 store.lock)。事件循环已经关闭时直接忽略，不能让写入失败
+        if self.loop.is_closed():
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._wake_pollers)
+        except RuntimeError:
+            pass
+
+    def _wake_pollers(self):
+        # 唤醒所有正在等待的长轮询，之后的等待使用新的 Event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    # ------------------------------------------
+    # HTTP 连接处理
+    # ------------------------------------------
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._send(writer, 413, _encode({"status": 413, "message": "Body too large"}), {}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version != "HTTP/1.0"
+                status, payload, extra = await self._dispatch(method, target, headers, body)
+                await self._send(writer, status, payload, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _send(self, writer, status, payload, extra, keep_alive):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}"]
+        if status != 304 and "Content-Type" not in extra:
+            lines.append("Content-Type: application/json; charset=utf-8")
+        lines.append(f"Content-Length: {len(payload)}")
+        for name, value in extra.items():
+            lines.append(f"{name}: {value}")
+        lines.append("Connection: keep-alive" if keep_alive else "Connection: close")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _dispatch(self, method, target, headers, body):
+        """返回 (状态码, 响应体 bytes, 额外的响应头)。"""
+        url = urlsplit(target)
+        segments = [unquote(s) for s in url.path.split("/") if s]
+        params = _params(url.query)
+
+        try:
+            if len(segments) < 2 or segments[0] != "api":
+                raise cherrypy.HTTPError(404, "Not found")
+            resource, uri = segments[1], segments[2:]
+
+            if method == "GET":
+                return await self._get(resource, uri, params, headers)
+            if method == "POST":
+                return await self._post(resource, uri, body)
+            if method == "PUT" and resource == "devices" and len(uri) == 2 and uri[1] == "heartbeat":
+                lease = await self.loop.run_in_executor(self.writer_pool, self.store.heartbeat, uri[0])
+                if lease is None:
+                    raise cherrypy.HTTPError(404, "Device not found, please register again")
+                return 200, _encode(lease), {}
+            if method == "DELETE" and resource == "devices":
+                return await self._delete_device(uri)
+            raise cherrypy.HTTPError(405, "Method not allowed")
+
+        except cherrypy.HTTPError as e:
+            return e.status, _encode({"status": e.status, "message": e._message}), {}
+        except Exception as e:
+            print(f"[Catalog] asyncio handler error: {e}")
+            return 500, _encode({"status": 500, "message": str(e)}), {}
+
+    # ------------------------------------------
+    # 各接口
+    # ------------------------------------------
+    def _api(self, resource):
+        api = {"devices": self.devices, "users": self.users, "services": self.services,
+               "topics": self.topics}.get(resource)
+        if api is None:
+            raise cherrypy.HTTPError(404, "Not found")
+        return api
+
+    async def _get(self, resource, uri, params, headers):
+        if resource == "stats":
+            # stats() 里的 lease_count() 需要 store.lock
+            return 200, _encode(await self.loop.run_in_executor(self.writer_pool, self.stats.stats)), {}
+        # 和 CherryPy 版本一样按 Accept / Accept-Encoding 选择 JSON / MessagePack、是否 gzip
+        variant = negotiate(headers.get("accept"), headers.get("accept-encoding"))
+        if resource == "devices" and uri[:1] == ["_changes"]:
+            body, extra = encode(await self._changes(params), variant)
+            return 200, body, extra
+
+        api = self._api(resource)
+        if resource == "services":
+            etag, revision = api.etag(), api.revision()
+        elif resource == "topics":
+            # 路由表由设备注册派生，版本跟随 devices
+            etag, revision = self.store.etag("devices"), self.store.collection_revision("devices")
+        else:
+            etag, revision = self.store.etag(resource), self.store.collection_revision(resource)
+        matched = etag_match(headers.get("if-none-match"), etag, variant)
+        if matched:
+            return 304, b"", {"ETag": matched}
+
+        key = self.cache.make_key("/api/" + "/".join([resource] + uri), params) + (variant,)
+        body, extra = self.cache.get_or_build(key, revision, lambda: encode(api._query(uri, params), variant))
+        return 200, body, dict(extra, ETag=variant_etag(etag, variant, extra))
+
+    async def _changes(self, params):
+        since, epoch, timeout = parse_changes_params(**params)
+        deadline = self.loop.time() + timeout
+        while True:
+            # 先拿 Event 再检查，避免漏掉检查和等待之间的写入
+            changed = self._changed
+            feed = await self.loop.run_in_executor(
+                self.writer_pool, functools.partial(self.store.changes_since, since, epoch=epoch, collection="devices"))
+            remaining = deadline - self.loop.time()
+            # 只有 devices 的变更才返回，其他集合的写入继续等
+            if feed["reset"] or feed["events"] or remaining <= 0:
+                return feed
+            try:
+                await asyncio.wait_for(changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _post(self, resource, uri, body):
+        api = self._api(resource)
+        try:
+            obj = json.loads(body or b"null")
+        except ValueError:
+            raise cherrypy.HTTPError(400, "Invalid JSON document")
+
+        writable = {
+            "devices": (validate_device, "Device"),
+            "users": (validate_user, "User"),
+            "services": (validate_service, "Service"),
+        }
+        if resource not in writable:
+            raise cherrypy.HTTPError(405, "Method not allowed")
+        validator, label = writable[resource]
+
+        if resource == "devices" and uri[:1] == ["_query"]:
+            # 只读，直接在事件循环里执行
+            return 200, _encode(device_batch_query(self.store, obj)), {}
+
+        if uri[:1] == ["_bulk"]:
+            status, result = await self.loop.run_in_executor(
+                self.writer_pool, apply_bulk, api.store, resource, label, obj, validator)
+            return status, _encode(result), {}
+
+        target_id = await self.loop.run_in_executor(
+            self.writer_pool, register_one, api.store, resource, label, obj, validator)
+        # 与 CherryPy 版本一致: POST /api/users 不返回内容
+        result = None if resource == "users" else {"message": "Registered", "id": target_id}
+        return 201, _encode(result), {}
+
+    async def _delete_device(self, uri):
+        if len(uri) == 0:
+            raise cherrypy.HTTPError(400, "Missing device id")
+        removed = await self.loop.run_in_executor(self.writer_pool, self.store.remove, "devices", uri[0])
+        if removed is None:
+            raise cherrypy.HTTPError(404, "Device not found")
+        print(f"[Device] Removed: {uri[0]}")
+        return 200, _encode({"message": "Removed", "id": str(uri[0])}), {}
+
+
+def serve(store, config_loader=None, host="0.0.0.0", port=8080):
+    """阻塞运行 asyncio 前端，Ctrl+C 退出时关闭 store (合并 WAL)。"""
+    if config_loader is None:
+        print("[!] SKIP: /api/services not mounted due to config error.")
+
+    async def main():
+        app = AsyncCatalogServer(store, config_loader)
+        server = await app.start(host, port)
+        print(f"[*] Catalog Server (asyncio) started at http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
@@ -0,0 +1,358 @@
+import json
+import os
+import shutil
+import sqlite3
+import threading
+
+# ==========================================
+# CatalogStore 的持久化后端
+#
+# CatalogStore 自己在内存里维护全部记录和索引 (读请求只查内存)，
+# 后端只负责把写操作落盘、在启动时把数据读回来。
+#
+# 写操作用一个 entry 描述 (WAL 和 SQLite 用同一种格式)：
+#   {"op": "put",      "collection": c, "doc": {...}}
+#   {"op": "put_many", "collection": c, "docs": [...]}
+#   {"op": "remove",   "collection": c, "id": "..."}
+#
+# 后端接口:
+#   load()        -> (document, pending_entries)
+#                    document 是 catalog_script.json 格式的 dict，
+#                    pending_entries 是还需要由 CatalogStore 重放的写操作
+#   bind(store)   CatalogStore 重放完 pending_entries 之后调用，可以启动后台线程
+#   write(entry, version)
+#                 持久化一个写操作 (调用方已持有 store.lock)。
+#                 version 是包含这次写入、但还没有发布的版本 (store.document(version) 可以取到完整内容)，
+#                 write 成功返回之后 CatalogStore 才会发布它
+#   checkpoint()  把所有数据整理进主存储 (JSON 文件 / SQLite 数据库)
+#   close()
+# ==========================================
+def empty_document():
+    return {
+        "project_info": {},
+        "system_settings": {},
+        "devices": [],
+        "users": [],
+        "services": []
+    }
+
+
+def read_json_document(path):
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return empty_document()
+
+
+def write_json_document(path, document):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, ensure_ascii=False)
+    shutil.move(tmp, path)
+
+
+class StorageBackend:
+    name = "base"
+
+    def __init__(self):
+        self.store = None
+
+    def load(self):
+        raise NotImplementedError
+
+    def bind(self, store):
+        self.store = store
+
+    def write(self, entry, version):
+        raise NotImplementedError
+
+    def checkpoint(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ------------------------------------------
+# persistence="snapshot": 每次写入都整体重写 JSON 文件 (原有行为)
+# ------------------------------------------
+class JsonSnapshotBackend(StorageBackend):
+    name = "snapshot"
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def load(self):
+        return read_json_document(self.path), []
+
+    def write(self, entry, version):
+        write_json_document(self.path, self.store.document(version))
+
+    def checkpoint(self):
+        with self.store.lock:
+            write_json_document(self.path, self.store.document())
+
+
+# ------------------------------------------
+# persistence="wal": 每次写入只追加一行到 <path>.wal，
+# 后台线程定期把日志合并 (compact) 回 JSON 文件，启动时先读 JSON 再重放日志
+# ------------------------------------------
+class JsonWalBackend(StorageBackend):
+    name = "wal"
+
+    def __init__(self, path, compact_every=1000, compact_interval=5.0, fsync=False):
+        super().__init__()
+        self.path = path
+        self.wal_path = path + ".wal"
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self.fsync = fsync
+
+        self._wal = None
+        self._wal_entries = 0
+        self._compact_lock = threading.Lock()
+        self._compact_wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._compactor = None
+
+    def load(self):
+        # 先重放上次合并未完成的 .wal.1，再重放 .wal
+        pending = self._read_log(self.wal_path + ".1") + self._read_log(self.wal_path)
+        return read_json_document(self.path), pending
+
+    def bind(self, store):
+        """
+        启动恢复的后半段：CatalogStore 已经重放完日志，立即写一次 JSON 并清空日志。
+        put 是幂等的 (按 id 覆盖)，所以重复重放已合并过的日志也不会出错。
+        """
+        super().bind(store)
+        rotated = self.wal_path + ".1"
+        if os.path.exists(rotated) or os.path.exists(self.wal_path):
+            with store.lock:
+                write_json_document(self.path, store.document())
+        for p in (rotated, self.wal_path):
+            if os.path.exists(p):
+                os.remove(p)
+
+        self._wal = open(self.wal_path, "a", encoding="utf-8")
+        self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+        self._compactor.start()
+
+    def write(self, entry, version):
+        self._wal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+
+        self._wal_entries += 1
+        if self._wal_entries >= self.compact_every:
+            self._compact_wakeup.set()
+
+    def checkpoint(self):
+        """
+        把日志合并回 JSON 文件。只在轮换日志时短暂持有 store.lock，
+        真正的序列化和磁盘写入在锁外完成，不会阻塞 GET。
+        """
+        with self._compact_lock:
+            rotated = self.wal_path + ".1"
+
+            with self.store.lock:
+                if self._wal_entries == 0:
+                    return
+                # document() 读的是已发布的不可变版本，轮换日志时取到的就是与日志一致的快照
+                snapshot = self.store.document()
+                self._wal.close()
+                if os.path.exists(rotated):
+                    # 上一次合并失败留下的日志还在，追加到它后面，不能覆盖
+                    with open(self.wal_path, "r", encoding="utf-8") as src, \
+                         open(rotated, "a", encoding="utf-8") as dst:
+                        shutil.copyfileobj(src, dst)
+                    os.remove(self.wal_path)
+                else:
+                    os.replace(self.wal_path, rotated)
+                self._wal = open(self.wal_path, "a", encoding="utf-8")
+                self._wal_entries = 0
+
+            write_json_document(self.path, snapshot)
+            os.remove(rotated)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._compact_wakeup.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=10)
+        self.checkpoint()
+        with self.store.lock:
+            self._wal.close()
+
+    def _read_log(self, log_path):
+        if not os.path.exists(log_path):
+            return []
+
+        entries = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # 进程崩溃时最后一行可能只写了一半，直接跳过
+                    print(f"[Catalog] Skipping torn WAL entry in {log_path}")
+        return entries
+
+    def _compact_loop(self):
+        while not self._closed.is_set():
+            self._compact_wakeup.wait(self.compact_interval)
+            self._compact_wakeup.clear()
+            if self._closed.is_set():
+                break
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"[Catalog] WAL compaction failed: {e}")
+
+
+# ------------------------------------------
+# persistence="sqlite": 标准库 sqlite3，WAL 日志模式
+# 每条记录一行，room / type / building 单独成列并建索引，
+# 每个写操作是一个事务，崩溃后最多丢失最后一个未提交的事务。
+# 数据库为空而旁边有 catalog_script.json 时，第一次启动自动导入。
+# ------------------------------------------
+class SqliteBackend(StorageBackend):
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            collection TEXT NOT NULL,
+            id         TEXT NOT NULL,
+            room       TEXT,
+            type       TEXT,
+            building   TEXT,
+            doc        TEXT NOT NULL,
+            PRIMARY KEY (collection, id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_documents_room     ON documents (collection, room);
+        CREATE INDEX IF NOT EXISTS idx_documents_type     ON documents (collection, type);
+        CREATE INDEX IF NOT EXISTS idx_documents_building ON documents (collection, building);
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """
+
+    UPSERT = """
+        INSERT INTO documents (collection, id, room, type, building, doc) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (collection, id) DO UPDATE SET
+            room = excluded.room, type = excluded.type, building = excluded.building, doc = excluded.doc
+    """
+
+    COLLECTIONS = ("devices", "users", "services")
+
+    def __init__(self, db_path, import_json_path=None):
+        super().__init__()
+        self.db_path = db_path
+        self.import_json_path = import_json_path
+
+        # 所有写操作都在 store.lock 里串行执行，可以跨线程共用一个连接
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def load(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        if count == 0 and self.import_json_path and os.path.exists(self.import_json_path):
+            imported = self.import_document(read_json_document(self.import_json_path))
+            print(f"[Catalog] Imported {imported} records from {self.import_json_path} into {self.db_path}")
+
+        document = {}
+        for key, value in self.conn.execute("SELECT key, value FROM meta"):
+            document[key] = json.loads(value)
+        for collection in self.COLLECTIONS:
+            document[collection] = []
+
+        # rowid 顺序即插入顺序，和 JSON 文件里的注册顺序一致
+        rows = self.conn.execute("SELECT collection, doc FROM documents ORDER BY rowid")
+        for collection, doc in rows:
+            document.setdefault(collection, []).append(json.loads(doc))
+        return document, []
+
+    def import_document(self, document):
+        """把 catalog_script.json 格式的内容整体写入数据库 (一个事务)。返回导入的记录数。"""
+        imported = 0
+        with self.conn:
+            for key, value in document.items():
+                if isinstance(value, list):
+                    rows = [self._row(key, item) for item in value]
+                    self.conn.executemany(self.UPSERT, rows)
+                    imported += len(rows)
+                else:
+                    self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                      (key, json.dumps(value, ensure_ascii=False)))
+        return imported
+
+    @staticmethod
+    def _row(collection, doc):
+        loc = doc.get("location", {}) if isinstance(doc.get("location"), dict) else {}
+        return (collection, str(doc["id"]), loc.get("room"), doc.get("type"), loc.get("building"),
+                json.dumps(doc, ensure_ascii=False))
+
+    def write(self, entry, version):
+        op = entry["op"]
+        collection = entry["collection"]
+        with self.conn:
+            if op == "put":
+                self.conn.execute(self.UPSERT, self._row(collection, entry["doc"]))
+            elif op == "put_many":
+                self.conn.executemany(self.UPSERT, [self._row(collection, d) for d in entry["docs"]])
+            elif op == "remove":
+                self.conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?",
+                                  (collection, str(entry["id"])))
+
+    def checkpoint(self):
+        with self.store.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        with self.store.lock:
+            self.conn.close()
+
+
+def make_backend(persistence, path, sqlite_path=None):
+    """根据 setting_config.json 里的 catalog_config.persistence 选择后端。"""
+    if persistence == "snapshot":
+        return JsonSnapshotBackend(path)
+    if persistence == "wal":
+        return JsonWalBackend(path)
+    if persistence == "sqlite":
+        if sqlite_path is None:
+            sqlite_path = os.path.splitext(path)[0] + ".db"
+        return SqliteBackend(sqlite_path, import_json_path=path)
+    raise ValueError(f"Unknown persistence mode: {persistence}")
+
+
+def migrate_json_to_sqlite(json_path, db_path):
+    """手动迁移：把 catalog_script.json 导入 SQLite 数据库 (已有的同 id 记录会被覆盖)。"""
+    backend = SqliteBackend(db_path)
+    try:
+        return backend.import_document(read_json_document(json_path))
+    finally:
+        backend.conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Import catalog_script.json into the SQLite catalog backend")
+    parser.add_argument("--json", default=os.path.join(current_dir, "catalog_script.json"))
+    parser.add_argument("--db", default=os.path.join(current_dir, "catalog_script.db"))
+    args = parser.parse_args()
+
+    count = migrate_json_to_sqlite(args.json, args.db)
+    print(f"[*] Imported {count} records from {args.json} into {args.db}")
@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ==========================================
+# Catalog 客户端 (CatalogClient)
+# Sensors / Controller / OccupancyAnalyzer 访问 Catalog REST API 的唯一入口：
+#
+# - 一个进程里对同一个 Catalog 只用一个 requests.Session (连接池，keep-alive)，
+#   500 个设备启动时复用几条 TCP 连接，而不是每个请求新建一条
+# - GET 结果按 (path, query) 缓存：ttl 秒内直接用缓存，过期后带 If-None-Match
+#   做条件请求，Catalog 版本号 (ETag) 没变时只回 304
+# - 连接失败 / 超时 / 502 503 504 时按带抖动的指数退避重试
+#   (Catalog 的写接口都是按 id 覆盖，重试是幂等的)
+# ==========================================
+RETRY_STATUS = (429, 502, 503, 504)
+
+
+class CatalogClient:
+    def __init__(self, base_url, timeout=5, retries=3, backoff_base=0.2, backoff_max=5.0,
+                 cache_ttl=30.0, pool_size=32):
+        """base_url 形如 http://127.0.0.1:8080/api"""
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache_ttl = cache_ttl
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # (path, query) -> [ETag, data, fetched_at]
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    # ------------------------------------------
+    # 底层请求
+    # ------------------------------------------
+    def request(self, method, path, retries=None, **kwargs):
+        """
+        发送请求并返回 Response；连接错误和 RETRY_STATUS 会重试，
+        重试用完后抛出最后一次的异常 / 返回最后一次的 Response。
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        retries = self.retries if retries is None else retries
+        url = self.base_url + path
+
+        attempt = 0
+        while True:
+            try:
+                res = self.session.request(method, url, **kwargs)
+                if res.status_code not in RETRY_STATUS or attempt >= retries:
+                    return res
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def _backoff(self, attempt):
+        # full jitter: 在 [0, base * 2^attempt] 里随机，避免所有设备同时重试
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def get_json(self, path, params=None, max_age=None):
+        """
+        带缓存的 GET。max_age 为缓存可以不经确认直接使用的秒数 (默认 cache_ttl)，
+        max_age=0 表示每次都向 Catalog 确认 (仍然是条件请求)。
+        """
+        params = params or {}
+        max_age = self.cache_ttl if max_age is None else max_age
+        key = (path, tuple(sorted((k, str(v)) for k, v in params.items())))
+
+        with self._cache_lock:
+            cached = self._cache.get(key)
+        if cached and time.monotonic() - cached[2] < max_age:
+            return cached[1]
+
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        res = self.request("GET", path, params=params, headers=headers)
+        if res.status_code == 304 and cached:
+            cached[2] = time.monotonic()
+            return cached[1]
+        res.raise_for_status()
+
+        data = res.json()
+        if "ETag" in res.headers:
+            with self._cache_lock:
+                self._cache[key] = [res.headers["ETag"], data, time.monotonic()]
+        return data
+
+    def invalidate(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    # ------------------------------------------
+    # 服务发现
+    # ------------------------------------------
+    def get_services(self, max_age=None):
+        return self.get_json("/services", max_age=max_age)
+
+    def find_service(self, service_type, max_age=None):
+        """返回第一个 service_type 匹配的服务，没有时返回 None。"""
+        for service in self.get_services(max_age=max_age):
+            if service.get("service_type") == service_type:
+                return service
+        return None
+
+    # ------------------------------------------
+    # topic 路由表
+    # ------------------------------------------
+    def get_topics(self, max_age=None, **query_params):
+        """GET /topics：{"epoch", "revision", "topics": {topic: route}}，可按 room / type / role / resource 过滤。"""
+        return self.get_json("/topics", query_params, max_age=max_age)
+
+    # ------------------------------------------
+    # 设备
+    # ------------------------------------------
+    def get_devices(self, max_age=None, **query_params):
+        """
+        GET /devices?...，总是返回列表。
+        带 limit 时按 next_cursor 逐页读取，直到最后一页。
+        """
+        if "limit" not in query_params:
+            data = self.get_json("/devices", query_params, max_age=max_age)
+            # 如果对方返回单个 dict（按 id 查），这里也兜底成 list
+            return data if isinstance(data, list) else [data]
+
+        devices = []
+        params = dict(query_params)
+        while True:
+            page = self.get_json("/devices", params, max_age=max_age)
+            devices.extend(page["items"])
+            if not page.get("next_cursor"):
+                return devices
+            params["cursor"] = page["next_cursor"]
+
+    def query_devices(self, rooms=None, types=None, roles=None, ids=None, fields=None, timeout=30):
+        """
+        POST /devices/_query：一次请求查询多个房间 / 类型 / role / id (IN 语义)。
+        返回 {room_id: [device, ...]}，请求里列出的房间都会出现。不走缓存。
+        """
+        query = {"rooms": rooms, "types": types, "roles": roles, "ids": ids, "fields": fields}
+        res = self.request("POST", "/devices/_query", timeout=timeout,
+                           json={k: v for k, v in query.items() if v is not None})
+        res.raise_for_status()
+        return res.json()["rooms"]
+
+    def register_device(self, payload):
+        return self.request("POST", "/devices", json=payload)
+
+    def register_devices(self, payloads, timeout=30):
+        return self.request("POST", "/devices/_bulk", json=payloads, timeout=timeout)
+
+    def heartbeat(self, device_id):
+        return self.request("PUT", f"/devices/{device_id}/heartbeat")
+
+
+# 同一进程里按 base_url 共享客户端 (同一个连接池和缓存)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_catalog_client(base_url, **kwargs):
+    base_url = base_url.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(base_url)
+        if client is None:
+            client = _clients[base_url] = CatalogClient(base_url, **kwargs)
+        return client
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import multiprocessing
+import os, sys
+import struct
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Catalog.catalog_store import CatalogView, _Draft, _Version
+from Catalog.catalog_async import AsyncCatalogServer, _encode
+from Catalog.catalog_client import get_catalog_client
+from Catalog.config_loader import RoomConfigLoader
+from Catalog.Catalog_manage import MAX_LONG_POLL_SECONDS
+
+# ==========================================
+# 只读副本 (read replica)
+#
+# 主进程 (Catalog_manage.run) 用 SnapshotPublisher 定期把当前版本写成一个快照文件
+# (catalog_config.replica.enabled = true 时才开启)；
+# 同一台机器上的任意多个副本进程读这个文件，在本地提供所有 GET (以及 POST /api/devices/_query)，
+# 写请求和 /api/devices/_changes 长轮询转发给主进程。
+# 副本进程用 SO_REUSEPORT 共享一个端口，由内核分配连接，读能力随 CPU 核数扩展。
+#
+# 每个副本进程在版本变化时都会完整解析一次 body 并重建索引，各自持有一份完整的 catalog：
+# 内存随副本数线性增长，快照文件只是进程间传递版本的方式，不是共享内存。
+#
+# 快照文件格式 (写到 .tmp 再 os.replace，读方永远看到完整的文件)：
+#   magic       8 bytes   b"CATSNAP1"
+#   header_len  uint32 (little endian)
+#   header      JSON: {"revision", "epoch", "collection_revision", "created_at"}
+#   body        紧凑 JSON: catalog_script.json 格式的完整内容
+# 副本只需要读 header 就能判断版本是否变化，没变化时不解析 body。
+#
+# 副本的数据最多落后 publish_interval + reload_interval 秒，
+# 向副本注册后立刻从副本读取可能还读不到 (可以直接读主进程)。
+# ==========================================
+SNAPSHOT_MAGIC = b"CATSNAP1"
+_PREFIX = struct.Struct("<8sI")
+
+
+def write_snapshot(store, path):
+    revision, collection_revision, document = store.export()
+    header = json.dumps({
+        "revision": revision,
+        "epoch": store.epoch,
+        "collection_revision": collection_revision,
+        "created_at": time.time(),
+    }).encode("utf-8")
+    body = json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(SNAPSHOT_MAGIC, len(header)))
+        f.write(header)
+        f.write(body)
+    os.replace(tmp, path)
+    return revision
+
+
+def read_snapshot_header(f):
+    """从文件开头读 header，读完后文件位置在 body 的开头。"""
+    prefix = f.read(_PREFIX.size)
+    if len(prefix) < _PREFIX.size:
+        raise ValueError("Truncated catalog snapshot file")
+    magic, header_len = _PREFIX.unpack(prefix)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a catalog snapshot file")
+    return json.loads(f.read(header_len))
+
+
+class SnapshotPublisher:
+    """主进程: Catalog 有变化时最多每 interval 秒写一次快照文件。"""
+
+    def __init__(self, store, path, interval=0.5):
+        self.store = store
+        self.path = path
+        self.interval = interval
+        self.published = None
+        self._closed = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.publish()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def publish(self):
+        if self.store.revision != self.published:
+            self.published = write_snapshot(self.store, self.path)
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.publish()
+
+    def _loop(self):
+        while not self._closed.wait(self.interval):
+            try:
+                self.publish()
+            except Exception as e:
+                print(f"[Catalog] Snapshot publish failed: {e}")
+
+
+class ReplicaStore(CatalogView):
+    """副本进程: 只读，数据来自快照文件 (每个进程自己解析一份)，后台线程发现文件更新后重新加载。"""
+
+    def __init__(self, snapshot_path, reload_interval=0.2):
+        super().__init__()
+        self.snapshot_path = snapshot_path
+        self.reload_interval = reload_interval
+        self.persistence = "replica"
+        self.expired_count = 0
+        self.reloads = 0
+        self.loaded_at = None
+
+        self._file_id = None
+        self._listeners = []
+        self._closed = threading.Event()
+
+        self.reload()
+        self._reloader = threading.Thread(target=self._reload_loop, daemon=True)
+        self._reloader.start()
+
+    def lease_count(self):
+        # 租约由主进程维护
+        return 0
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def reload(self):
+        """文件被替换 (新的 inode) 时先读 header；版本号没变时不读 body。返回是否加载了新版本。"""
+        st = os.stat(self.snapshot_path)
+        file_id = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if file_id == self._file_id:
+            return False
+
+        with open(self.snapshot_path, "rb") as f:
+            header = read_snapshot_header(f)
+            self._file_id = file_id
+            if header["epoch"] == self.epoch and header["revision"] == self.revision:
+                return False
+            self.catalog = json.load(f)
+
+        draft = _Draft(_Version(0, {}, {}, {}, {}, {}, {}))
+        self._load_documents(draft)
+        draft.revision = header["revision"]
+        draft.collection_revision = header["collection_revision"]
+        self._current = draft.freeze()
+        self.epoch = header["epoch"]
+        self.reloads += 1
+        self.loaded_at = time.time()
+
+        for listener in self._listeners:
+            listener(header["revision"])
+        return True
+
+    def close(self):
+        self._closed.set()
+
+    def _reload_loop(self):
+        while not self._closed.wait(self.reload_interval):
+            try:
+                self.reload()
+            except (OSError, ValueError) as e:
+                print(f"[Replica] Snapshot reload failed: {e}")
+
+
+class ReplicaCatalogServer(AsyncCatalogServer):
+    """和 asyncio 前端相同的接口；GET 在本地处理，其余请求转发给主进程。"""
+
+    def __init__(self, store: ReplicaStore, config_loader, primary_url, forward_workers=32):
+        super().__init__(store, config_loader, write_workers=forward_workers)
+        self.primary = get_catalog_client(primary_url)
+
+    async def start(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.store.add_listener(self._on_store_change)
+        self.server = await asyncio.start_server(self._handle_connection, host, port, reuse_port=True)
+        return self.server
+
+    async def _dispatch(self, method, target, headers, body):
+        path = target.split("?", 1)[0]
+        if method == "GET" and not path.startswith("/api/devices/_changes"):
+            if path.rstrip("/") == "/api/stats":
+                return 200, _encode(self._replica_stats()), {}
+            return await super()._dispatch(method, target, headers, body)
+        if method == "POST" and path.rstrip("/") == "/api/devices/_query":
+            # 批量查询是只读的，也在本地处理
+            return await super()._dispatch(method, target, headers, body)
+        return await self.loop.run_in_executor(self.writer_pool, self._forward, method, target, headers, body)
+
+    def _forward(self, method, target, headers, body):
+        # target 形如 /api/devices?...，主进程的 base_url 已经包含 /api
+        if not target.startswith("/api"):
+            return 404, _encode({"status": 404, "message": "Not found"}), {}
+        forward_headers = {}
+        for name in ("Content-Type", "Accept"):
+            if name.lower() in headers:
+                forward_headers[name] = headers[name.lower()]
+        try:
+            res = self.primary.request(method, target[len("/api"):], data=body or None, headers=forward_headers,
+                                       timeout=MAX_LONG_POLL_SECONDS + 10)
+        except Exception as e:
+            return 502, _encode({"status": 502, "message": f"Primary unavailable: {e}"}), {}
+        # res.content 已经被 requests 解压，不转发 Content-Encoding
+        extra = {name: res.headers[name] for name in ("ETag", "Content-Type") if name in res.headers}
+        return res.status_code, res.content, extra
+
+    def _replica_stats(self):
+        return {
+            "revision": self.store.revision,
+            "response_cache": self.cache.stats(),
+            "replica": {
+                "pid": os.getpid(),
+                "snapshot": self.store.snapshot_path,
+                "reloads": self.store.reloads,
+                "age": round(time.time() - self.store.loaded_at, 3) if self.store.loaded_at else None,
+            },
+        }
+
+
+def serve_replica(snapshot_path, primary_url, config_filename=None, host="0.0.0.0", port=8081):
+    # 在副本进程里创建 RoomConfigLoader：它持有锁，不能 pickle，spawn / forkserver 启动方式下不能作为参数传进来
+    config_loader = RoomConfigLoader(config_filename) if config_filename else None
+    store = ReplicaStore(snapshot_path)
+
+    async def main():
+        app = ReplicaCatalogServer(store, config_loader, primary_url)
+        server = await app.start(host, port)
+        print(f"[*] Catalog replica {os.getpid()} at http://{host}:{port} "
+              f"(revision {store.revision}, primary {primary_url})")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+
+
+def run_replicas(workers=None, host="0.0.0.0", port=None, config_filename="setting_config.json"):
+    """启动 workers 个副本进程 (默认每个 CPU 核一个)，共享同一个端口。"""
+    loader = RoomConfigLoader(config_filename)
+    info = loader.get_catalog_info()
+    replica = info.get("replica") or {}
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    snapshot_path = os.path.join(current_dir, replica.get("snapshot_path", "catalog_snapshot.bin"))
+    primary_url = f"http://{info['host']}:{info['port']}{info['api_path']}"
+    port = port or replica.get("port", 8081)
+    workers = workers or replica.get("workers") or os.cpu_count() or 1
+
+    if not os.path.exists(snapshot_path):
+        raise FileNotFoundError(f"{snapshot_path} not found, set catalog_config.replica.enabled "
+                                f"and start the primary Catalog first")
+
+    procs = [multiprocessing.Process(target=serve_replica, args=(snapshot_path, primary_url, config_filename, host, port))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read-only Catalog replicas served from the primary's snapshot file")
+    parser.add_argument("--workers", type=int, default=None, help="replica processes (default: catalog_config.replica.workers or CPU count)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+    run_replicas(args.workers, args.host, args.port)
@@ -0,0 +1,653 @@
+import heapq
+import threading
+import time
+from collections import deque
+
+from Catalog.catalog_backends import make_backend
+
+
+def _device_keys(dev):
+    """二级索引使用的 (room, type)。"""
+    return dev.get("location", {}).get("room"), dev.get("type")
+
+
+def _device_role(dev):
+    """设备的 role ("sensor" / "actuator")。旧的注册没有 role 字段，按 id 约定 {room}_{type}_{role}_{index} 推断。"""
+    role = dev.get("role")
+    if role is None:
+        parts = str(dev.get("id", "")).rsplit("_", 2)
+        role = parts[1] if len(parts) == 3 else None
+    return role
+
+
+def device_routes(dev):
+    """
+    一个设备在 topic 路由表里的条目: [(topic, route), ...]，mqtt_topics 里每个 topic 一条。
+    route = {"room", "type", "role", "index", "resource", "device"}，
+    index 取自 id 约定 {room}_{type}_{role}_{index} 的最后一段。
+    """
+    dev_id = str(dev.get("id"))
+    room, dev_type = _device_keys(dev)
+    role = _device_role(dev)
+    parts = dev_id.rsplit("_", 2)
+    index = parts[2] if len(parts) == 3 else None
+    routes = []
+    for resource, topic in (dev.get("mqtt_topics") or {}).items():
+        if isinstance(topic, str):
+            routes.append((topic, {"room": room, "type": dev_type, "role": role, "index": index,
+                                   "resource": resource, "device": dev_id}))
+    return routes
+
+
+# ==========================================
+# 不可变版本 (copy-on-write)
+#
+# 读请求拿到 store._current 之后直接读，不加锁；
+# 写请求在 self.lock 里基于当前版本生成一个 _Draft，只复制被修改到的那个集合 / 索引桶，
+# 其余部分和旧版本共享，改完后整体替换 store._current (一次属性赋值，原子操作)。
+# 已经发布的版本里的 dict 永远不会再被修改。
+# ==========================================
+_TABLES = ("docs", "by_room", "by_type", "by_room_type", "routes")
+
+
+class _Version:
+    """
+    docs[collection][id]          -> 记录
+    by_room / by_type / by_room_type[key][id] -> device
+    routes[room][topic]           -> device_routes() 的 route (topic 路由表，按房间分桶)
+    内层用 dict 而不是 set，保持注册顺序，结果顺序稳定
+    _sorted[(table, key)]         -> 这个桶按 id 排序的 id 列表 (分页用，第一次翻页时生成，之后同一版本直接复用)
+    """
+    __slots__ = ("revision", "collection_revision", "_sorted") + _TABLES
+
+    def __init__(self, revision, collection_revision, docs, by_room, by_type, by_room_type, routes):
+        self.revision = revision
+        self.collection_revision = collection_revision
+        self.docs = docs
+        self.by_room = by_room
+        self.by_type = by_type
+        self.by_room_type = by_room_type
+        self.routes = routes
+        self._sorted = {}
+
+    def sorted_bucket(self, table, key):
+        """(桶, 按 id 排序的 id 列表)。版本不可变，每个桶只排序一次；并发读者最多重复排序一次，结果相同。"""
+        cached = self._sorted.get((table, key))
+        if cached is None:
+            bucket = getattr(self, table).get(key)
+            if not bucket:
+                # 不存在的房间 / 类型不缓存，key 来自请求参数
+                return {}, []
+            cached = self._sorted[(table, key)] = (bucket, sorted(bucket))
+        return cached
+
+
+class _Draft:
+    """一次写操作的工作副本。第一次修改某个 table / 桶时才复制它。"""
+
+    def __init__(self, base):
+        self.revision = base.revision
+        self.collection_revision = base.collection_revision
+        self.tables = {name: getattr(base, name) for name in _TABLES}
+        self._copied = set()
+        # 设备租约的改动 device_id -> ttl (None 表示删除租约)，落盘成功后才由 CatalogStore 生效
+        self.leases = {}
+
+    def get(self, table, key):
+        return self.tables[table].get(key, {})
+
+    def writable(self, table, key):
+        """返回 tables[table][key] 的可修改副本。"""
+        if table not in self._copied:
+            self.tables[table] = dict(self.tables[table])
+            self._copied.add(table)
+        outer = self.tables[table]
+        bucket = outer.get(key)
+        if bucket is None or (table, key) not in self._copied:
+            bucket = outer[key] = dict(bucket or {})
+            self._copied.add((table, key))
+        return bucket
+
+    def discard_if_empty(self, table, key):
+        if not self.tables[table].get(key, True):
+            del self.tables[table][key]
+
+    def freeze(self):
+        return _Version(self.revision, self.collection_revision, **self.tables)
+
+
+# ==========================================
+# 只读视图 (CatalogView)
+# CatalogStore 和只读副本 (catalog_replica.ReplicaStore) 共用的查询接口，
+# 所有读操作都只访问 self._current，不加锁。
+# ==========================================
+class CatalogView:
+    COLLECTIONS = ("devices", "users", "services")
+
+    def __init__(self):
+        # catalog 只保存 project_info / system_settings 等非集合字段，
+        # devices / users / services 放在 _current.docs 里 (id -> 记录，dict 保持注册顺序)
+        self.catalog = {}
+
+        # 版本号: 每次写入 +1，只增不减。
+        # collection_revision[c] 记录 c 最后一次被修改时的全局版本号，
+        # 这样注册用户不会让 /api/devices 的 ETag 失效。
+        # epoch 区分不同的进程生命周期，重启后旧的 ETag 不会被误判为“未修改”。
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._current = _Version(0, {c: 0 for c in self.COLLECTIONS}, {}, {}, {}, {}, {})
+
+    @property
+    def revision(self):
+        return self._current.revision
+
+    def collection_revision(self, collection):
+        return self._current.collection_revision.get(collection, 0)
+
+    def etag(self, collection):
+        """HTTP ETag: 同一进程内 collection 没有变化时保持不变。"""
+        return f'"{self.epoch}-{self.collection_revision(collection)}"'
+
+    # ------------------------------------------
+    # 查询接口 (O(结果数)，不扫描整个 catalog)
+    # 不加锁: 先取当前版本，之后的写入不会影响这次读
+    # ------------------------------------------
+    def get(self, collection, item_id):
+        return self._current.docs.get(collection, {}).get(str(item_id))
+
+    def list(self, collection):
+        return list(self._current.docs.get(collection, {}).values())
+
+    def find_devices(self, device_id=None, room=None, device_type=None):
+        """
+        按 id / room / type 过滤设备，参数为 None 表示不过滤该字段。
+        参数也可以是一组值 (?room=R1&room=R2 解析出来是 list)，这时按 IN 语义交给 query_devices。
+        """
+        if any(isinstance(v, (list, tuple)) for v in (device_id, room, device_type)):
+            def values(v):
+                return None if v is None else list(v) if isinstance(v, (list, tuple)) else [v]
+            return self.query_devices(ids=values(device_id), rooms=values(room), types=values(device_type))
+
+        version = self._current
+        if device_id is not None:
+            dev = version.docs.get("devices", {}).get(str(device_id))
+            if dev is None:
+                return []
+            dev_room, dev_type = _device_keys(dev)
+            if room is not None and dev_room != room:
+                return []
+            if device_type is not None and dev_type != device_type:
+                return []
+            return [dev]
+
+        if room is not None and device_type is not None:
+            bucket = version.by_room_type.get((room, device_type), {})
+        elif room is not None:
+            bucket = version.by_room.get(room, {})
+        elif device_type is not None:
+            bucket = version.by_type.get(device_type, {})
+        else:
+            bucket = version.docs.get("devices", {})
+
+        return list(bucket.values())
+
+    def sorted_listing(self, collection, room=None, device_type=None):
+        """
+        分页用：(id -> 记录, 按 id 排序的 id 列表)，两者来自同一个版本。
+        devices 可以按 room / type 过滤 (和 find_devices 走同一个索引桶)，参数不是单个值时返回 None。
+        """
+        version = self._current
+        if collection != "devices" or (room is None and device_type is None):
+            return version.sorted_bucket("docs", collection)
+        if not all(v is None or isinstance(v, str) for v in (room, device_type)):
+            return None
+        if room is not None and device_type is not None:
+            return version.sorted_bucket("by_room_type", (room, device_type))
+        if room is not None:
+            return version.sorted_bucket("by_room", room)
+        return version.sorted_bucket("by_type", device_type)
+
+    def query_devices(self, ids=None, rooms=None, types=None, roles=None):
+        """
+        多值查询 (IN 语义)：每个参数是一组可选值，None 表示不过滤该字段。
+        ids / rooms / types 走索引，只取出需要的桶；role 在取出的结果上过滤。
+        结果按 id 去重，顺序为 ids / rooms 给出的顺序。
+        """
+        version = self._current
+        if ids is not None:
+            devices = version.docs.get("devices", {})
+            candidates = [devices[i] for i in dict.fromkeys(map(str, ids)) if i in devices]
+        elif rooms is not None:
+            if types is not None:
+                buckets = [version.by_room_type.get((r, t), {}) for r in rooms for t in types]
+            else:
+                buckets = [version.by_room.get(r, {}) for r in rooms]
+            candidates = list({k: v for b in buckets for k, v in b.items()}.values())
+        elif types is not None:
+            candidates = list({k: v for t in types for k, v in version.by_type.get(t, {}).items()}.values())
+        else:
+            candidates = list(version.docs.get("devices", {}).values())
+
+        room_set = set(rooms) if rooms is not None else None
+        type_set = set(types) if types is not None else None
+        role_set = set(roles) if roles is not None else None
+        out = []
+        for dev in candidates:
+            dev_room, dev_type = _device_keys(dev)
+            if room_set is not None and dev_room not in room_set:
+                continue
+            if type_set is not None and dev_type not in type_set:
+                continue
+            if role_set is not None and _device_role(dev) not in role_set:
+                continue
+            out.append(dev)
+        return out
+
+    def topic_routes(self, room=None, device_type=None, role=None, resource=None):
+        """
+        topic 路由表 {topic: route}，由设备注册维护，不需要扫描设备文档。
+        返回 (devices 集合的版本号, 路由表)，两者来自同一个版本。参数为 None 表示不过滤。
+        参数也可以是一组值 (?room=R1&room=R2)，表示其中任意一个。
+        """
+        def values(v):
+            return None if v is None else set(v) if isinstance(v, (list, tuple)) else {v}
+
+        rooms, types, roles, resources = map(values, (room, device_type, role, resource))
+        version = self._current
+        buckets = [version.routes.get(r, {}) for r in rooms] if rooms is not None else version.routes.values()
+        table = {}
+        for bucket in buckets:
+            for topic, route in bucket.items():
+                if types is not None and route["type"] not in types:
+                    continue
+                if roles is not None and route["role"] not in roles:
+                    continue
+                if resources is not None and route["resource"] not in resources:
+                    continue
+                table[topic] = route
+        return version.collection_revision.get("devices", 0), table
+
+    def document(self, version=None):
+        """把当前版本 (或给定的 version) 组装成 catalog_script.json 的格式 (不需要加锁)。"""
+        return self.export(version)[2]
+
+    def export(self, version=None):
+        """同一个版本的 (revision, collection_revision, document)，供快照文件使用。"""
+        version = self._current if version is None else version
+        doc = dict(self.catalog)
+        for collection, items in version.docs.items():
+            doc[collection] = list(items.values())
+        return version.revision, dict(version.collection_revision), doc
+
+    def _index_device(self, draft, dev):
+        dev_id = str(dev.get("id"))
+        room, dev_type = _device_keys(dev)
+        draft.writable("by_room", room)[dev_id] = dev
+        draft.writable("by_type", dev_type)[dev_id] = dev
+        draft.writable("by_room_type", (room, dev_type))[dev_id] = dev
+        for topic, route in device_routes(dev):
+            draft.writable("routes", room)[topic] = route
+
+    def _unindex_device(self, draft, dev):
+        dev_id = str(dev.get("id"))
+        room, dev_type = _device_keys(dev)
+        for table, key in (("by_room", room), ("by_type", dev_type), ("by_room_type", (room, dev_type))):
+            if dev_id not in draft.get(table, key):
+                continue
+            draft.writable(table, key).pop(dev_id)
+            draft.discard_if_empty(table, key)
+        self._unroute_device(draft, dev)
+
+    def _unroute_device(self, draft, dev):
+        # 只删除仍然属于这个设备的条目 (同一个 topic 可能已经被另一个设备注册)
+        dev_id = str(dev.get("id"))
+        room = _device_keys(dev)[0]
+        for topic, _ in device_routes(dev):
+            if draft.get("routes", room).get(topic, {}).get("device") != dev_id:
+                continue
+            draft.writable("routes", room).pop(topic)
+            draft.discard_if_empty("routes", room)
+
+    def _load_documents(self, draft):
+        # 把读出来的列表搬进 draft，catalog 里只留下非集合字段
+        for collection in self.COLLECTIONS:
+            docs = draft.writable("docs", collection)
+            for item in self.catalog.pop(collection, []):
+                # 旧文件里可能有重复 id，保留最后一条
+                docs[str(item.get("id"))] = item
+
+        for dev in draft.get("docs", "devices").values():
+            self._index_device(draft, dev)
+
+
+# ==========================================
+# 数据仓库 (CatalogStore)
+# 全部记录和索引都在内存里，持久化交给 catalog_backends 里的后端：
+#
+# persistence="snapshot": 每次写入都整体重写 JSON 文件 (原有行为)
+# persistence="wal":      追加日志 + 后台合并回 JSON 文件
+# persistence="sqlite":   SQLite (WAL 模式) 数据库
+#
+# 设备注册时可以带 "ttl" (秒)：超过 ttl 没有心跳 (heartbeat) 就自动删除。
+# 过期时间放在一个最小堆里，由后台线程按到期顺序处理。
+# ==========================================
+class CatalogStore(CatalogView):
+    # 过期删除落盘失败时，隔多少秒再试一次
+    EXPIRY_RETRY = 5.0
+
+    def __init__(self, path, persistence="snapshot", backend=None, change_log_size=10000):
+        super().__init__()
+        self.path = path
+        self.backend = backend if backend is not None else make_backend(persistence, path)
+        self.persistence = self.backend.name
+
+        # 只有写操作 (以及租约 / 变更日志) 需要这把锁，读操作只读 self._current
+        self.lock = threading.RLock()
+
+        # 变更日志 (只在内存里，保留最近 change_log_size 条)，供 /api/devices/_changes 增量同步。
+        # 长轮询的请求在 _changed 上等待，写入时被唤醒。
+        self._changes = deque(maxlen=change_log_size)
+        self._changed = threading.Condition(self.lock)
+        # 不能阻塞在 _changed 上的等待方 (asyncio 前端) 通过回调得到通知
+        self._listeners = []
+
+        self.catalog, pending = self.backend.load()
+
+        # 设备租约: _leases[id] = [expires_at, ttl, scheduled]
+        # 堆里每个设备只有一条有效记录，时间等于 scheduled；
+        # 心跳只修改 expires_at (O(1))，堆顶到期时如果发现已被续期，再按新时间放回堆里。
+        self._leases = {}
+        self._expiry_heap = []
+        self._lease_wakeup = threading.Condition(self.lock)
+        self.expired_count = 0
+        self._closed = threading.Event()
+
+        with self.lock:
+            draft = _Draft(self._current)
+            self._load_documents(draft)
+            # 后端返回的未合并写操作 (例如 WAL 日志) 在这里重放
+            for entry in pending:
+                self._apply(draft, entry)
+            if pending:
+                print(f"[Catalog] Replayed {len(pending)} WAL entries")
+            self._commit_leases(draft)
+            self._current = draft.freeze()
+        self.backend.bind(self)
+
+        self._expirer = threading.Thread(target=self._expiry_loop, daemon=True)
+        self._expirer.start()
+
+    # ------------------------------------------
+    # 写入接口 (所有 API 的写操作都走这里)
+    # ------------------------------------------
+    def put(self, collection, obj):
+        """
+        按 id 插入或覆盖一条记录并持久化。
+        返回 True 表示新注册，False 表示覆盖已有记录。
+        """
+        with self.lock:
+            draft = _Draft(self._current)
+            previous = self._upsert(draft, collection, obj)
+            version = self._bump(draft, collection)
+            self._persist({"op": "put", "collection": collection, "doc": obj}, version)
+            self._commit_leases(draft)
+            self._publish(version, [self._change_event(collection, obj, previous)])
+        return previous is None
+
+    def put_many(self, collection, objs):
+        """
+        批量写入：全部更新内存后只持久化一次 (WAL 中是一行，要么整体生效要么整体丢弃)。
+        返回与 objs 一一对应的 created 标志列表。
+        """
+        if not objs:
+            return []
+        with self.lock:
+            draft = _Draft(self._current)
+            events = []
+            for obj in objs:
+                previous = self._upsert(draft, collection, obj)
+                events.append(self._change_event(collection, obj, previous))
+            version = self._bump(draft, collection)
+            self._persist({"op": "put_many", "collection": collection, "docs": objs}, version)
+            self._commit_leases(draft)
+            self._publish(version, events)
+        return [event["op"] == "register" for event in events]
+
+    def remove(self, collection, item_id, reason=None):
+        """按 id 删除一条记录。返回被删除的记录，不存在时返回 None。"""
+        with self.lock:
+            draft = _Draft(self._current)
+            removed = self._remove(draft, collection, str(item_id))
+            if removed is None:
+                return None
+            event = {"op": "remove", "collection": collection, "id": str(item_id), "doc": removed}
+            if reason:
+                event["reason"] = reason
+            version = self._bump(draft, collection)
+            self._persist({"op": "remove", "collection": collection, "id": str(item_id)}, version)
+            self._commit_leases(draft)
+            self._publish(version, [event])
+        return removed
+
+    def heartbeat(self, device_id):
+        """
+        续期设备租约，不修改设备记录、不写盘、不改变版本号。
+        设备不存在时返回 None (设备应重新注册)。
+        """
+        with self.lock:
+            device_id = str(device_id)
+            if device_id not in self._current.docs.get("devices", {}):
+                return None
+
+            lease = self._leases.get(device_id)
+            if lease is None:
+                # 注册时没有带 ttl，永不过期
+                return {"id": device_id, "ttl": None, "expires_in": None}
+
+            lease[0] = time.monotonic() + lease[1]
+            return {"id": device_id, "ttl": lease[1], "expires_in": lease[1]}
+
+    def lease_count(self):
+        with self.lock:
+            return len(self._leases)
+
+    @staticmethod
+    def _change_event(collection, obj, previous):
+        event = {
+            "op": "register" if previous is None else "update",
+            "collection": collection,
+            "id": str(obj["id"]),
+            "doc": obj,
+        }
+        if previous is not None:
+            event["previous"] = previous
+        return event
+
+    # 写操作的顺序 (调用方已持有 self.lock)：
+    #   _bump     分配新版本号，生成新版本但不发布
+    #   _persist  落盘；失败时异常直接抛给调用方
+    #   _commit_leases  落盘成功后才修改租约表和过期堆
+    #   _publish  替换 self._current，写变更日志，唤醒长轮询和监听者
+    # 落盘失败的版本不会被无锁读者、/api/devices/_changes 或只读副本看到。
+    def _bump(self, draft, collection):
+        draft.revision += 1
+        draft.collection_revision = dict(draft.collection_revision)
+        draft.collection_revision[collection] = draft.revision
+        return draft.freeze()
+
+    def _publish(self, version, events):
+        self._current = version
+        for event in events:
+            event["revision"] = version.revision
+            self._changes.append(event)
+        self._changed.notify_all()
+        for listener in self._listeners:
+            listener(version.revision)
+
+    def add_listener(self, callback):
+        """每次写入后在写线程里 (持有 self.lock) 调用 callback(revision)，callback 必须立即返回。"""
+        with self.lock:
+            self._listeners.append(callback)
+
+    def changes_since(self, since, epoch=None, collection=None, timeout=0):
+        """
+        返回 revision > since 的变更事件。
+        没有新变更时最多等待 timeout 秒 (长轮询)。
+        如果 since 已经不在变更日志范围内 (太旧、来自上一个进程、或没有给)，
+        返回 reset=True，客户端需要重新全量拉取，然后从返回的 revision 继续。
+        给了 collection 时只等这个集合的写入，其他集合的写入不会提前结束长轮询。
+        """
+        with self._changed:
+            reset = (
+                since is None
+                or (epoch is not None and epoch != self.epoch)
+                or since > self.revision
+                or (since < self.revision and (not self._changes or self._changes[0]["revision"] > since + 1))
+            )
+
+            if not reset and timeout > 0:
+                if collection is None:
+                    changed = lambda: self.revision > since
+                else:
+                    changed = lambda: self.collection_revision(collection) > since
+                self._changed.wait_for(lambda: changed() or self._closed.is_set(), timeout)
+
+            events = []
+            if not reset:
+                # 从尾部往前找，新事件通常只有几条
+                for event in reversed(self._changes):
+                    if event["revision"] <= since:
+                        break
+                    if collection is None or event["collection"] == collection:
+                        events.append(event)
+                events.reverse()
+
+            return {"epoch": self.epoch, "revision": self.revision, "reset": reset, "events": events}
+
+    def save(self):
+        """把所有数据整理进主存储 (JSON 文件 / SQLite 数据库)。"""
+        self.backend.checkpoint()
+
+    def close(self):
+        """唤醒长轮询和过期线程，关闭持久化后端。"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        with self._changed:
+            self._changed.notify_all()
+            self._lease_wakeup.notify_all()
+        self.backend.close()
+
+    def _persist(self, entry, version):
+        # 调用方已持有 self.lock；version 是写入之后、还没有发布的版本
+        self.backend.write(entry, version)
+
+    def _apply(self, draft, entry):
+        # 重放日志时使用：只修改内存，不再写日志
+        op = entry.get("op")
+        if op == "put":
+            self._upsert(draft, entry["collection"], entry["doc"])
+        elif op == "put_many":
+            for doc in entry["docs"]:
+                self._upsert(draft, entry["collection"], doc)
+        elif op == "remove":
+            self._remove(draft, entry["collection"], entry["id"])
+
+    # ------------------------------------------
+    # 索引维护 (调用方已持有 self.lock)
+    # ------------------------------------------
+    def _upsert(self, draft, collection, obj):
+        target_id = str(obj["id"])
+
+        previous = draft.get("docs", collection).get(target_id)
+        # 覆盖已有 key 不会改变它在 dict 里的位置
+        draft.writable("docs", collection)[target_id] = obj
+        if previous is not None and collection == "devices":
+            if _device_keys(previous) != _device_keys(obj):
+                self._unindex_device(draft, previous)
+            else:
+                # room/type 没变但 mqtt_topics 可能变了
+                self._unroute_device(draft, previous)
+
+        if collection == "devices":
+            # room/type 没变时直接覆盖索引里的值，保持原有顺序
+            self._index_device(draft, obj)
+            draft.leases[target_id] = obj.get("ttl")
+        return previous
+
+    def _remove(self, draft, collection, item_id):
+        if item_id not in draft.get("docs", collection):
+            return None
+        removed = draft.writable("docs", collection).pop(item_id)
+
+        if collection == "devices":
+            self._unindex_device(draft, removed)
+            draft.leases[item_id] = None
+        return removed
+
+    # ------------------------------------------
+    # 租约 / 过期 (调用方已持有 self.lock)
+    # ------------------------------------------
+    def _commit_leases(self, draft):
+        for device_id, ttl in draft.leases.items():
+            self._set_lease(device_id, ttl)
+        draft.leases = {}
+
+    def _set_lease(self, device_id, ttl):
+        if not ttl:
+            self._leases.pop(device_id, None)
+            return
+
+        expires_at = time.monotonic() + float(ttl)
+        lease = self._leases.get(device_id)
+        if lease is not None and lease[2] <= expires_at:
+            # 堆里已有更早的记录，到时候会自动按新时间重新排队
+            lease[0] = expires_at
+            lease[1] = float(ttl)
+            return
+
+        self._leases[device_id] = [expires_at, float(ttl), expires_at]
+        heapq.heappush(self._expiry_heap, (expires_at, device_id))
+        if self._expiry_heap[0][0] == expires_at:
+            self._lease_wakeup.notify_all()
+
+    def _expiry_loop(self):
+        with self.lock:
+            while not self._closed.is_set():
+                now = time.monotonic()
+                expired = []
+                while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                    scheduled, device_id = heapq.heappop(self._expiry_heap)
+                    lease = self._leases.get(device_id)
+                    if lease is None or lease[2] != scheduled:
+                        continue  # 设备已删除，或者这条记录已被更早的记录取代
+                    if lease[0] > now:
+                        # 期间收到过心跳：按新的到期时间放回堆里
+                        lease[2] = lease[0]
+                        heapq.heappush(self._expiry_heap, (lease[0], device_id))
+                        continue
+                    expired.append(device_id)
+
+                for device_id in expired:
+                    try:
+                        removed = self.remove("devices", device_id, reason="expired")
+                    except Exception as e:
+                        # 落盘失败：设备和租约都还在 (租约只在落盘成功后删除)。
+                        # 过 EXPIRY_RETRY 秒再试；期间收到心跳的话按正常续期处理
+                        print(f"[Device] Lease expired but removing {device_id} failed: {e}")
+                        lease = self._leases.get(device_id)
+                        if lease is not None:
+                            lease[2] = now + self.EXPIRY_RETRY
+                            heapq.heappush(self._expiry_heap, (lease[2], device_id))
+                        continue
+                    if removed is not None:
+                        self.expired_count += 1
+                        print(f"[Device] Lease expired, removed: {device_id}")
+
+                timeout = self._expiry_heap[0][0] - now if self._expiry_heap else None
+                self._lease_wakeup.wait(timeout)
+
+    def _load_documents(self, draft):
+        super()._load_documents(draft)
+        for dev_id, dev in draft.get("docs", "devices").items():
+            # 重启后带 ttl 的设备重新获得一个完整的租约 (重放日志之后再生效)
+            draft.leases[dev_id] = dev.get("ttl")
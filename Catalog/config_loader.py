@@ -1,5 +1,92 @@
 import json
 import os
+import threading
+import time
+
+# ==========================================
+# 配置缓存
+# 同一个进程里每个配置文件只解析一次，所有 RoomConfigLoader 共享同一份数据
+# (500 个设备线程各自 new 一个 loader 也不会重复读文件)。
+# 文件的 mtime 变化后自动重新加载 (最多每 RELOAD_CHECK_INTERVAL 秒 stat 一次)，
+# 修改房间容量 / 布局不需要重启设备和 Controller。
+# 重新加载失败 (比如文件正在写入、JSON 不完整) 时继续使用旧的配置。
+# ==========================================
+RELOAD_CHECK_INTERVAL = 1.0
+
+
+class _ConfigFile:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = None
+        self.rooms_by_id = {}
+        # 版本号 = 文件的 mtime_ns：多个进程 (比如 Catalog 副本) 读同一个文件时得到相同的版本
+        self.version = None
+        self.invalid_version = None
+        self.checked_at = 0.0
+
+    def current(self):
+        """返回最新的 (data, rooms_by_id, version)，必要时重新加载。"""
+        now = time.monotonic()
+        if self.data is not None and now - self.checked_at < RELOAD_CHECK_INTERVAL:
+            return self.data, self.rooms_by_id, self.version
+
+        with self.lock:
+            if self.data is None or now - self.checked_at >= RELOAD_CHECK_INTERVAL:
+                self._reload()
+                self.checked_at = now
+            return self.data, self.rooms_by_id, self.version
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.data is None:
+                raise FileNotFoundError(f"[-] Config file NOT found at: {self.path}")
+            return
+        if mtime == self.version or mtime == self.invalid_version:
+            return
+
+        print(f"[*] Loading config from: {self.path}")
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            if self.data is None:
+                raise ValueError(f"[-] Invalid JSON format in: {self.path}")
+            print(f"[!] Invalid JSON in {self.path}, keeping the previous config")
+            self.invalid_version = mtime
+            return
+
+        # 一次性建立 room_id -> room 的索引，get_room_config 不再线性扫描
+        rooms_by_id = {}
+        for room in data.get("rooms", []):
+            rooms_by_id.setdefault(room["room_id"], room)
+        self.rooms_by_id = rooms_by_id
+        self.data = data
+        self.version = mtime
+
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+def _config_file(path):
+    path = os.path.abspath(path)
+    with _files_lock:
+        config = _files.get(path)
+        if config is None:
+            config = _files[path] = _ConfigFile(path)
+    return config
+
+
+def cached_json(path):
+    """
+    其他 JSON 文件 (比如 schedule.json) 也走同一个缓存：只解析一次，mtime 变化后自动重新加载。
+    path 相对于当前工作目录。返回的数据是共享的，不要修改。
+    """
+    return _config_file(path).current()[0]
+
 
 class RoomConfigLoader:
     def __init__(self, config_filename):
@@ -23,18 +110,19 @@ class RoomConfigLoader:
         if self.config_path is None:
             self.config_path = os.path.join(project_root, config_filename)
 
-        self.data = self._load_data()
+        self._file = _config_file(self.config_path)
+        # 构造时加载一次，文件不存在 / 格式错误时和以前一样在这里抛出异常
+        self._file.current()
+
+    @property
+    def data(self):
+        return self._file.current()[0]
+
+    @property
+    def version(self):
+        """配置文件的版本号，文件被修改 (并重新加载) 后改变。"""
+        return self._file.current()[2]
 
-    def _load_data(self):
-        print(f"[*] Loading config from: {self.config_path}") 
-        try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"[-] Config file NOT found at: {self.config_path}")
-        except json.JSONDecodeError:
-            raise ValueError(f"[-] Invalid JSON format in: {self.config_path}")
-    
     def get_broker_info(self):
         mqtt = self.data.get("mqtt_config", {})
         return {
@@ -48,27 +136,41 @@ class RoomConfigLoader:
         return {
             "host": catalog.get("host", "127.0.0.1"),
             "port": catalog.get("port", 8080),
-            "api_path": catalog.get("api_path", "/api")
+            "api_path": catalog.get("api_path", "/api"),
+            "persistence": catalog.get("persistence", "snapshot"),
+            # HTTP 前端: "cherrypy" (线程池) 或 "asyncio" (单线程事件循环)
+            "server": catalog.get("server", "cherrypy"),
+            # persistence="sqlite" 时的数据库文件 (相对 Catalog 目录)，None 表示 catalog_script.db
+            "sqlite_path": catalog.get("sqlite_path"),
+            # 设备注册的租约时长 (秒)，None 表示永不过期
+            "device_ttl": catalog.get("device_ttl"),
+            # 只读副本: {"enabled", "snapshot_path", "publish_interval", "port", "workers"}，
+            # enabled 不为 true (或没有这一项) 时主进程不写快照
+            "replica": catalog.get("replica")
         }
 
+    def get_rooms(self):
+        """所有房间的配置 (setting_config.json 里 rooms 的原始内容)。返回的 dict 是共享的，不要修改。"""
+        return list(self._file.current()[1].values())
+
+    def get_room(self, room_id):
+        """按 room_id 返回房间配置，不存在时返回 None。"""
+        return self._file.current()[1].get(room_id)
+
     def get_room_config(self, target_room_id=None):
 
         # 1. 提取全局信息 (Project Info)
-        project_info = self.data.get("project_info", {})
+        data, rooms_by_id, _ = self._file.current()
+        project_info = data.get("project_info", {})
         campus = project_info.get("campus", "Unknown")
-        rooms_list = self.data.get("rooms", [])
 
         # 2. 如果没有指定房间，返回所有所有房间名称
         if not target_room_id:
-            return [room["room_id"] for room in rooms_list]
+            return list(rooms_by_id)
 
 
         # 3. 查找具体房间
-        found_room = None
-        for room in self.data.get("rooms", []):
-            if room["room_id"] == target_room_id:
-                found_room = room
-                break
+        found_room = rooms_by_id.get(target_room_id)
         
         if not found_room:
             raise ValueError(f"Room ID '{target_room_id}' not found in configuration.")
@@ -86,5 +188,3 @@ class RoomConfigLoader:
                 "capacity": found_room.get("capacity")
             }
         }
-
-
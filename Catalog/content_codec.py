@@ -0,0 +1,306 @@
+import gzip
+import json
+import struct
+
+# ==========================================
+# 响应内容协商 (Catalog 和 Controller 的 REST 接口共用)
+#
+# - Accept: application/msgpack  -> MessagePack 二进制编码 (本文件里的纯 Python 实现，不需要额外依赖)
+#   其他 / 没有 Accept            -> JSON (原来的格式)
+# - Accept-Encoding: gzip        -> 响应体不小于 GZIP_MIN_BYTES 时 gzip 压缩
+#
+# variant = (media_type, content_coding)，同一个资源的不同 variant 要分别缓存、使用不同的 ETag。
+# requests 默认就会发送 Accept-Encoding: gzip，并自动解压，现有客户端不需要修改。
+# ==========================================
+JSON_MIME = "application/json"
+MSGPACK_MIME = "application/msgpack"
+_MSGPACK_ALIASES = (MSGPACK_MIME, "application/x-msgpack", "application/vnd.msgpack")
+
+# 小响应压缩后反而变大，也不值得花 CPU
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+
+IDENTITY = (JSON_MIME, None)
+
+
+def _parse_header_list(value):
+    """'a;q=0.5, b' -> {"a": 0.5, "b": 1.0}"""
+    items = {}
+    for part in (value or "").split(","):
+        name, _, rest = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in rest.split(";"):
+            key, _, val = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(val)
+                except ValueError:
+                    q = 0.0
+        items[name] = max(q, items.get(name, 0.0))
+    return items
+
+
+def negotiate(accept=None, accept_encoding=None):
+    """根据 Accept / Accept-Encoding 选择 variant。不支持的类型一律退回 JSON，不返回 406。"""
+    media = JSON_MIME
+    if accept:
+        accepted = _parse_header_list(accept)
+        msgpack_q = max((accepted.get(m, 0.0) for m in _MSGPACK_ALIASES), default=0.0)
+        json_q = max(accepted.get(JSON_MIME, 0.0), accepted.get("application/*", 0.0), accepted.get("*/*", 0.0))
+        if msgpack_q > json_q:
+            media = MSGPACK_MIME
+
+    coding = None
+    if accept_encoding:
+        encodings = _parse_header_list(accept_encoding)
+        if encodings.get("gzip", encodings.get("*", 0.0)) > 0:
+            coding = "gzip"
+    return media, coding
+
+
+def variant_etag(etag, variant, headers=None):
+    """
+    不同表示使用不同的 (强) ETag: "e-3" -> "e-3-mp-gz"。
+    headers 是 encode 返回的响应头：给了时按实际使用的编码加后缀
+    (小于 GZIP_MIN_BYTES 的响应不压缩，ETag 也不带 -gz)。
+    """
+    media, coding = variant
+    if headers is not None:
+        coding = headers.get("Content-Encoding")
+    suffix = ("-mp" if media == MSGPACK_MIME else "") + ("-gz" if coding == "gzip" else "")
+    if not suffix or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + suffix + '"'
+
+
+def etag_match(if_none_match, etag, variant):
+    """
+    If-None-Match 命中时返回命中的 ETag，否则返回 None。
+    编码之前还不知道响应会不会被压缩，压缩和不压缩两种 ETag 都算命中：
+    同一个版本、同一种 media 的内容相同，只是传输编码不同。
+    """
+    if not if_none_match:
+        return None
+    tags = [t.strip() for t in if_none_match.split(",")]
+    media, coding = variant
+    for candidate in dict.fromkeys((variant_etag(etag, (media, coding)), variant_etag(etag, (media, None)))):
+        if candidate in tags:
+            return candidate
+    return variant_etag(etag, variant) if "*" in tags else None
+
+
+def encode(obj, variant=IDENTITY):
+    """按 variant 编码，返回 (body bytes, 响应头 dict)。"""
+    media, coding = variant
+    if media == MSGPACK_MIME:
+        body = msgpack_dumps(obj)
+        headers = {"Content-Type": MSGPACK_MIME}
+    else:
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+
+    if coding == "gzip" and len(body) >= GZIP_MIN_BYTES:
+        body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    headers["Vary"] = "Accept, Accept-Encoding"
+    return body, headers
+
+
+def decode(body, content_type=None, content_encoding=None):
+    """encode 的反向操作 (客户端 / 测试用)。"""
+    if content_encoding == "gzip":
+        body = gzip.decompress(body)
+    if content_type and content_type.split(";")[0].strip().lower() in _MSGPACK_ALIASES:
+        return msgpack_loads(body)
+    return json.loads(body)
+
+
+# ==========================================
+# MessagePack (https://github.com/msgpack/msgpack/blob/master/spec.md)
+# 只实现 JSON 能表示的类型 + bytes：nil / bool / int / float64 / str / bin / array / map
+# ==========================================
+_pack_u8 = struct.Struct(">B").pack
+_pack_u16 = struct.Struct(">BH").pack
+_pack_u32 = struct.Struct(">BI").pack
+_pack_u64 = struct.Struct(">BQ").pack
+_pack_i8 = struct.Struct(">Bb").pack
+_pack_i16 = struct.Struct(">Bh").pack
+_pack_i32 = struct.Struct(">Bi").pack
+_pack_i64 = struct.Struct(">Bq").pack
+_pack_f64 = struct.Struct(">Bd").pack
+
+
+def _pack_len(out, n, fix_tag, fix_max, tag16, tag32, tag8=None):
+    if fix_tag is not None and n <= fix_max:
+        out.append(_pack_u8(fix_tag | n))
+    elif tag8 is not None and n <= 0xFF:
+        out.append(bytes((tag8, n)))
+    elif n <= 0xFFFF:
+        out.append(_pack_u16(tag16, n))
+    else:
+        out.append(_pack_u32(tag32, n))
+
+
+def _pack(obj, out):
+    t = type(obj)
+    if t is str:
+        data = obj.encode("utf-8")
+        _pack_len(out, len(data), 0xA0, 31, 0xDA, 0xDB, tag8=0xD9)
+        out.append(data)
+    elif t is dict:
+        _pack_len(out, len(obj), 0x80, 15, 0xDE, 0xDF)
+        for key, value in obj.items():
+            _pack(key, out)
+            _pack(value, out)
+    elif t is list or t is tuple:
+        _pack_len(out, len(obj), 0x90, 15, 0xDC, 0xDD)
+        for value in obj:
+            _pack(value, out)
+    elif obj is None:
+        out.append(b"\xc0")
+    elif obj is True:
+        out.append(b"\xc3")
+    elif obj is False:
+        out.append(b"\xc2")
+    elif isinstance(obj, int):
+        if 0 <= obj <= 0x7F:
+            out.append(_pack_u8(obj))
+        elif -32 <= obj < 0:
+            out.append(_pack_u8(obj & 0xFF))  # negative fixint
+        elif 0 <= obj <= 0xFF:
+            out.append(bytes((0xCC, obj)))
+        elif 0 <= obj <= 0xFFFF:
+            out.append(_pack_u16(0xCD, obj))
+        elif 0 <= obj <= 0xFFFFFFFF:
+            out.append(_pack_u32(0xCE, obj))
+        elif 0 <= obj <= 0xFFFFFFFFFFFFFFFF:
+            out.append(_pack_u64(0xCF, obj))
+        elif -0x80 <= obj < 0:
+            out.append(_pack_i8(0xD0, obj))
+        elif -0x8000 <= obj < 0:
+            out.append(_pack_i16(0xD1, obj))
+        elif -0x80000000 <= obj < 0:
+            out.append(_pack_i32(0xD2, obj))
+        elif -0x8000000000000000 <= obj < 0:
+            out.append(_pack_i64(0xD3, obj))
+        else:
+            raise OverflowError("Integer out of MessagePack range")
+    elif isinstance(obj, float):
+        out.append(_pack_f64(0xCB, obj))
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        _pack_len(out, len(data), None, 0, 0xC5, 0xC6, tag8=0xC4)
+        out.append(data)
+    elif isinstance(obj, dict):
+        _pack(dict(obj), out)
+    elif isinstance(obj, str):
+        _pack(str(obj), out)
+    elif isinstance(obj, (list, tuple)):
+        _pack(list(obj), out)
+    else:
+        raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+def msgpack_dumps(obj):
+    out = []
+    _pack(obj, out)
+    return b"".join(out)
+
+
+def msgpack_loads(data):
+    data = memoryview(data)
+    obj, end = _unpack(data, 0)
+    if end != len(data):
+        raise ValueError("Extra data after MessagePack object")
+    return obj
+
+
+_unpack_u16 = struct.Struct(">H").unpack_from
+_unpack_u32 = struct.Struct(">I").unpack_from
+_unpack_u64 = struct.Struct(">Q").unpack_from
+_unpack_i8 = struct.Struct(">b").unpack_from
+_unpack_i16 = struct.Struct(">h").unpack_from
+_unpack_i32 = struct.Struct(">i").unpack_from
+_unpack_i64 = struct.Struct(">q").unpack_from
+_unpack_f32 = struct.Struct(">f").unpack_from
+_unpack_f64 = struct.Struct(">d").unpack_from
+
+
+def _unpack(data, pos):
+    tag = data[pos]
+    pos += 1
+    if tag <= 0x7F:
+        return tag, pos
+    if tag >= 0xE0:
+        return tag - 0x100, pos
+    if 0xA0 <= tag <= 0xBF:
+        n = tag & 0x1F
+        return str(data[pos:pos + n], "utf-8"), pos + n
+    if 0x90 <= tag <= 0x9F:
+        return _unpack_array(data, pos, tag & 0x0F)
+    if 0x80 <= tag <= 0x8F:
+        return _unpack_map(data, pos, tag & 0x0F)
+    if tag == 0xC0:
+        return None, pos
+    if tag == 0xC2:
+        return False, pos
+    if tag == 0xC3:
+        return True, pos
+    if tag == 0xCC:
+        return data[pos], pos + 1
+    if tag == 0xCD:
+        return _unpack_u16(data, pos)[0], pos + 2
+    if tag == 0xCE:
+        return _unpack_u32(data, pos)[0], pos + 4
+    if tag == 0xCF:
+        return _unpack_u64(data, pos)[0], pos + 8
+    if tag == 0xD0:
+        return _unpack_i8(data, pos)[0], pos + 1
+    if tag == 0xD1:
+        return _unpack_i16(data, pos)[0], pos + 2
+    if tag == 0xD2:
+        return _unpack_i32(data, pos)[0], pos + 4
+    if tag == 0xD3:
+        return _unpack_i64(data, pos)[0], pos + 8
+    if tag == 0xCA:
+        return _unpack_f32(data, pos)[0], pos + 4
+    if tag == 0xCB:
+        return _unpack_f64(data, pos)[0], pos + 8
+    if tag in (0xD9, 0xDA, 0xDB, 0xC4, 0xC5, 0xC6):
+        if tag in (0xD9, 0xC4):
+            n, pos = data[pos], pos + 1
+        elif tag in (0xDA, 0xC5):
+            n, pos = _unpack_u16(data, pos)[0], pos + 2
+        else:
+            n, pos = _unpack_u32(data, pos)[0], pos + 4
+        raw = data[pos:pos + n]
+        return (str(raw, "utf-8") if tag >= 0xD9 else bytes(raw)), pos + n
+    if tag == 0xDC:
+        return _unpack_array(data, pos + 2, _unpack_u16(data, pos)[0])
+    if tag == 0xDD:
+        return _unpack_array(data, pos + 4, _unpack_u32(data, pos)[0])
+    if tag == 0xDE:
+        return _unpack_map(data, pos + 2, _unpack_u16(data, pos)[0])
+    if tag == 0xDF:
+        return _unpack_map(data, pos + 4, _unpack_u32(data, pos)[0])
+    raise ValueError(f"Unsupported MessagePack type 0x{tag:02x}")
+
+
+def _unpack_array(data, pos, n):
+    items = []
+    for _ in range(n):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data, pos, n):
+    out = {}
+    for _ in range(n):
+        key, pos = _unpack(data, pos)
+        value, pos = _unpack(data, pos)
+        out[key] = value
+    return out, pos
@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+# ==========================================
+# 响应缓存 (ResponseCache)
+# 缓存 GET 查询已经编码好的响应 (body bytes + 响应头，见 content_codec.encode)，
+# key = (path, 规范化后的 query, 编码)，每条记录同时保存生成时对应集合的版本号。
+# 集合被写入后版本号变化，旧记录在下一次读取时即判定为失效，
+# 其他集合的缓存不受影响 (注册 user 不会让 /api/devices 的缓存失效)。
+# ==========================================
+class ResponseCache:
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (revision, body)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(path, params):
+        # ?room=R1&type=wifi 和 ?type=wifi&room=R1 是同一个查询
+        return path, tuple(sorted((k, str(v)) for k, v in params.items()))
+
+    def get_or_build(self, key, revision, build):
+        """
+        命中且版本号一致时直接返回缓存的内容，否则调用 build() 生成并写入缓存。
+        build() 在锁外执行，多个线程同时未命中时可能重复编码一次，但不会互相阻塞。
+        """
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == revision:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        body = build()
+
+        with self.lock:
+            current = self._entries.get(key)
+            # 另一个线程可能已经用更新的版本写入了，不要用旧结果覆盖
+            if current is None or current[0] <= revision:
+                self._entries[key] = (revision, body)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return body
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else None,
+            }
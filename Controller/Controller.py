@@ -6,7 +6,6 @@ from datetime import datetime, timezone
 import cherrypy
 import paho.mqtt.client as mqtt
 import os,sys
-import copy
 
 
 PROJECT_ROOT = os.path.abspath(
@@ -16,24 +15,45 @@ sys.path.insert(0, PROJECT_ROOT)
 
 import OccupancyAnalyzer
 
-import requests
+from Catalog.catalog_client import get_catalog_client
+from Catalog.catalog_store import device_routes
+from Catalog.content_codec import negotiate, encode
+from ingest import IngestQueue
+from snapshot_store import SnapshotStore
+from columnar_store import ColumnarStore
+from decision_engine import DecisionEngine
+from history_store import HistoryStore, DEFAULT_RAW_DEPTH, DEFAULT_RAW_RETENTION, DEFAULT_TIERS
+from TopicMatcher import TopicMatcher
 
 
 class Controller:
+    # 同一个房间两次空调命令之间的最短间隔 (秒)
+    CMD_MIN_INTERVAL = 30
+
     def __init__(self,
                  mqtt_host,
                  mqtt_port,
                  catalog_host: str = "127.0.0.1",
                  catalog_port: int = 8080,
-                 catalog_api_path: str = "/api") -> None:
+                 catalog_api_path: str = "/api",
+                 ingest_queue_size: int = 10000,
+                 ingest_batch_size: int = 500,
+                 ingest_overflow: str = "drop_oldest",
+                 snapshot_layout: str = "dict",
+                 history_depth: int = DEFAULT_RAW_DEPTH,
+                 history_retention: float = DEFAULT_RAW_RETENTION,
+                 history_tiers=DEFAULT_TIERS) -> None:
         # ==========================================
         # 这里base_topic_prefix后续似乎没有用到？需要保留吗 -- Mya
         # ==========================================
         self.base_topic_prefix = "polito/smartcampus"
+        # 由 Catalog 的 topic_structure 编译 (start_mqtt 时)，用于通配符订阅和解析收到的 topic
+        self.topic_matcher = None
 
         self.mqtt_host =mqtt_host
         self.mqtt_port = mqtt_port
         self.catalog_base_url = f"http://{catalog_host}:{catalog_port}{catalog_api_path}"
+        self.catalog = get_catalog_client(self.catalog_base_url)
         self.people_value_topic_by_room = {}
         self.temperature_value_topic_by_room = {}
         self.temperature_cmd_topic_by_room = {}
@@ -41,7 +61,14 @@ class Controller:
         # self.temperature_topic = temperature_topic
         self.latest_people_by_room ={}
         self.latest_temperature_by_room = {}
-        self.latest_by_room = {}
+        # latest_by_room 的不可变版本，每个 ingest 批次发布一次
+        # "dict": 嵌套 dict (见 snapshot_store.py)，默认；
+        # "columnar": slot + NumPy 数组 (见 columnar_store.py)，内存约少 45%，但逐房间查询和写入都比 dict 慢一些
+        if snapshot_layout not in ("columnar", "dict"):
+            raise ValueError(f"snapshot_layout must be 'columnar' or 'dict', got {snapshot_layout!r}")
+        self.snapshots = ColumnarStore() if snapshot_layout == "columnar" else SnapshotStore()
+        # 每个传感器的历史数据 (环形缓冲区 + 降采样层，见 history_store.py)，GET /history 使用
+        self.history = HistoryStore(history_depth, history_retention, history_tiers)
 
         self.ac_state_by_room = {
         # room_id: {
@@ -59,98 +86,204 @@ class Controller:
         self.latest_temperature_received_at = None
 
 
-        self.data_lock = threading.Lock()
+        # 保护三张 topic 表 (MQTT 回调线程和 Catalog 变更线程都会修改)
+        self._topics_lock = threading.Lock()
+        self._watch_thread = None
+        # Catalog 里注册过的 value topic (两张 value 表的并集)。通配符订阅会收到 broker 上任何人发布的消息，
+        # ingest 只接受这里面的 topic；每次修改表之后整体替换，ingest 线程不加锁读取
+        self.accepted_topics = frozenset()
+
+        # MQTT 消息先进有界队列，由 ingest 线程批量写入 snapshots (见 ingest.py)
+        self.ingest = IngestQueue(self._apply_messages, maxsize=ingest_queue_size,
+                                  batch_size=ingest_batch_size, overflow=ingest_overflow)
+        self.ingest_invalid = 0
+        self.ingest_unregistered = 0
 
         self.mqtt_client = mqtt.Client()
 
         self.mqtt_client.on_connect = self._on_mqtt_connect
         self.mqtt_client.on_message = self._on_mqtt_message
 
-        self._decision_thread = None
+        # 空调决策 (start_decision_loop 创建，见 decision_engine.py)
+        self.decision_engine = None
         self._stop_event = threading.Event()
 
 
-    def _catalog_get_devices(self, **query_params) -> list:
-        """
-        GET {catalog_base_url}/devices?...
-        返回 devices 列表（JSON）
-        """
-        url = f"{self.catalog_base_url}/devices"
-        res = requests.get(url, params=query_params, timeout=5)
-        res.raise_for_status()
-        data = res.json()
-        if isinstance(data, list):
-            return data
-        # 如果对方返回单个 dict（按 id 查），这里也兜底成 list
-        return [data]
-
     def refresh_topics_from_catalog(self):
         """
-        从 Catalog 建三张表：
-        - wifi sensors: mqtt_topics["val"] 作为 people 订阅 topic
-        - temperature sensors: mqtt_topics["val"] 作为 temperature 订阅 topic
-        - temperature actuators: mqtt_topics["cmd"] 作为 cmd 发布 topic
+        从 Catalog 的 topic 路由表 (GET /api/topics) 建三张表：
+        - wifi sensors: val topic 作为 people 订阅 topic
+        - temperature sensor 1: val topic 作为 temperature 订阅 topic
+        - temperature actuator 1: cmd topic 作为 cmd 发布 topic
+        max_age=0: 每次都带 ETag 向 Catalog 确认，没变化时只回 304
         """
-        devices = self._catalog_get_devices()  
-        
+        table = self.catalog.get_topics(max_age=0)["topics"]
 
         people_map = {}
         temp_val_map = {}
         temp_cmd_map = {}
+        maps = {"people": people_map, "temp_val": temp_val_map, "temp_cmd": temp_cmd_map}
 
-        for dev in devices:
-            dev_type = dev.get("type")
-            dev_id = dev.get("id", "")
-            room_id = dev.get("location", {}).get("room")
-            mqtt_topics = dev.get("mqtt_topics", {})
-
-            if not room_id:
-                continue
-
-            # wifi sensor -> people value topic
-            if dev_type == "wifi" and "val" in mqtt_topics:
-                people_map[room_id] = mqtt_topics["val"]
-
-            # temperature sensor -> temperature value topic
-            if dev_type == "temperature" and dev_id.endswith("_sensor_1") and "val" in mqtt_topics:
-                temp_val_map[room_id] = mqtt_topics["val"]
-
-            # temperature actuator -> cmd topic
-            if dev_type == "temperature" and dev_id.endswith("_actuator_1") and "cmd" in mqtt_topics:
-                temp_cmd_map[room_id] = mqtt_topics["cmd"]
+        for topic, route in table.items():
+            map_name = self._route_map_name(route)
+            if map_name:
+                maps[map_name][route["room"]] = topic
 
-        self.people_value_topic_by_room = people_map
-        self.temperature_value_topic_by_room = temp_val_map
-        self.temperature_cmd_topic_by_room = temp_cmd_map
+        with self._topics_lock:
+            self.people_value_topic_by_room = people_map
+            self.temperature_value_topic_by_room = temp_val_map
+            self.temperature_cmd_topic_by_room = temp_cmd_map
+            self._update_accepted_topics()
 
         print("[Catalog] topics loaded:")
         print("  wifi(value) rooms:", sorted(self.people_value_topic_by_room.keys()))
         print("  temp(value) rooms:", sorted(self.temperature_value_topic_by_room.keys()))
         print("  temp(cmd)   rooms:", sorted(self.temperature_cmd_topic_by_room.keys()))
 
+    @staticmethod
+    def _route_map_name(route: dict):
+        """路由表里的一条 route 属于哪张表 ("people" / "temp_val" / "temp_cmd")，都不属于时返回 None。"""
+        if not route.get("room"):
+            return None
+        dev_type, role, index, resource = route["type"], route["role"], route["index"], route["resource"]
+        # wifi sensor -> people value topic
+        if dev_type == "wifi" and resource == "val":
+            return "people"
+        # temperature sensor -> temperature value topic
+        if dev_type == "temperature" and role == "sensor" and index == "1" and resource == "val":
+            return "temp_val"
+        # temperature actuator -> cmd topic
+        if dev_type == "temperature" and role == "actuator" and index == "1" and resource == "cmd":
+            return "temp_cmd"
+        return None
+
+    @classmethod
+    def _device_topic_entries(cls, dev: dict) -> list:
+        """一个 Catalog 设备 (变更事件里的 doc) 对应的 (表名, room_id, topic)，规则和路由表相同。"""
+        entries = []
+        for topic, route in device_routes(dev):
+            map_name = cls._route_map_name(route)
+            if map_name:
+                entries.append((map_name, route["room"], topic))
+        return entries
+
+    def _update_accepted_topics(self):
+        # 调用方已持有 self._topics_lock (或者还没有其他线程在用这些表)
+        self.accepted_topics = frozenset(self.people_value_topic_by_room.values()) | frozenset(
+            self.temperature_value_topic_by_room.values())
+
+    def _topic_map(self, map_name: str) -> dict:
+        return {
+            "people": self.people_value_topic_by_room,
+            "temp_val": self.temperature_value_topic_by_room,
+            "temp_cmd": self.temperature_cmd_topic_by_room,
+        }[map_name]
+
+    # ------------------------------------------
+    # Catalog 变更订阅 (GET /api/devices/_changes 长轮询)
+    # 新注册 / 删除的设备在 1 秒内生效，不需要等 MQTT 重连
+    # ------------------------------------------
+    def start_catalog_watch(self, poll_timeout: float = 25.0):
+        if self._watch_thread is not None:
+            return
+
+        self._watch_thread = threading.Thread(target=self._catalog_watch_loop, args=(poll_timeout,), daemon=True)
+        self._watch_thread.start()
+
+    def _catalog_watch_loop(self, poll_timeout: float):
+        since = None
+        epoch = None
+
+        while not self._stop_event.is_set():
+            try:
+                params = {"timeout": poll_timeout}
+                if since is not None:
+                    params["since"] = since
+                    params["epoch"] = epoch
+                res = self.catalog.request("GET", "/devices/_changes", params=params, timeout=poll_timeout + 10)
+                res.raise_for_status()
+                feed = res.json()
+            except Exception as e:
+                print(f"[Catalog] change feed error: {e}, retrying in 2s")
+                self._stop_event.wait(2)
+                continue
+
+            if feed["reset"]:
+                # 第一次或者漏掉了变更：全量刷新一次，再从 feed["revision"] 继续
+                # (MQTT 用通配符订阅，topic 表变化不需要重新订阅)
+                try:
+                    self.refresh_topics_from_catalog()
+                except Exception as e:
+                    print(f"[Catalog] refresh_topics_from_catalog failed: {e}")
+                    self._stop_event.wait(2)
+                    continue
+            else:
+                for event in feed["events"]:
+                    self._apply_catalog_event(event)
+
+            since = feed["revision"]
+            epoch = feed["epoch"]
+
+    def _apply_catalog_event(self, event: dict):
+        removed = []
+        added = []
+        if event["op"] in ("update", "remove"):
+            removed = self._device_topic_entries(event.get("previous") or event["doc"])
+        if event["op"] in ("register", "update"):
+            added = self._device_topic_entries(event["doc"])
+
+        with self._topics_lock:
+            for map_name, room_id, topic in removed:
+                topic_map = self._topic_map(map_name)
+                if topic_map.get(room_id) == topic and (map_name, room_id, topic) not in added:
+                    del topic_map[room_id]
+                    print(f"[Catalog] {event['id']} removed: {room_id} {map_name} -> {topic}")
+
+            for map_name, room_id, topic in added:
+                topic_map = self._topic_map(map_name)
+                old_topic = topic_map.get(room_id)
+                if old_topic == topic:
+                    continue
+                topic_map[room_id] = topic
+                print(f"[Catalog] {event['id']} registered: {room_id} {map_name} -> {topic}")
+
+            if removed or added:
+                self._update_accepted_topics()
+
+    # 传感器发布到 {topic_structure}/value (见 Sensors/devices_base.py)
+    DEFAULT_TOPIC_STRUCTURE = "polito/smartcampus/{room_id}/{device_type}/{index_number}"
+    SENSOR_VALUE_SUFFIX = "/value"
+    # 需要订阅的传感器类型：每种一个通配符订阅，和房间数无关
+    SUBSCRIBED_DEVICE_TYPES = ("wifi", "temperature")
+
+    def _load_topic_matcher(self) -> TopicMatcher:
+        """从 Catalog 的 mqtt 服务读取 topic_structure，失败时使用默认模板。"""
+        structure = self.DEFAULT_TOPIC_STRUCTURE
+        try:
+            service = self.catalog.find_service("mqtt")
+            if service and service.get("endpoint", {}).get("topic_structure"):
+                structure = service["endpoint"]["topic_structure"]
+        except Exception as e:
+            print(f"[Catalog] topic_structure lookup failed ({e}), using {structure}")
+        return TopicMatcher(structure + self.SENSOR_VALUE_SUFFIX)
+
     def _parse_topic(self, topic: str):
             """
-            topic 格式：{base_topic_prefix}/{room_id}/{device_type}/{index_number}
+            topic 格式：{topic_structure}/value，前缀层数不限
             返回 (room_id, device_type, index_number)，解析失败返回 None
             """
-            parts = topic.split("/")
-            if len(parts) < 4:
+            fields = self.topic_matcher.match(topic)
+            if fields is None:
                 return None
-
-            room_id = parts[-4]
-            device_type = parts[-3]
-            index_number = parts[-2]
-            tail = parts[-1]
-
-            if tail != "value":
-                return None
-
-            return room_id, device_type, index_number
+            return fields["room_id"], fields["device_type"], fields["index_number"]
 
 
 
     def start_mqtt(self):
         print("MQTT connecting to", self.mqtt_host, self.mqtt_port)
+        if self.topic_matcher is None:
+            self.topic_matcher = self._load_topic_matcher()
+        self.ingest.start()
 
         self.mqtt_client.connect(self.mqtt_host,self.mqtt_port,keepalive=60)
         self.mqtt_client.loop_start()
@@ -164,51 +297,78 @@ class Controller:
             # 刷新失败就不订阅，避免订阅错 topic
             return
 
-        # 订阅 wifi(value) 和 temperature(value)
-        for room_id, topic in self.people_value_topic_by_room.items():
-            client.subscribe(topic)
-        for room_id, topic in self.temperature_value_topic_by_room.items():
-            client.subscribe(topic)
+        # 订阅 wifi(value) 和 temperature(value)：每种类型一个通配符订阅，
+        # 没有在 Catalog 注册的设备发来的消息在 _apply_messages 里丢掉
+        for device_type in self.SUBSCRIBED_DEVICE_TYPES:
+            client.subscribe(self.topic_matcher.subscription(device_type=device_type))
 
         #print("[MQTT] subscribed to wifi/value and temperature/value topics from Catalog")
 
     def _on_mqtt_message(self,client,userdata,msg):
-        parsed = self._parse_topic(msg.topic)
-
+        # 在 paho 的网络线程里只入队，解析和写入在 ingest 线程里批量进行
+        self.ingest.put((msg.topic, msg.payload, time.time()))
+
+    def _apply_messages(self, batch: list):
+        """ingest 线程：解析一批 (topic, payload, received_at)，整批写入后发布一个新快照。"""
+        updates = []
+        accepted = self.accepted_topics
+        for topic, payload, received_at in batch:
+            if topic not in accepted:
+                self.ingest_unregistered += 1
+                continue
+            parsed = self._parse_topic(topic)
+            if parsed is None:
+                continue
+            try :
+                payload_data = json.loads(payload.decode("utf-8"))
+                # print(f"[MQTT] {topic} -> {payload_data}")
+            except Exception:
+                self.ingest_invalid += 1
+                continue
+            if not isinstance(payload_data, dict):
+                self.ingest_invalid += 1
+                continue
 
-        if parsed is None:
-            return
-        room_id,device_type, index_number =parsed
-        #print(f"[MQTT] parsed room_id type={type(room_id)} value={room_id}")
-        try :
-            payload_text =msg.payload.decode("utf-8")
-            payload_data = json.loads(payload_text)
-            # print(f"[MQTT] {msg.topic} -> {payload_data}")
-        except Exception:
-            return
-        
-        sensor_id = payload_data.get("id")
-        value = payload_data.get("v")
-        unit = payload_data.get("u")
-        sensor_timestamp = payload_data.get("t")
-        
-        received_at = time.time()
-
-        with self.data_lock:
-            room_bucket = self.latest_by_room.setdefault(room_id,{})
-            type_bucket = room_bucket.setdefault(device_type,{})
-            type_bucket[index_number]={
-                "sensor_id": sensor_id,
-                "value": value,
-                "unit": unit,
-                "sensor_timestamp": sensor_timestamp,
+            room_id, device_type, index_number = parsed
+            updates.append((room_id, device_type, index_number, {
+                "sensor_id": payload_data.get("id"),
+                "value": payload_data.get("v"),
+                "unit": payload_data.get("u"),
+                "sensor_timestamp": payload_data.get("t"),
                 "received_at": received_at
-            }
-
-    def get_snapshot(self) -> dict:
-        """Return a deep copy of latest data snapshot."""
-        with self.data_lock:
-            return copy.deepcopy(self.latest_by_room)
+            }))
+
+        self.snapshots.apply(updates)
+        self.history.add_many((room_id, device_type, index_number, item["received_at"], item["value"])
+                              for room_id, device_type, index_number, item in updates)
+
+        engine = self.decision_engine
+        if engine is not None and updates:
+            # 有新数据的房间交给决策引擎 (event 模式下立即重新计算这些房间)
+            dirty = {}
+            for room_id, _, _, item in updates:
+                received_at = item["received_at"]
+                if room_id not in dirty or received_at < dirty[room_id]:
+                    dirty[room_id] = received_at
+            engine.mark_dirty(dirty)
+
+    def ingest_stats(self) -> dict:
+        stats = self.ingest.stats()
+        stats["invalid"] = self.ingest_invalid
+        stats["unregistered"] = self.ingest_unregistered
+        return stats
+
+    @property
+    def latest_by_room(self):
+        return self.snapshots.current()
+
+    def get_snapshot(self):
+        """Return the latest data snapshot (read-only Mapping, shared between callers; no copy)."""
+        return self.snapshots.current()
+
+    def get_snapshot_dict(self) -> dict:
+        """The latest snapshot as plain nested dicts (for JSON / MessagePack responses)."""
+        return self.snapshots.as_dict()
     
     def send_ac_cmd(self,room_id,should_on:bool,
                     
@@ -250,7 +410,7 @@ class Controller:
         last_sent_at = room_state.get("last_cmd_sent_at")
         last_decision = room_state["last_cmd_sent_on"]
         should_on = room_state.get("should_on")
-        MIN_INTERVAL = 30
+        MIN_INTERVAL = self.CMD_MIN_INTERVAL
         if last_sent_at is None:
             return True
         if last_decision == should_on or should_on is None:
@@ -261,7 +421,9 @@ class Controller:
         """
         ac_decision_by_room:
         {room_id: {"decide": True/False/None, "decide_time": float}}
+        返回这次发出了命令的 room_id 列表
         """
+        sent = []
         for room_id, decision in ac_decision_by_room.items():
             #print("[DEBUG decision keys]", room_id, list(decision.keys()))
 
@@ -287,38 +449,31 @@ class Controller:
 
             state["last_cmd_sent_on"] = should_on
             state["last_cmd_sent_at"] = decided_at
+            sent.append(room_id)
             print(f"{room_id} HVAC open {state['last_cmd_sent_on']} at {datetime.fromtimestamp(state['last_cmd_sent_at'])}")
+        return sent
 
-    def start_decision_loop(self, interval_seconds: float = 5.0):
+    def start_decision_loop(self, interval_seconds: float = 5.0, mode: str = "sweep", max_age: float = 60.0):
         """
-        每隔 interval_seconds:
-        - 取一次 snapshot
-        - 交给 OccupancyAnalyzer 算“是否建议开空调”
-        - 调用 apply_ac_decisions -> 触发 publish cmd
+        mode="sweep": 每隔 interval_seconds 取一次 snapshot，所有房间交给 OccupancyAnalyzer 算
+                      “是否建议开空调”，再调用 apply_ac_decisions -> 触发 publish cmd
+        mode="event": 只在房间有新数据 / 课表时间段边界 / 超过 max_age 秒没算过 / 节流结束时
+                      重新计算这些房间 (见 decision_engine.py)
         """
-        if self._decision_thread is not None:
+        if self.decision_engine is not None:
             return  # 防止重复启动
 
-        def loop():
-            while not self._stop_event.is_set():
-                try:
-                    request_timestamp = datetime.now(timezone.utc).timestamp()
-                    snapshot = self.get_snapshot()
-                    ac_decision_by_room = OccupancyAnalyzer.deciede_ac_from_room_info(request_timestamp,snapshot)
-                    self.apply_ac_decisions(ac_decision_by_room, self.ac_state_by_room)
-                    print("[cmd]in the loop")
-                except Exception as e:
-                    import traceback
-                    print(f"[DecisionLoop] error: {e}")
-                    traceback.print_exc()
-
-                time.sleep(interval_seconds)
+        self.decision_engine = DecisionEngine(self, mode=mode, interval_seconds=interval_seconds,
+                                              max_age=max_age).start()
 
-        self._decision_thread = threading.Thread(target=loop, daemon=True)
-        self._decision_thread.start()
+    def decision_stats(self) -> dict:
+        return self.decision_engine.stats() if self.decision_engine else {"mode": None}
     
     def stop(self):
         self._stop_event.set()
+        self.ingest.stop()
+        if self.decision_engine is not None:
+            self.decision_engine.stop()
 
 
 
@@ -337,20 +492,50 @@ class RestAPI:
     def GET(self,*uri, **params):
         request_timestamp = datetime.now(timezone.utc).timestamp()
 
+        # GET /debug/ingest : MQTT 接收队列的状态 (速率、队列深度、丢弃数)
+        if len(uri) >= 2 and uri[0] == "debug" and uri[1] == "ingest":
+            return self._respond(self.controller.ingest_stats())
+
+        # GET /debug/decisions : 决策引擎的模式、decisions/s、数据到达 -> 命令的延迟
+        if len(uri) >= 2 and uri[0] == "debug" and uri[1] == "decisions":
+            return self._respond(self.controller.decision_stats())
+
+        # GET /debug/history : 历史缓冲区的传感器数、内存、各层配置
+        if len(uri) >= 2 and uri[0] == "debug" and uri[1] == "history":
+            return self._respond(self.controller.history.stats())
+
+        # GET /history?room=R1&type=temperature&index=1&from=...&to=...&step=60
+        if len(uri) >= 1 and uri[0] == "history":
+            return self._respond(self._history(**params))
+
         snapshot = self.controller.get_snapshot()
 
         if len(uri) >= 2 and uri[0] == "debug" and uri[1] == "cache":
-            snapshot = self.controller.get_snapshot()
-            cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
-            return json.dumps(snapshot, ensure_ascii=False).encode("utf-8")
+            return self._respond(self.controller.get_snapshot_dict())
         
 
         #之后把数据处理的参数改为2个，snapshot和request_timestamp
         result_list = OccupancyAnalyzer.get_student_dashboard_response(request_timestamp,snapshot)
 
-        cherrypy.response.headers["Content-Type"] = "application/json; charset=utf-8"
+        return self._respond(result_list)
 
-        return json.dumps(result_list,ensure_ascii=False).encode("utf-8")
+    def _history(self, room=None, type=None, index=None, **params):
+        if not room:
+            raise cherrypy.HTTPError(400, "Missing room")
+        try:
+            start, end, step = (float(params[k]) if params.get(k) not in (None, "") else None
+                                for k in ("from", "to", "step"))
+            return self.controller.history.query(room, type or None, index or None, start, end, step)
+        except ValueError as e:
+            raise cherrypy.HTTPError(400, f"Invalid history query: {e}")
+
+    @staticmethod
+    def _respond(obj):
+        # 默认 JSON；Accept: application/msgpack 时返回 MessagePack，Accept-Encoding: gzip 时压缩
+        headers = cherrypy.request.headers
+        body, response_headers = encode(obj, negotiate(headers.get("Accept"), headers.get("Accept-Encoding")))
+        cherrypy.response.headers.update(response_headers)
+        return body
     
     
 def main():
@@ -366,7 +551,10 @@ def main():
     )
 
     controller.start_mqtt()
-    controller.start_decision_loop(interval_seconds=5)
+    # 通过 Catalog 的变更订阅增量发现新设备
+    controller.start_catalog_watch()
+    # 有新数据的房间立即重新决策，不再每 5 秒全部重算
+    controller.start_decision_loop(mode="event")
 
 
     config={
@@ -0,0 +1,381 @@
+import sys
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+
+# ==========================================
+# 列式的最新值存储 (ColumnarStore)
+#
+# 和 SnapshotStore 接口相同 (apply / current / versioned / version / as_dict)，
+# 但不再是 room -> type -> index -> 5 个 key 的 dict：
+#   - (room_id, device_type, index_number) 第一次出现时分配一个整数 slot (只增不减)
+#   - slot 按 CHUNK_SIZE 个一组分块 (_Chunk)，每块里 value / received_at / sensor_timestamp
+#     是 float64 数组，sensor_id / unit 是 list (unit 只有几种，intern 后共用)
+#   - 不是数字的 value / sensor_timestamp (None 以外) 放在块里一个很小的 dict 里，数组里是 NaN
+#
+# 写入 (每个 ingest 批次一次) 仍然是 copy-on-write，但只拷贝这一批写到的块 (每块约 40KB)
+# 和块列表本身 (每 CHUNK_SIZE 个传感器一个指针)，和传感器总数基本无关；
+# 写完发布新的 ColumnarSnapshot，没有写到的块和旧版本共享。读不加锁、不拷贝。
+# slot 表、room/type 编码只追加，已发布的快照只看 slot < size 的部分，所以可以共享。
+# 向量化查询 (latest_values) 需要连续数组时才把各块拼起来，每个快照最多拼一次。
+#
+# ColumnarSnapshot 是只读 Mapping，snapshot[room][type][index] 返回和原来一样的 dict，
+# pick_latest_value() 等旧代码不用修改；需要快的地方用 latest_value() / latest_values()。
+# ==========================================
+INITIAL_CAPACITY = 1024
+CHUNK_BITS = 10
+CHUNK_SIZE = 1 << CHUNK_BITS  # 每块 1024 个 slot
+_CHUNK_MASK = CHUNK_SIZE - 1
+
+_NAN = float("nan")
+_INT_TYPES = (int, np.integer)
+_NUMBER_TYPES = (int, float, np.integer, np.floating)
+
+
+def _is_number(value):
+    return isinstance(value, _NUMBER_TYPES) and not isinstance(value, bool)
+
+
+class _SlotTable:
+    """(room_id, device_type, index_number) -> slot，只追加。只在写锁里修改。"""
+
+    def __init__(self):
+        self.slot_of = {}
+        self.keys = []
+        # room 编码 -> 这个房间的 [slot, ...] (每个房间只有几个传感器，不再按类型分一层 dict)
+        self.room_slots = []
+        # 按 room / type 编码的每个 slot，向量化查询用
+        self.room_ids = []
+        self.room_code_of = {}
+        self.type_names = []
+        self.type_code_of = {}
+        self.room_code = np.zeros(INITIAL_CAPACITY, dtype=np.int32)
+        self.type_code = np.zeros(INITIAL_CAPACITY, dtype=np.int16)
+
+    def intern(self, key):
+        slot = self.slot_of.get(key)
+        if slot is not None:
+            return slot
+
+        room_id, device_type, index_number = key
+        slot = len(self.keys)
+        if slot >= len(self.room_code):
+            # 扩容时换新数组：旧快照引用的是旧数组，不受影响
+            self.room_code = np.concatenate([self.room_code, np.zeros_like(self.room_code)])
+            self.type_code = np.concatenate([self.type_code, np.zeros_like(self.type_code)])
+
+        room_code = self.room_code_of.get(room_id)
+        if room_code is None:
+            room_code = self.room_code_of[room_id] = len(self.room_ids)
+            self.room_ids.append(room_id)
+            self.room_slots.append([])
+        type_code = self.type_code_of.get(device_type)
+        if type_code is None:
+            type_code = self.type_code_of[device_type] = len(self.type_names)
+            self.type_names.append(device_type)
+        # 同一个房间 / 类型的 key 共用一份字符串 (index 只有 "1", "2" 这几种)
+        key = room_id, device_type, index_number = (
+            self.room_ids[room_code], self.type_names[type_code], sys.intern(str(index_number)))
+        self.room_code[slot] = room_code
+        self.type_code[slot] = type_code
+
+        self.keys.append(key)
+        self.room_slots[room_code].append(slot)
+        self.slot_of[key] = slot
+        return slot
+
+
+class _Chunk:
+    """CHUNK_SIZE 个 slot 的所有列。已经发布的块不再修改，写入前先 copy()。"""
+
+    __slots__ = ("value", "received_at", "sensor_timestamp", "value_is_int", "sensor_id", "unit", "objects")
+
+    def __init__(self, value, received_at, sensor_timestamp, value_is_int, sensor_id, unit, objects):
+        self.value = value
+        self.received_at = received_at
+        self.sensor_timestamp = sensor_timestamp
+        self.value_is_int = value_is_int
+        self.sensor_id = sensor_id
+        self.unit = unit
+        # (块内 offset, "value" / "sensor_timestamp") -> 不是数字的原始值
+        self.objects = objects
+
+    @classmethod
+    def empty(cls):
+        return cls(np.full(CHUNK_SIZE, np.nan), np.zeros(CHUNK_SIZE), np.full(CHUNK_SIZE, np.nan),
+                   np.zeros(CHUNK_SIZE, dtype=bool), [None] * CHUNK_SIZE, [None] * CHUNK_SIZE, {})
+
+    def copy(self):
+        return _Chunk(self.value.copy(), self.received_at.copy(), self.sensor_timestamp.copy(),
+                      self.value_is_int.copy(), self.sensor_id[:], self.unit[:], dict(self.objects))
+
+
+class ColumnarSnapshot(Mapping):
+    """某个版本的只读视图。snapshot[room_id][device_type][index_number] -> SnapshotItem dict。"""
+
+    __slots__ = ("version", "size", "_n_rooms", "_table", "_room_code", "_type_code",
+                 "_chunks", "_columns", "_latest")
+
+    def __init__(self, version, size, table, chunks):
+        self.version = version
+        self.size = size
+        # 在写锁里创建，这时 room_ids 正好是这个版本里有的房间
+        self._n_rooms = len(table.room_ids)
+        self._table = table
+        self._room_code = table.room_code
+        self._type_code = table.type_code
+        self._chunks = chunks
+        # 列名 -> 拼接好的连续数组 (长度 size)，向量化查询第一次用到时生成
+        self._columns = {}
+        # device_type -> {room_id: 最新 value}，快照不可变，算一次就可以一直用
+        self._latest = {}
+
+    def _column(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            parts = [getattr(chunk, name) for chunk in self._chunks]
+            column = np.concatenate(parts)[:self.size] if parts else np.empty(0)
+            self._columns[name] = column
+        return column
+
+    # ------------------------------------------
+    # 单个 slot -> 原来的 SnapshotItem 格式
+    # ------------------------------------------
+    def _value(self, chunk, offset):
+        raw = chunk.objects.get((offset, "value"), self)
+        if raw is not self:
+            return raw
+        value = chunk.value[offset]
+        if value != value:  # NaN: 没有值
+            return None
+        return int(value) if chunk.value_is_int[offset] else float(value)
+
+    def _item(self, slot):
+        chunk, offset = self._chunks[slot >> CHUNK_BITS], slot & _CHUNK_MASK
+        timestamp = chunk.objects.get((offset, "sensor_timestamp"), self)
+        if timestamp is self:
+            timestamp = chunk.sensor_timestamp[offset]
+            timestamp = None if timestamp != timestamp else float(timestamp)
+        return {
+            "sensor_id": chunk.sensor_id[offset],
+            "value": self._value(chunk, offset),
+            "unit": chunk.unit[offset],
+            "sensor_timestamp": timestamp,
+            "received_at": float(chunk.received_at[offset]),
+        }
+
+    def _room_slots(self, room_id):
+        room_code = self._table.room_code_of.get(room_id)
+        if room_code is None or room_code >= self._n_rooms:
+            return []
+        # slot 表是共享的，之后版本新增的 slot 在这个版本里不存在
+        return [s for s in self._table.room_slots[room_code] if s < self.size]
+
+    def _slots(self, room_id, device_type):
+        keys = self._table.keys
+        return [s for s in self._room_slots(room_id) if keys[s][1] == device_type]
+
+    # ------------------------------------------
+    # Mapping (兼容原来的嵌套 dict)
+    # ------------------------------------------
+    def __getitem__(self, room_id):
+        room_code = self._table.room_code_of.get(room_id)
+        if room_code is None or room_code >= self._n_rooms:
+            raise KeyError(room_id)
+        return _RoomView(self, room_id)
+
+    def __iter__(self):
+        return iter(self._table.room_ids[:self._n_rooms])
+
+    def __len__(self):
+        return self._n_rooms
+
+    def to_dict(self) -> dict:
+        """展开成原来的嵌套 dict (JSON 输出用)。"""
+        out = {}
+        keys = self._table.keys
+        for slot in range(self.size):
+            room_id, device_type, index_number = keys[slot]
+            out.setdefault(room_id, {}).setdefault(device_type, {})[index_number] = self._item(slot)
+        return out
+
+    # ------------------------------------------
+    # 快速查询
+    # ------------------------------------------
+    def latest_value(self, room_id, device_type):
+        """同 pick_latest_value()：这个房间这种类型里 received_at 最新的那个 value。"""
+        latest = self._latest.get(device_type)
+        if latest is None:
+            # 调用方一般会把所有房间都查一遍，第一次就一起算出来
+            latest = self.latest_values(device_type)
+        return latest.get(room_id)
+
+    def latest_values(self, device_type) -> dict:
+        """所有房间一次算完：{room_id: 最新 value}，结果和 pick_latest_value() 逐个房间算的相同。"""
+        latest = self._latest.get(device_type)
+        if latest is not None:
+            return latest
+
+        type_code = self._table.type_code_of.get(device_type)
+        slots = np.empty(0, dtype=np.intp)
+        if type_code is not None and self.size:
+            slots = np.flatnonzero(self._type_code[:self.size] == type_code)
+        rooms = self._room_code[slots]
+        # 按房间分组，组内 received_at 从新到旧；lexsort 稳定，时间相同时取 slot 小的 (和 dict 顺序一致)
+        order = np.lexsort((-self._column("received_at")[slots], rooms))
+        slots, rooms = slots[order], rooms[order]
+        first = np.flatnonzero(np.r_[True, rooms[1:] != rooms[:-1]]) if len(slots) else slots
+        slots, rooms = slots[first], rooms[first]
+
+        room_ids = self._table.room_ids
+        values = self._column("value")[slots].tolist()
+        is_int = self._column("value_is_int")[slots].tolist()
+        latest = {}
+        for room, slot, value, as_int in zip(rooms.tolist(), slots.tolist(), values, is_int):
+            if value != value:  # NaN: None 或者不是数字的 value
+                value = self._chunks[slot >> CHUNK_BITS].objects.get((slot & _CHUNK_MASK, "value"))
+            elif as_int:
+                value = int(value)
+            latest[room_ids[room]] = value
+        self._latest[device_type] = latest
+        return latest
+
+
+class _RoomView(Mapping):
+    __slots__ = ("_snap", "_room_id")
+
+    def __init__(self, snap, room_id):
+        self._snap = snap
+        self._room_id = room_id
+
+    def _types(self):
+        keys = self._snap._table.keys
+        return list(dict.fromkeys(keys[s][1] for s in self._snap._room_slots(self._room_id)))
+
+    def __getitem__(self, device_type):
+        if not self._snap._slots(self._room_id, device_type):
+            raise KeyError(device_type)
+        return _TypeView(self._snap, self._room_id, device_type)
+
+    def __iter__(self):
+        return iter(self._types())
+
+    def __len__(self):
+        return len(self._types())
+
+
+class _TypeView(Mapping):
+    __slots__ = ("_snap", "_by_index")
+
+    def __init__(self, snap, room_id, device_type):
+        self._snap = snap
+        keys = snap._table.keys
+        self._by_index = {keys[s][2]: s for s in snap._slots(room_id, device_type)}
+
+    def __getitem__(self, index_number):
+        return self._snap._item(self._by_index[index_number])
+
+    def __iter__(self):
+        return iter(self._by_index)
+
+    def __len__(self):
+        return len(self._by_index)
+
+
+class ColumnarStore:
+    def __init__(self):
+        self._write_lock = threading.Lock()
+        self._table = _SlotTable()
+        self._published = ColumnarSnapshot(0, 0, self._table, ())
+
+    @property
+    def version(self) -> int:
+        return self._published.version
+
+    def current(self) -> ColumnarSnapshot:
+        return self._published
+
+    def versioned(self):
+        snap = self._published
+        return snap.version, snap
+
+    def as_dict(self) -> dict:
+        return self._published.to_dict()
+
+    def apply(self, updates) -> int:
+        """写入一批 (room_id, device_type, index_number, item)，发布新的快照，返回新的 version。"""
+        updates = list(updates)
+        if not updates:
+            return self.version
+
+        with self._write_lock:
+            old = self._published
+            table = self._table
+            slots = [table.intern((room_id, device_type, index_number))
+                     for room_id, device_type, index_number, _ in updates]
+
+            size = len(table.keys)
+            chunks = list(old._chunks)
+            while len(chunks) * CHUNK_SIZE < size:
+                chunks.append(None)
+            # 同一个 slot 在一批里出现多次时只保留最后一条
+            latest = {}
+            for slot, (_, _, _, item) in zip(slots, updates):
+                latest[slot] = item
+            # 只拷贝这一批写到的块，同一个块只拷贝一次
+            for i in {slot >> CHUNK_BITS for slot in latest}:
+                chunks[i] = _Chunk.empty() if chunks[i] is None else chunks[i].copy()
+
+            # 数字列先收集成 list，最后按块一次性写进数组 (比逐个元素写 NumPy 数组快得多)
+            values, value_is_int, timestamps, received_at = [], [], [], []
+            for slot, item in latest.items():
+                chunk, offset = chunks[slot >> CHUNK_BITS], slot & _CHUNK_MASK
+                objects = chunk.objects
+                if objects:
+                    objects.pop((offset, "value"), None)
+                    objects.pop((offset, "sensor_timestamp"), None)
+
+                v = item.get("value")
+                if _is_number(v):
+                    values.append(v)
+                    value_is_int.append(isinstance(v, _INT_TYPES))
+                else:
+                    values.append(_NAN)
+                    value_is_int.append(False)
+                    if v is not None:
+                        objects[(offset, "value")] = v
+
+                t = item.get("sensor_timestamp")
+                if _is_number(t):
+                    timestamps.append(t)
+                else:
+                    timestamps.append(_NAN)
+                    if t is not None:
+                        objects[(offset, "sensor_timestamp")] = t
+
+                received = item.get("received_at")
+                received_at.append(received if _is_number(received) else 0.0)
+                chunk.sensor_id[offset] = item.get("sensor_id")
+                chunk.unit[offset] = self._intern_str(item.get("unit"))
+
+            slot_array = np.fromiter(latest, dtype=np.intp, count=len(latest))
+            columns = (("value", np.array(values, dtype=np.float64)),
+                       ("value_is_int", np.array(value_is_int, dtype=bool)),
+                       ("sensor_timestamp", np.array(timestamps, dtype=np.float64)),
+                       ("received_at", np.array(received_at, dtype=np.float64)))
+            chunk_index = slot_array >> CHUNK_BITS
+            order = np.argsort(chunk_index, kind="stable")
+            bounds = np.flatnonzero(np.diff(chunk_index[order])) + 1
+            for group in np.split(order, bounds):
+                chunk = chunks[chunk_index[group[0]]]
+                offsets = slot_array[group] & _CHUNK_MASK
+                for name, data in columns:
+                    getattr(chunk, name)[offsets] = data[group]
+
+            self._published = ColumnarSnapshot(old.version + 1, size, table, tuple(chunks))
+            return old.version + 1
+
+    @staticmethod
+    def _intern_str(value):
+        return sys.intern(value) if type(value) is str else value
@@ -5,7 +5,6 @@ from datetime import datetime, timezone
 
 import cherrypy
 import paho.mqtt.client as mqtt
-import copy
 import requests
 import os, sys
 
@@ -15,6 +14,7 @@ PROJECT_ROOT = os.path.abspath(
 sys.path.insert(0, PROJECT_ROOT)
 
 from Catalog.config_loader import RoomConfigLoader
+from snapshot_store import SnapshotStore
 
 
 # =========================
@@ -41,15 +41,14 @@ class Controller:
         self.temperature_value_topic_by_room = {}
         self.temperature_cmd_topic_by_room = {}
 
-        self.latest_by_room = {}
+        # 最新数据的不可变快照，读的时候不需要拷贝 (见 snapshot_store.py)
+        self.snapshots = SnapshotStore()
         
         # 从配置文件加载房间容量
         self.room_capacity = {}
         self.config_loader = RoomConfigLoader(config_filename)
         self._load_room_capacities()
 
-        self.data_lock = threading.Lock()
-
         self.mqtt_client = mqtt.Client()
         self.mqtt_client.on_connect = self._on_mqtt_connect
         self.mqtt_client.on_message = self._on_mqtt_message
@@ -66,6 +65,7 @@ class Controller:
 
     def _load_room_capacities(self):
         """从配置文件加载房间容量"""
+        self._room_config_version = self.config_loader.version
         try:
             rooms = self.config_loader.get_rooms()
             for room in rooms:
@@ -86,36 +86,33 @@ class Controller:
     # -------------------------
     # Catalog
     # -------------------------
-    def _catalog_get_devices(self, **query_params) -> list:
+    def _catalog_get_topics(self, **query_params) -> dict:
+        """GET /api/topics: Catalog 维护的 topic 路由表 {topic: {room, type, role, index, resource, device}}"""
         try:
-            url = f"{self.catalog_base_url}/devices"
-            res = requests.get(url, params=query_params, timeout=5)
+            res = requests.get(f"{self.catalog_base_url}/topics", params=query_params, timeout=5)
             res.raise_for_status()
-            data = res.json()
-            return data if isinstance(data, list) else [data]
+            return res.json().get("topics", {})
         except Exception as e:
             print(f"[Catalog] Error: {e}")
-            return []
+            return {}
 
     def refresh_topics_from_catalog(self):
-        devices = self._catalog_get_devices()
+        # 只需要传感器的 value topic
+        routes = self._catalog_get_topics(resource="val")
 
         people_map = {}
         temp_val_map = {}
 
-        for dev in devices:
-            dev_type = dev.get("type")
-            room_id = dev.get("location", {}).get("room")
-            mqtt_topics = dev.get("mqtt_topics", {})
-
+        for topic, route in routes.items():
+            room_id = route.get("room")
             if not room_id:
                 continue
 
-            if dev_type == "wifi" and "val" in mqtt_topics:
-                people_map[room_id] = mqtt_topics["val"]
+            if route.get("type") == "wifi":
+                people_map[room_id] = topic
 
-            if dev_type == "temperature" and "val" in mqtt_topics:
-                temp_val_map[room_id] = mqtt_topics["val"]
+            if route.get("type") == "temperature":
+                temp_val_map[room_id] = topic
 
         self.people_value_topic_by_room = people_map
         self.temperature_value_topic_by_room = temp_val_map
@@ -158,13 +155,11 @@ class Controller:
         except Exception:
             return
 
-        with self.data_lock:
-            self.latest_by_room.setdefault(room_id, {}) \
-                .setdefault(device_type, {})[index_number] = payload_data
+        self.snapshots.apply([(room_id, device_type, index_number, payload_data)])
 
     def get_snapshot(self) -> dict:
-        with self.data_lock:
-            return copy.deepcopy(self.latest_by_room)
+        # 只读快照，不拷贝
+        return self.snapshots.current()
 
     # -------------------------
     # ThingSpeak
@@ -191,7 +186,9 @@ class Controller:
         current_room = room_list[self._current_room_index % len(room_list)]
         room_info = room_data[current_room]
         
-        # 获取该房间的真实容量
+        # 获取该房间的真实容量 (配置文件被修改后重新加载)
+        if self.config_loader.version != self._room_config_version:
+            self._load_room_capacities()
         room_capacity = self.room_capacity.get(current_room, 300)
         
         # 获取房间人数
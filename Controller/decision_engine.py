@@ -0,0 +1,223 @@
+import threading
+import time
+import traceback
+from collections import deque
+
+import OccupancyAnalyzer
+
+# ==========================================
+# 空调决策引擎 (DecisionEngine)
+#
+# mode = "sweep"  原来的方式：每 interval 秒对 setting_config.json 里的所有房间算一次
+# mode = "event"  只算需要重新算的房间：
+#   - input     ingest 写入了这个房间的新数据 (Controller._apply_messages -> mark_dirty)
+#   - schedule  到了课表时间段的边界或 UTC 零点 (见 OccupancyAnalyzer.next_schedule_boundary)，所有房间
+#   - timeout   超过 max_age 秒没有算过的房间 (传感器不再上报时也会定期确认一次)
+#   - recheck   决策变了但命令被 CMD_MIN_INTERVAL 节流的房间，节流结束时再算一次
+# 有新数据时立即唤醒，不再等到下一个 5 秒。
+# 房间列表缓存在引擎里，只在 setting_config.json 重新加载 (mtime 变化) 后重建；
+# 课表由 OccupancyAnalyzer 按 mtime 缓存，每次唤醒不再重新打开、解析配置文件。
+#
+# 两种模式都统计 decisions/s (每秒算了多少个房间)、数据到达 -> 决策 / -> 发出命令的延迟。
+# ==========================================
+MODES = ("sweep", "event")
+
+# 统计 rate 使用的时间窗口 (秒)，延迟保留最近多少个样本
+RATE_WINDOW = 10.0
+LATENCY_SAMPLES = 1000
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class DecisionEngine:
+    def __init__(self, controller, mode="event", interval_seconds=5.0, max_age=60.0, room_config_path=None):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.controller = controller
+        self.mode = mode
+        self.interval_seconds = interval_seconds
+        self.max_age = max_age
+        # 和 OccupancyAnalyzer 用同一份房间配置
+        self.room_config_path = room_config_path or OccupancyAnalyzer.ROOM_CONFIG_PATH
+
+        self._cond = threading.Condition()
+        # room_id -> 还没有算过的最早一条数据的 received_at
+        self._dirty = {}
+        self._stop = False
+        self._thread = None
+
+        # 以下只在引擎线程里访问
+        self._last_eval = {}
+        self._recheck_at = {}
+        self._next_boundary = 0.0
+        self._rooms = []
+        self._room_set = frozenset()
+        self._rooms_version = None
+
+        # 统计
+        self.runs = 0
+        self.evaluations = 0
+        self.commands = 0
+        self.triggers = {"input": 0, "schedule": 0, "timeout": 0, "recheck": 0, "sweep": 0}
+        self._recent = deque()  # (time, 房间数)
+        self._decision_latency = deque(maxlen=LATENCY_SAMPLES)
+        self._command_latency = deque(maxlen=LATENCY_SAMPLES)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="decision-engine", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def mark_dirty(self, rooms: dict):
+        """ingest 线程调用：{room_id: 这一批里这个房间最早的 received_at}。"""
+        with self._cond:
+            was_empty = not self._dirty
+            for room_id, received_at in rooms.items():
+                old = self._dirty.get(room_id)
+                if old is None or received_at < old:
+                    self._dirty[room_id] = received_at
+            if was_empty and self.mode == "event":
+                self._cond.notify_all()
+
+    # ------------------------------------------
+    # 引擎线程
+    # ------------------------------------------
+    def _run(self):
+        next_sweep = time.time()
+        while True:
+            with self._cond:
+                if self.mode == "event":
+                    wait = self._next_deadline(time.time()) - time.time()
+                    if not self._dirty and wait > 0:
+                        self._cond.wait(wait)
+                else:
+                    wait = next_sweep - time.time()
+                    if wait > 0:
+                        self._cond.wait(wait)
+                if self._stop:
+                    return
+                if self.mode == "sweep" and time.time() < next_sweep:
+                    continue
+                dirty, self._dirty = self._dirty, {}
+
+            now = time.time()
+            try:
+                if self.mode == "event":
+                    self._evaluate(self._due_rooms(dirty, now), dirty, now)
+                else:
+                    next_sweep = now + self.interval_seconds
+                    rooms = {room_id: "sweep" for room_id in self._room_ids()}
+                    self._evaluate(rooms, dirty, now)
+                    print("[cmd]in the loop")
+            except Exception as e:
+                print(f"[DecisionLoop] error: {e}")
+                traceback.print_exc()
+
+    def _room_ids(self):
+        loader = OccupancyAnalyzer.room_config_loader(self.room_config_path)
+        version = loader.version
+        if version != self._rooms_version:
+            self._rooms = [room["room_id"] for room in loader.get_rooms()]
+            self._room_set = frozenset(self._rooms)
+            self._rooms_version = version
+        return self._rooms
+
+    def _next_deadline(self, now):
+        deadlines = [self._next_boundary]
+        deadlines.extend(self._recheck_at.values())
+        room_ids = self._room_ids()
+        if room_ids:
+            deadlines.append(min(self._last_eval.get(room_id, 0.0) for room_id in room_ids) + self.max_age)
+        return min(deadlines)
+
+    def _due_rooms(self, dirty, now):
+        """本轮要算的房间 -> 触发原因 (每个房间只记一个原因)。"""
+        room_ids = self._room_ids()
+        rooms = {room_id: "input" for room_id in dirty if room_id in self._room_set}
+
+        if now >= self._next_boundary:
+            if self._next_boundary:
+                for room_id in room_ids:
+                    rooms.setdefault(room_id, "schedule")
+            self._next_boundary = OccupancyAnalyzer.next_schedule_boundary(now)
+
+        for room_id in room_ids:
+            if self._last_eval.get(room_id, 0.0) + self.max_age <= now:
+                rooms.setdefault(room_id, "timeout")
+
+        for room_id, at in list(self._recheck_at.items()):
+            if at <= now:
+                del self._recheck_at[room_id]
+                rooms.setdefault(room_id, "recheck")
+        return rooms
+
+    def _evaluate(self, rooms, dirty, now):
+        if not rooms:
+            return
+        controller = self.controller
+        snapshot = controller.get_snapshot()
+        decisions = OccupancyAnalyzer.deciede_ac_from_room_info(now, snapshot, set(rooms))
+        sent = controller.apply_ac_decisions(decisions, controller.ac_state_by_room) or []
+        done = time.time()
+
+        for room_id in decisions:
+            self._last_eval[room_id] = now
+            # 决策变了但被节流：节流结束时再确认一次 (没有新数据也要发出命令)
+            state = controller.ac_state_by_room.get(room_id) or {}
+            should_on, last_sent_at = state.get("should_on"), state.get("last_cmd_sent_at")
+            if should_on is not None and should_on != state.get("last_cmd_sent_on") and last_sent_at is not None:
+                self._recheck_at[room_id] = last_sent_at + controller.CMD_MIN_INTERVAL
+
+        with self._cond:
+            self.runs += 1
+            self.evaluations += len(decisions)
+            self.commands += len(sent)
+            for trigger in rooms.values():
+                self.triggers[trigger] += 1
+            for room_id in decisions:
+                if room_id in dirty:
+                    self._decision_latency.append(done - dirty[room_id])
+            for room_id in sent:
+                if room_id in dirty:
+                    self._command_latency.append(done - dirty[room_id])
+            self._recent.append((done, len(decisions)))
+            while self._recent and done - self._recent[0][0] > RATE_WINDOW:
+                self._recent.popleft()
+
+    def stats(self):
+        with self._cond:
+            now = time.time()
+            recent = [n for t, n in self._recent if now - t <= RATE_WINDOW]
+            decision_latency = list(self._decision_latency)
+            command_latency = list(self._command_latency)
+
+            def ms(value):
+                return None if value is None else round(value * 1000, 1)
+
+            return {
+                "mode": self.mode,
+                "runs": self.runs,
+                "evaluations": self.evaluations,
+                "commands": self.commands,
+                "triggers": dict(self.triggers),
+                "pending_dirty": len(self._dirty),
+                "decisions_per_s": round(sum(recent) / RATE_WINDOW, 1),
+                "input_to_decision_ms": {"p50": ms(_percentile(decision_latency, 0.5)),
+                                         "p99": ms(_percentile(decision_latency, 0.99))},
+                "input_to_command_ms": {"p50": ms(_percentile(command_latency, 0.5)),
+                                        "p99": ms(_percentile(command_latency, 0.99))},
+            }
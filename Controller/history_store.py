@@ -0,0 +1,201 @@
+import threading
+import time
+
+import numpy as np
+
+# ==========================================
+# 传感器历史数据 (HistoryStore)
+#
+# 每个传感器 (room_id, device_type, index_number) 第一次出现时分配固定大小的环形缓冲区，
+# 之后只覆盖写，不再分配内存：
+#   - raw   最近 raw_depth 条原始数据 (received_at, value)，超过 raw_retention 秒的不返回
+#   - tiers 降采样层，每层 (step 秒, retention 秒)：每个 step 一个桶，保存 mean / min / max / count，
+#           容量 = retention // step 个桶
+#
+# 默认 (每个传感器约 17KB)：
+#   raw   360 条 / 30 分钟
+#   1 分钟一个桶，保留 6 小时
+#   15 分钟一个桶，保留 48 小时
+#
+# 查询 (GET /history) 按 room -> type -> index 找到对应的缓冲区，不扫描其他传感器；
+# 按时间范围和 step 选择最合适的一层，step 比这一层大时再合并桶。
+# 写入在 ingest 线程 (每批一次加锁)，查询只在拷贝切片时加锁。
+# ==========================================
+DEFAULT_RAW_DEPTH = 360
+DEFAULT_RAW_RETENTION = 30 * 60
+DEFAULT_TIERS = ((60, 6 * 3600), (15 * 60, 48 * 3600))
+
+
+class _Ring:
+    """一个传感器的一层。step == 0 表示原始数据层。"""
+
+    __slots__ = ("step", "depth", "retention", "t", "mean", "vmin", "vmax", "count", "head", "size")
+
+    def __init__(self, step, depth, retention):
+        self.step = step
+        self.depth = depth
+        self.retention = retention
+        self.t = np.zeros(depth, dtype=np.float64)
+        self.mean = np.zeros(depth, dtype=np.float32)
+        if step:
+            self.vmin = np.zeros(depth, dtype=np.float32)
+            self.vmax = np.zeros(depth, dtype=np.float32)
+            self.count = np.zeros(depth, dtype=np.uint32)
+        self.head = 0  # 下一次写入的位置
+        self.size = 0
+
+    @property
+    def nbytes(self):
+        arrays = (self.t, self.mean) + ((self.vmin, self.vmax, self.count) if self.step else ())
+        return sum(a.nbytes for a in arrays)
+
+    def add(self, t, value):
+        if self.step:
+            t -= t % self.step
+        if self.size:
+            last = (self.head - 1) % self.depth
+            last_t = self.t[last]
+            if t < last_t:
+                # 比最后一条还旧的迟到数据：丢掉 (保持时间有序，查询用二分)
+                return
+            if self.step and t == last_t:
+                # 还在当前桶里：更新均值 / 最值
+                n = self.count[last] + 1
+                self.mean[last] += (value - self.mean[last]) / n
+                self.vmin[last] = min(self.vmin[last], value)
+                self.vmax[last] = max(self.vmax[last], value)
+                self.count[last] = n
+                return
+        if self.step:
+            self.vmin[self.head] = value
+            self.vmax[self.head] = value
+            self.count[self.head] = 1
+
+        self.t[self.head] = t
+        self.mean[self.head] = value
+        self.head = (self.head + 1) % self.depth
+        if self.size < self.depth:
+            self.size += 1
+
+    def window(self, start, end):
+        """[start, end] 之间的数据，按时间顺序，返回拷贝。"""
+        order = (np.arange(self.size) + (self.head - self.size)) % self.depth
+        t = self.t[order]
+        lo, hi = np.searchsorted(t, start, "left"), np.searchsorted(t, end, "right")
+        order = order[lo:hi]
+        if self.step:
+            return self.t[order], self.mean[order], self.vmin[order], self.vmax[order], self.count[order]
+        values = self.mean[order]
+        return self.t[order], values, values, values, np.ones(len(order), dtype=np.uint32)
+
+
+class HistoryStore:
+    def __init__(self, raw_depth=DEFAULT_RAW_DEPTH, raw_retention=DEFAULT_RAW_RETENTION, tiers=DEFAULT_TIERS):
+        for step, retention in tiers:
+            if step <= 0 or retention < step:
+                raise ValueError(f"Invalid history tier (step={step}, retention={retention})")
+        self.raw_depth = raw_depth
+        self.raw_retention = raw_retention
+        # (step, depth, retention)，从细到粗
+        self.layers = [(0, raw_depth, raw_retention)] + sorted(
+            (step, int(retention // step), retention) for step, retention in tiers)
+
+        self._lock = threading.Lock()
+        # room_id -> device_type -> index_number -> [_Ring, ...] (和 self.layers 对应)
+        self._rings = {}
+        self.sensors = 0
+        self.dropped = 0
+
+    def add_many(self, points):
+        """写入一批 (room_id, device_type, index_number, received_at, value)，value 不是数字的丢掉。"""
+        with self._lock:
+            for room_id, device_type, index_number, t, value in points:
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or t is None:
+                    self.dropped += 1
+                    continue
+                by_index = self._rings.setdefault(room_id, {}).setdefault(device_type, {})
+                rings = by_index.get(index_number)
+                if rings is None:
+                    rings = by_index[index_number] = [_Ring(*layer) for layer in self.layers]
+                    self.sensors += 1
+                for ring in rings:
+                    ring.add(t, value)
+
+    def _choose_layer(self, start, step, now):
+        """覆盖 start 的层里，step 不超过请求的最粗一层；请求的 step 比所有层都细时用最细的一层。"""
+        covering = [i for i, (_, _, retention) in enumerate(self.layers) if start >= now - retention]
+        if not covering:
+            return len(self.layers) - 1
+        fits = [i for i in covering if self.layers[i][0] <= (step or 0)]
+        return fits[-1] if fits else covering[0]
+
+    def query(self, room_id, device_type=None, index_number=None, start=None, end=None, step=None, now=None):
+        """
+        返回 {"room", "from", "to", "step", "tier", "series": {device_type: {index_number: [point, ...]}}}
+        point = {"t", "value", "min", "max", "count"}；没有数据的传感器不出现在 series 里。
+        """
+        now = time.time() if now is None else now
+        end = now if end is None else end
+        start = end - 3600 if start is None else start
+        if start > end:
+            raise ValueError("from must not be later than to")
+        if step is not None and step < 0:
+            raise ValueError("step must be positive")
+
+        layer = self._choose_layer(start, step, now)
+        tier_step, _, retention = self.layers[layer]
+        start = max(start, now - retention)
+        out_step = max(step or 0, tier_step)
+
+        with self._lock:
+            by_type = self._rings.get(room_id, {})
+            types = [device_type] if device_type is not None else list(by_type)
+            windows = {}
+            for t in types:
+                by_index = by_type.get(t, {})
+                indexes = [index_number] if index_number is not None else list(by_index)
+                for i in indexes:
+                    rings = by_index.get(i)
+                    if rings is not None:
+                        windows[(t, i)] = rings[layer].window(start, end)
+
+        series = {}
+        for (t, i), window in windows.items():
+            if out_step > tier_step:
+                window = _resample(window, out_step)
+            series.setdefault(t, {})[i] = _points(window)
+        return {"room": room_id, "from": start, "to": end, "step": out_step, "tier": tier_step, "series": series}
+
+    def stats(self):
+        with self._lock:
+            nbytes = sum(ring.nbytes for by_type in self._rings.values() for by_index in by_type.values()
+                         for rings in by_index.values() for ring in rings)
+            return {
+                "sensors": self.sensors,
+                "bytes": nbytes,
+                "dropped": self.dropped,
+                "layers": [{"step": step, "depth": depth, "retention": retention}
+                           for step, depth, retention in self.layers],
+            }
+
+
+def _resample(window, step):
+    """把桶合并成更大的 step：均值按 count 加权。"""
+    t, mean, vmin, vmax, count = window
+    if not len(t):
+        return window
+    buckets = t - t % step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    weight = count.astype(np.float64)
+    total = np.add.reduceat(weight, starts)
+    return (buckets[starts],
+            np.add.reduceat(mean * weight, starts) / total,
+            np.minimum.reduceat(vmin, starts),
+            np.maximum.reduceat(vmax, starts),
+            total.astype(np.uint32))
+
+
+def _points(window):
+    t, mean, vmin, vmax, count = (a.tolist() for a in window)
+    return [{"t": ti, "value": round(m, 4), "min": round(lo, 4), "max": round(hi, 4), "count": c}
+            for ti, m, lo, hi, c in zip(t, mean, vmin, vmax, count)]
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+
+# ==========================================
+# MQTT 接收队列 (IngestQueue)
+#
+# paho 的网络线程只负责把 (topic, payload, received_at) 放进一个有界队列，
+# 由单独的 ingest 线程批量取出，交给 apply_batch(batch) 处理
+# (Controller 在一次加锁里写入整批数据)。
+# 决策循环 / REST 快照拿锁的时候，MQTT 网络线程不会被阻塞。
+#
+# 队列满时的策略 (overflow)：
+#   "drop_oldest"  丢掉最旧的一条，保留最新数据 (默认，传感器数据只关心最新值)
+#   "drop_newest"  丢掉新到的这条
+#   "block"        网络线程最多等待 block_timeout 秒，仍然满则丢掉新到的这条
+# ==========================================
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+# 统计 rate 使用的时间窗口 (秒)
+RATE_WINDOW = 10.0
+
+
+class IngestQueue:
+    def __init__(self, apply_batch, maxsize=10000, batch_size=500, overflow="drop_oldest", block_timeout=0.5):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}, got {overflow!r}")
+        self.apply_batch = apply_batch
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+        # 统计
+        self.received = 0
+        self.applied = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.max_depth = 0
+        self._recent = deque()  # (time, 条数)，最近 RATE_WINDOW 秒处理的批次
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="mqtt-ingest", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, drain=True, timeout=5.0):
+        with self._cond:
+            self._stop = True
+            if not drain:
+                self.dropped += len(self._queue)
+                self._queue.clear()
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def put(self, item):
+        """生产者 (MQTT 网络线程) 调用。返回 False 表示这条消息被丢弃。"""
+        with self._cond:
+            self.received += 1
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == "drop_oldest":
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:
+                    if self.overflow == "block":
+                        self._cond.wait_for(lambda: len(self._queue) < self.maxsize or self._stop,
+                                            self.block_timeout)
+                    if len(self._queue) >= self.maxsize:
+                        self.dropped += 1
+                        return False
+
+            self._queue.append(item)
+            depth = len(self._queue)
+            if depth > self.max_depth:
+                self.max_depth = depth
+            # 只在队列从空变为非空时唤醒，worker 忙的时候不需要每条都 notify
+            if depth == 1:
+                self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stop)
+                if not self._queue:
+                    return
+                n = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(n)]
+                # "block" 模式下唤醒等待中的生产者
+                self._cond.notify_all()
+
+            try:
+                self.apply_batch(batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"[Ingest] batch of {len(batch)} failed: {e}")
+
+            now = time.monotonic()
+            with self._cond:
+                self.applied += len(batch)
+                self.batches += 1
+                self._recent.append((now, len(batch)))
+                while self._recent and now - self._recent[0][0] > RATE_WINDOW:
+                    self._recent.popleft()
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            recent = [n for t, n in self._recent if now - t <= RATE_WINDOW]
+            return {
+                "queue_depth": len(self._queue),
+                "max_depth": self.max_depth,
+                "maxsize": self.maxsize,
+                "overflow": self.overflow,
+                "received": self.received,
+                "applied": self.applied,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "batches": self.batches,
+                "avg_batch": round(self.applied / self.batches, 1) if self.batches else None,
+                "rate_per_s": round(sum(recent) / RATE_WINDOW, 1),
+            }
@@ -0,0 +1,73 @@
+import threading
+
+# ==========================================
+# 最新传感器数据的不可变快照 (SnapshotStore)
+#
+# snapshot[room_id][device_type][index_number] = SnapshotItem (见 contracts.py)
+#
+# 写入 (ingest 线程，每批一次) 不修改已经发布的 dict，而是 copy-on-write：
+#   - 顶层 dict 浅拷贝一次
+#   - 这一批涉及到的 room / device_type dict 各浅拷贝一次
+#   - 然后一次赋值发布新的 (version, snapshot)
+# 读 (决策循环、REST GET) 直接拿当前发布的 dict：O(1)，不加锁，不拷贝，
+# 拿到的是某一批写完之后的一致视图，之后的写入不会影响它。
+#
+# 约定：拿到的快照是只读的，调用方不能修改 (需要修改时自己 copy)。
+# ==========================================
+
+
+class SnapshotStore:
+    def __init__(self):
+        # 只有写入方之间需要互斥，读不需要锁
+        self._write_lock = threading.Lock()
+        # (version, snapshot) 放在同一个 tuple 里，读的时候两者总是对应的
+        self._published = (0, {})
+
+    @property
+    def version(self) -> int:
+        return self._published[0]
+
+    def current(self) -> dict:
+        """当前快照 (只读)。"""
+        return self._published[1]
+
+    def versioned(self):
+        """返回 (version, 快照)；version 每次写入加 1，可以用来判断数据是否变化。"""
+        return self._published
+
+    def as_dict(self) -> dict:
+        return self._published[1]
+
+    def apply(self, updates) -> int:
+        """
+        写入一批 (room_id, device_type, index_number, item)，发布新的快照。
+        返回新的 version；updates 为空时不发布，返回当前 version。
+        """
+        updates = list(updates)
+        if not updates:
+            return self.version
+
+        with self._write_lock:
+            version, old = self._published
+            new = dict(old)
+            # 这一批里已经拷贝过的 dict，同一个 room / type 只拷贝一次
+            copied_rooms = set()
+            copied_types = set()
+
+            for room_id, device_type, index_number, item in updates:
+                room_bucket = new.get(room_id)
+                if room_id not in copied_rooms:
+                    room_bucket = dict(room_bucket) if room_bucket else {}
+                    new[room_id] = room_bucket
+                    copied_rooms.add(room_id)
+
+                type_bucket = room_bucket.get(device_type)
+                if (room_id, device_type) not in copied_types:
+                    type_bucket = dict(type_bucket) if type_bucket else {}
+                    room_bucket[device_type] = type_bucket
+                    copied_types.add((room_id, device_type))
+
+                type_bucket[index_number] = item
+
+            self._published = (version + 1, new)
+            return version + 1
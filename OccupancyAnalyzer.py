@@ -1,22 +1,29 @@
 import sys
 import os
 import json
-import requests
 import paho.mqtt.client as mqtt
 from datetime import datetime, timezone
 import time
+import math
 
 import random
+import functools
+import numpy as np
 # 保持对 ThermalLogic 的引用
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 if BASE_DIR not in sys.path:
     sys.path.insert(0, BASE_DIR)
 
 from ThermalLogic import decide_hvac_status
+from Catalog.catalog_client import get_catalog_client
+from Catalog.config_loader import RoomConfigLoader, cached_json
+from TopicMatcher import TopicMatcher
 
 class OccupancyAnalyzer:
     def __init__(self, catalog_url):
         self.catalog_url = catalog_url
+        # 共用连接池；设备查询结果按 TTL 缓存，不再每条 MQTT 消息都请求一次 Catalog
+        self.catalog = get_catalog_client(f"{self.catalog_url}/api")
         self.occupancy_cache = {}
         
         # 加载静态课表（仍使用本地文件）
@@ -26,18 +33,13 @@ class OccupancyAnalyzer:
 
         print(f"[*] Fetching MQTT config from Catalog: {self.catalog_url}")
         try:
-            response = requests.get(f"{self.catalog_url}/api/services")
-            # 增加检查：如果响应为空或不是 200，则跳过
-            if response.status_code == 200 and response.text.strip():
-                services = response.json()
-                mqtt_service = next((s for s in services if s.get("service_type") == "mqtt"), None)
-                
-                if mqtt_service:
-                    self.broker = mqtt_service["endpoint"]["broker"]
-                    self.port = mqtt_service["endpoint"]["broker_port"]
-                    self.topic_structure = mqtt_service["endpoint"]["topic_structure"]
-                    print(f"[*] Config Loaded from Catalog: {self.broker}:{self.port}")
-                    return # 成功拿到配置，退出初始化
+            mqtt_service = self.catalog.find_service("mqtt")
+            if mqtt_service:
+                self.broker = mqtt_service["endpoint"]["broker"]
+                self.port = mqtt_service["endpoint"]["broker_port"]
+                self.topic_structure = mqtt_service["endpoint"]["topic_structure"]
+                print(f"[*] Config Loaded from Catalog: {self.broker}:{self.port}")
+                return # 成功拿到配置，退出初始化
             
             raise ValueError("MQTT service not found in Catalog response")
 
@@ -58,7 +60,8 @@ class OccupancyAnalyzer:
         if rc == 0:
             # 订阅所有房间的 wifi 传感器数据 (用于统计人数)
             # 根据 Mya 的结构，wifi 数据的 Topic 是 .../{room_id}/wifi/{index}/value
-            sub_topic = self.get_dynamic_topic("+", "wifi", "+") + "/value"
+            self.matcher = TopicMatcher(self.topic_structure + "/value")
+            sub_topic = self.matcher.subscription(device_type="wifi")
             client.subscribe(sub_topic)
             print(f"[*] Success! Subscribed to: {sub_topic}")
         else:
@@ -67,8 +70,10 @@ class OccupancyAnalyzer:
     def on_message(self, client, userdata, msg):
         try:
             # 解析 Topic 拿到 room_id (例如: polito/smartcampus/R1/wifi/1/value)
-            parts = msg.topic.split('/')
-            room_id = parts[2]
+            fields = self.matcher.match(msg.topic)
+            if fields is None:
+                return
+            room_id = fields["room_id"]
             count = int(msg.payload.decode())
             self.process_analysis(room_id, count)
         except Exception as e:
@@ -78,8 +83,7 @@ class OccupancyAnalyzer:
         try:
             # 2. 从 Catalog 获取房间的 meta 信息（比如容量）
             # Mya 的 Catalog 提供了 /api/devices?room=R1 的过滤功能
-            dev_resp = requests.get(f"{self.catalog_url}/api/devices", params={"room": room_id, "type": "temperature"})
-            devices = dev_resp.json()
+            devices = self.catalog.get_devices(room=room_id, type="temperature")
             
             # 如果 Catalog 里没找到这个房间，默认用 30 人
             capacity = 30
@@ -99,7 +103,7 @@ class OccupancyAnalyzer:
             }
 
             # 5. 【Mya 的核心要求】Post back 给 Catalog 注册/更新状态
-            requests.post(f"{self.catalog_url}/api/devices", json={
+            self.catalog.register_device({
                 "id": f"Analysis_{room_id}",
                 "type": "analysis_result",
                 "resources": ["status", "hvac"],
@@ -155,15 +159,23 @@ class simulate:
 
 #现在课表是每天一致的。后期再优化周几的问题吧。目前只做小时：分钟的匹配。
 def read_nonOccupiedScedule(schedule_path)->dict[str,list]:
-    with open(schedule_path,"r",encoding="utf-8")as file:
-        available_schedule = json.load(file)
-        return available_schedule
+    # 共享缓存：决策引擎每次决策都会读课表，只在文件修改 (mtime 变化) 后重新解析。返回的 dict 不要修改
+    return cached_json(schedule_path)
     
+# 房间配置和课表 (决策引擎也从这里读房间列表)
+ROOM_CONFIG_PATH = "setting_config.json"
+SCHEDULE_PATH = "schedule.json"
+
+# 课表时间段 (UTC，分钟)：slot1 8:30 开始，每段 90 分钟，slot 7 19:00 结束
+SLOT_START_MINUTE = 8*60 +30
+SLOT_END_MINUTE = 19*60
+SLOT_LENGTH_MINUTES = 90
+
 #计算落在哪个时间段    
 def match_slot(hour:int, minute:int,slot_count)->int|None:
-    start = 8*60 +30 #slot1 start 8:30
-    end = 19*60 #slot 7 end at 19:00
-    slot_length =90 
+    start = SLOT_START_MINUTE #slot1 start 8:30
+    end = SLOT_END_MINUTE #slot 7 end at 19:00
+    slot_length =SLOT_LENGTH_MINUTES 
     askingTime = hour* 60 +minute
     if askingTime <start or askingTime >end:
         return None
@@ -173,6 +185,13 @@ def match_slot(hour:int, minute:int,slot_count)->int|None:
         return None
     return slot_index
 
+def next_schedule_boundary(timestamp)->float:
+    """下一个会改变决策输入的时间点：时间段开始/结束，或者 UTC 零点 (月份 -> 制冷/制热模式)。"""
+    day_start = timestamp - timestamp % 86400
+    boundaries = [day_start + m*60 for m in range(SLOT_START_MINUTE, SLOT_END_MINUTE+1, SLOT_LENGTH_MINUTES)]
+    boundaries.append(day_start + 86400)
+    return min(b for b in boundaries if b > timestamp)
+
 #translate timestamp into dict
 def parse_timestamp(timestamp)->dict:
     dt = datetime.fromtimestamp(timestamp,tz=timezone.utc)
@@ -200,17 +219,29 @@ def get_available_room(request_hour,request_minute,schedule_path)->list:
     available_rooms_list=available_schedule.get(str(slot_index),[])
     return available_rooms_list
 
+@functools.lru_cache(maxsize=None)
+def room_config_loader(path)->RoomConfigLoader:
+    """每个路径一个 RoomConfigLoader (构造时要查找文件)；数据本身由 config_loader 缓存，文件修改后自动重新加载。"""
+    return RoomConfigLoader(path)
+
 #read setting_config
-def get_room_info(path)->list[dict]:
-    with open(path,"r",encoding="utf-8")as file:
-        data = json.load(file)
-        rooms_info = data["rooms"]
-        return rooms_info
+def get_room_info(path,room_ids=None)->list[dict]:
+    # 共享的配置缓存 (文件修改后自动重新加载)；返回副本，调用方会往里面写 available / temperature 等字段
+    # room_ids 不为 None 时只按 id 取这些房间，不复制其他房间
+    loader = room_config_loader(path)
+    if room_ids is None:
+        rooms = loader.get_rooms()
+    else:
+        rooms = [room for room in map(loader.get_room, room_ids) if room is not None]
+    return [dict(room) for room in rooms]
 
 def pick_latest_value(snapshot:dict,room_id:str,device_type:str):
     ''' snapshot structure:
     [room_id][device_type][index_number] = {"value":..., "received_at":...}
     return value dict or None'''
+    # Controller 的列式快照 (Controller/columnar_store.py) 直接按 slot 查
+    if hasattr(snapshot, "latest_value"):
+        return snapshot.latest_value(room_id, device_type)
     room_bucket =snapshot.get(room_id)
     if not room_bucket:
         return None
@@ -256,42 +287,47 @@ def fill_from_snapshot_or_simulate(
 
     room["students"] = people_value
 
-def get_student_dashboard_response(timestamp,snapshot = None):
+def get_student_dashboard_response(timestamp,snapshot = None,room_ids = None):
+    """room_ids 不为 None 时只返回这些房间 (决策引擎只重新计算有变化的房间)。"""
     dt = parse_timestamp(timestamp)
     request_weekday = dt["weekday"]  
     request_hour = dt["hour"]
     request_minute = dt["minute"]
     request_month = dt["month"]
 
-    schedule_path = "schedule.json"
+    schedule_path = SCHEDULE_PATH
     available_rooms_list=get_available_room(request_hour,request_minute,schedule_path)
 
-    room_info_path ="setting_config.json"
-    rooms_info= get_room_info(room_info_path)
+    room_info_path =ROOM_CONFIG_PATH
+    rooms_info= get_room_info(room_info_path,room_ids)
     random.seed(42)
     for room in rooms_info:
         fill_from_snapshot_or_simulate(room, request_month, available_rooms_list, snapshot)
 
     return rooms_info
 
-def deciede_ac_from_room_info(request_timestamp,snapshot)->dict[str,dict[str,object]]:
+def deciede_ac_from_room_info(request_timestamp,snapshot,room_ids=None)->dict[str,dict[str,object]]:
     ac_decided ={
         #room_id:{
             #decied:bool,
             #decied_time:timestamp
         #}
     }
-    rooms_info = get_student_dashboard_response(request_timestamp,snapshot)
+    rooms_info = get_student_dashboard_response(request_timestamp,snapshot,room_ids)
     dt = parse_timestamp(request_timestamp)
     month = dt["month"]
     decided_time =datetime.now(timezone.utc).timestamp()
-    for room_state in rooms_info:
+    # 所有房间一次算完 (decide_ac_batch 和逐个调用 decied_ac 结果相同)
+    decisions = ac_decisions_to_list(decide_ac_batch(
+        np.array([room_state.get("temperature") for room_state in rooms_info], dtype=np.float64),
+        np.array([room_state.get("students") for room_state in rooms_info], dtype=np.float64),
+        np.array([room_state.get("capacity") for room_state in rooms_info], dtype=np.float64),
+        month))
+    for room_state, ac_decision in zip(rooms_info, decisions):
         room_id = room_state.get("room_id")
         temperature = room_state.get("temperature")
         students = room_state.get("students")#people_value current in the classroom
-        capacity = room_state.get("capacity")
 
-        ac_decision = decied_ac(temperature,students,capacity,month)
         ac_decided[room_id] = {
                 "should_on": ac_decision,
                 "decide_time": decided_time
@@ -304,30 +340,41 @@ def deciede_ac_from_room_info(request_timestamp,snapshot)->dict[str,dict[str,obj
 
     
   
+# 空调决策阈值 (decied_ac 和 decide_ac_batch 共用)
+COOL_MONTHS = [5,6,7,8]
+HEAT_MONTHS = [11,12,1,2,3,4]
+SUMMER_LOWER = 24
+SUMMER_UPPER = 26
+WINTER_LOWER = 20
+WINTER_UPPER = 22
+OCCUPANCY_THRESHOLD = 0.6
+
 def get_mode(month)->str:
-    if month in[5,6,7,8]:
+    if month in COOL_MONTHS:
         return "Cool"
-    elif month in [11,12,1,2,3,4]:
+    elif month in HEAT_MONTHS:
         return"Heat"
     else:
         return "OFF"
     
 
 def decied_ac(temperature,people,capacity,month)-> bool:
-    summer_lower =24
-    summer_upper =26
-    winter_lower = 20
-    winter_upper = 22
-    occupancy_threshold =0.6 
+    summer_lower =SUMMER_LOWER
+    summer_upper =SUMMER_UPPER
+    winter_lower = WINTER_LOWER
+    winter_upper = WINTER_UPPER
+    occupancy_threshold =OCCUPANCY_THRESHOLD 
     season ={
-        "summer":[5,6,7,8],
-        "winter":[11,12,1,2,3,4],
+        "summer":COOL_MONTHS,
+        "winter":HEAT_MONTHS,
         "transition":[9,10]
     }
 
 
 
-    if temperature is None or people is None or capacity is None or capacity <= 0:
+    # NaN 和 None 一样当作缺失 (decide_ac_batch 也是这样处理的)
+    if any(value is None or (isinstance(value, float) and math.isnan(value))
+           for value in (temperature, people, capacity)) or capacity <= 0:
         return None
     if people == 0:
         return False 
@@ -360,6 +407,46 @@ def decied_ac(temperature,people,capacity,month)-> bool:
         return None
 
 
+# ==========================================
+# 批量版本：所有房间一次算完 (NumPy mask，不逐个房间分支)
+# 结果用 int8 编码：AC_ON / AC_OFF / AC_NO_CHANGE，和 decied_ac 的 True / False / None 一一对应
+# 输入里的 None 用 NaN 表示 (np.asarray([.., None], dtype=float) 会自动转换)
+# ==========================================
+AC_NO_CHANGE = -1
+AC_OFF = 0
+AC_ON = 1
+
+def decide_ac_batch(temperature, people, capacity, month)->np.ndarray:
+    """decied_ac 的向量化版本：每个参数是数组 (或标量，会广播)，返回 int8 数组。"""
+    temperature = np.asarray(temperature, dtype=np.float64)
+    people = np.asarray(people, dtype=np.float64)
+    capacity = np.asarray(capacity, dtype=np.float64)
+    month = np.asarray(month)
+
+    missing = np.isnan(temperature) | np.isnan(people) | np.isnan(capacity) | ~(capacity > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        high = (people / capacity) > OCCUPANCY_THRESHOLD
+    cool = np.isin(month, COOL_MONTHS)
+    heat = np.isin(month, HEAT_MONTHS)
+
+    cool_on = np.where(high, SUMMER_UPPER - 1, SUMMER_UPPER)
+    cool_off = np.where(high, SUMMER_UPPER - 2, SUMMER_LOWER)
+    heat_on = np.where(high, WINTER_LOWER + 1, WINTER_LOWER)
+    heat_off = np.where(high, WINTER_LOWER + 2, WINTER_UPPER)
+
+    # 条件顺序和 decied_ac 里的 if 顺序一致，第一个成立的生效
+    return np.select(
+        [missing, people == 0, ~(cool | heat),
+         cool & (temperature >= cool_on), cool & (temperature <= cool_off),
+         heat & (temperature <= heat_on), heat & (temperature >= heat_off)],
+        [AC_NO_CHANGE, AC_OFF, AC_NO_CHANGE, AC_ON, AC_OFF, AC_ON, AC_OFF],
+        default=AC_NO_CHANGE).astype(np.int8)
+
+def ac_decisions_to_list(codes)->list:
+    """int8 编码 -> decied_ac 的返回值 (True / False / None)。"""
+    return [None if c == AC_NO_CHANGE else c == AC_ON for c in np.asarray(codes).tolist()]
+
+
 
 
 
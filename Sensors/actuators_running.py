@@ -5,6 +5,7 @@ import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Catalog.config_loader import RoomConfigLoader
 from devices_actuator import Acutuator
+from devices_base import GenericDevice
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, ".."))
@@ -22,10 +23,13 @@ def load_rooms():
     return rooms
 
 
-def run_actuator(room_id, device_index, device_type):
+def build_actuator(room_id, device_index, device_type):
     freq = 30 if device_type == "temperature" else 10
-    actuator = Acutuator(room=room_id, index=device_index, sensor_type=device_type, frequency=freq)
-    actuator.start()
+    return Acutuator(room=room_id, index=device_index, sensor_type=device_type, frequency=freq)
+
+
+def run_actuator(actuator, registered):
+    actuator.start(registered=registered)
 
 
 if __name__ == "__main__":
@@ -36,20 +40,31 @@ if __name__ == "__main__":
 
     print(f"[*] Starting actuators for rooms: {room_list}")
 
+    # 1. 先创建全部执行器 (服务发现)
+    actuators = []
     for room in room_list:
         for s_type in target_types:
             
             device_index = 1
             
-            t = threading.Thread(
-                target=run_actuator, 
-                args=(room, device_index, s_type)
-            )
-            t.daemon = True 
-            t.start()
-            threads.append(t)
-            
-            time.sleep(0.2) 
+            try:
+                actuators.append(build_actuator(room, device_index, s_type))
+            except Exception as e:
+                print(f"[-] Skip {room}/{s_type}: {e}")
+
+    # 2. 一次 _bulk 请求注册全部执行器；失败时退回到每个设备自己注册
+    registered = GenericDevice.register_many_to_catalog(actuators)
+
+    # 3. 每个执行器一个线程运行
+    for actuator in actuators:
+        t = threading.Thread(
+            target=run_actuator, 
+            args=(actuator, registered)
+        )
+        t.daemon = True 
+        t.start()
+        threads.append(t)
+
     print(f"[*] System running. Total actuators: {len(threads)}")
     try:
         while True:
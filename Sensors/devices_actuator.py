@@ -55,10 +55,11 @@ class Acutuator(GenericDevice):
         client.publish(self.topics["status"], payload, retain=True)
         print(f"[>] Feedback sent to {self.topics['status']}: {payload}")
 
-    def start(self):
-
-        if not self.register_to_catalog(self.topics):
+    def start(self, registered=False):
+        # registered=True: 已经由 runner 通过 _bulk 统一注册过
+        if not registered and not self.register_to_catalog(self.topics):
             return
+        self.start_heartbeat(self.topics)
 
         client = self.connect_mqtt()
 
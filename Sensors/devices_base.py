@@ -1,9 +1,12 @@
-import requests
 import json
+import threading
+import time
 import paho.mqtt.client as mqtt
 import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Catalog.config_loader import RoomConfigLoader
+from Catalog.catalog_client import get_catalog_client
+
 
 class GenericDevice:
     def __init__(self, room="R1", index=1, sensor_type="unknown", role="unknown", frequency=10):
@@ -24,6 +27,11 @@ class GenericDevice:
         loader = RoomConfigLoader("setting_config.json")
         cata_info = loader.get_catalog_info()
         self.catalog_url = f"http://{cata_info['host']}:{cata_info['port']}{cata_info['api_path']}"
+        # 同一进程里的设备共用一个 CatalogClient (连接池 + /services 缓存)
+        self.catalog = get_catalog_client(self.catalog_url)
+        # 注册租约: 带 ttl 注册后需要定期发心跳，否则 Catalog 会把设备删掉
+        self.ttl = cata_info.get("device_ttl")
+        self._heartbeat_thread = None
 
         # fexible location assignment
         try:
@@ -48,12 +56,9 @@ class GenericDevice:
         print(f"[{self.device_id}] Discovering services at {service_url}...")
 
         try:
-            res = requests.get(service_url)
-            if res.status_code != 200:
-                print(f"[-] Service Discovery Failed with status code: {res.status_code}")
-                return False
-            
-            services = res.json()
+            # 同一进程里的设备共享一份 /api/services 结果 (CatalogClient 缓存)
+            services = self.catalog.get_services()
+
             for service in services:
                 if service["service_type"] == "mqtt":
                     self.broker = service["endpoint"]["broker"]
@@ -74,23 +79,47 @@ class GenericDevice:
             print(f"   [-] Discovery failed: {e}")
             return False
         
-    def register_to_catalog(self, specific_topics):
-
-        print(f"[*] Registering {self.device_id}...")
-        device_url = f"{self.catalog_url}/devices"
-        
+    def build_registration(self, specific_topics):
         payload = {
             "id": self.device_id,
             "type": self.sensor_type,
+            "role": self.role,
             "resources": list(specific_topics.keys()),
             "mqtt_topics": specific_topics,
             "update_interval": self.frequency,
             "location": self.location
         }
+        if self.ttl:
+            payload["ttl"] = self.ttl
+        return payload
+
+    def start_heartbeat(self, specific_topics):
+        """每 ttl/3 秒续期一次租约；Catalog 已经把设备删掉 (404) 时重新注册。"""
+        if not self.ttl or self._heartbeat_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(self.ttl / 3)
+                try:
+                    res = self.catalog.heartbeat(self.device_id)
+                    if res.status_code == 404:
+                        print(f"[!] {self.device_id} lease lost, registering again")
+                        self.register_to_catalog(specific_topics)
+                except Exception as e:
+                    print(f"   [-] Heartbeat failed: {e}")
+
+        self._heartbeat_thread = threading.Thread(target=loop, daemon=True)
+        self._heartbeat_thread.start()
+
+    def register_to_catalog(self, specific_topics):
+
+        print(f"[*] Registering {self.device_id}...")
+        payload = self.build_registration(specific_topics)
 
         try:
             # 发送请求
-            res = requests.post(device_url, json=payload)
+            res = self.catalog.register_device(payload)
             if res.status_code in [200, 201]:
                 print(f"[+] Registered: {self.device_id}")
                 return True
@@ -103,6 +132,32 @@ class GenericDevice:
             print(f"[-] Connection Error: {e}")
             return False
 
+    @staticmethod
+    def register_many_to_catalog(devices):
+        """
+        用 POST /api/devices/_bulk 一次注册同一进程里的所有设备
+        (每个设备需要已经有 self.topics)。成功返回 True。
+        """
+        if not devices:
+            return True
+
+        payload = [dev.build_registration(dev.topics) for dev in devices]
+        print(f"[*] Bulk registering {len(payload)} devices...")
+
+        try:
+            res = devices[0].catalog.register_devices(payload)
+            if res.status_code in [200, 201]:
+                print(f"[+] Registered {res.json().get('count')} devices")
+                return True
+            else:
+                print(f"[-] Catalog Refused bulk registration!")
+                print(f"Status Code: {res.status_code}")
+                print(f"Response Text: {res.text}")
+                return False
+        except Exception as e:
+            print(f"[-] Connection Error: {e}")
+            return False
+
     def connect_mqtt(self):
         self.client = mqtt.Client(client_id=self.device_id)
         print(f"[*] Connecting to Broker: {self.broker}...")
@@ -3,7 +3,6 @@ import json
 import random
 import datetime
 import os, sys
-import requests
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Catalog.config_loader import RoomConfigLoader
 from devices_base import GenericDevice
@@ -25,11 +24,8 @@ class Sensor(GenericDevice):
         self.topics = {"val": self.base_topic + "/value"}
 
         # about wifi people count part
-        loader = loader_instance if loader_instance else RoomConfigLoader(config_path)
-        try:
-            self.capacity = loader.get_room_config(target_room_id=self.room)["meta"].get("capabilities", 30)
-        except:
-            self.capacity = 30
+        # 容量每次用到时从 loader 读取，修改 setting_config.json 后不用重启传感器线程
+        self.loader = loader_instance if loader_instance else RoomConfigLoader(config_path)
         self.people_count = random.randint(int(self.capacity * 0.1), int(self.capacity * 0.5))
         self.last_wifi_update_time = 0 # last time when people count was updated
         self.wifi_interval = 60 # seconds for people count interval
@@ -45,31 +41,58 @@ class Sensor(GenericDevice):
 
         print(f"[{sensor_type}] Init: {self.room}, Max: {self.capacity}, Start People: {self.people_count}")
 
-    def _lookup_actuator_topic(self):
+    @property
+    def capacity(self):
+        room = self.loader.get_room(self.room)
+        return (room or {}).get("capacity") or 30
+
+    def _lookup_actuator_topic(self, max_age=None):
         if self.sensor_type != "temperature":
             return None
         
-        search_url = f"{self.catalog_url}/devices"
-
         try:
-            res = requests.get(search_url, params={"room": self.room})
-            if res.status_code == 200:
-                devices = res.json()
-                for dev in devices:
-                    if dev["id"] == self.device_id: continue
-                    
-                    mqtt_topics = dev.get("mqtt_topics", {})
-                    if "status" in mqtt_topics:
-                        found = mqtt_topics["status"]
-                        print(f"    -> Found Actuator Topic: {found}")
-                        return found
-            
+            # 同一房间的传感器共享 CatalogClient 里缓存的查询结果
+            devices = self.catalog.get_devices(max_age=max_age, room=self.room, fields="id,mqtt_topics")
+            for dev in devices:
+                if dev["id"] == self.device_id: continue
+
+                mqtt_topics = dev.get("mqtt_topics", {})
+                if "status" in mqtt_topics:
+                    found = mqtt_topics["status"]
+                    print(f"    -> Found Actuator Topic: {found}")
+                    return found
+
             return None
             
         except Exception as e:
             print(f"   [-] Actuator lookup failed: {e}")
             return None
         
+    @staticmethod
+    def prefetch_actuator_topics(sensors):
+        """
+        一次 POST /api/devices/_query 找出所有温度传感器所在房间的执行器 topic，
+        代替每个传感器启动时各自查询一次。找不到的传感器在 start() 里仍然会自己重试。
+        """
+        pending = [s for s in sensors if s.sensor_type == "temperature" and s.target_actuator_topic is None]
+        if not pending:
+            return
+        try:
+            by_room = pending[0].catalog.query_devices(
+                rooms=sorted({s.room for s in pending}), roles=["actuator"], fields="id,mqtt_topics")
+        except Exception as e:
+            print(f"   [-] Actuator prefetch failed: {e}")
+            return
+
+        for sensor in pending:
+            for dev in by_room.get(sensor.room, []):
+                mqtt_topics = dev.get("mqtt_topics", {})
+                if "status" in mqtt_topics:
+                    sensor.target_actuator_topic = mqtt_topics["status"]
+                    break
+        found = sum(1 for s in pending if s.target_actuator_topic)
+        print(f"[*] Prefetched actuator topics for {found}/{len(pending)} temperature sensors")
+
     def on_actuator_message(self, client, userdata, msg):
         try:
             payload = json.loads(msg.payload)
@@ -123,16 +146,20 @@ class Sensor(GenericDevice):
         
         return round(self.current_temp, 2)
 
-    def start(self):
-
-        if not self.register_to_catalog(self.topics):
+    def start(self, registered=False):
+        # registered=True: 已经由 runner 通过 _bulk 统一注册过
+        if not registered and not self.register_to_catalog(self.topics):
             return False
+        self.start_heartbeat(self.topics)
         
         if self.sensor_type == "temperature":
             print(f"[*] Looking up actuator for room {self.room}...")
+            max_age = None
             while self.target_actuator_topic is None:
-                self.target_actuator_topic = self._lookup_actuator_topic()
+                self.target_actuator_topic = self._lookup_actuator_topic(max_age)
                 if self.target_actuator_topic is None:
+                    # 缓存里没有，之后每次都向 Catalog 确认
+                    max_age = 0
                     print("    [-] Actuator not found, retrying in 2s...")
                     time.sleep(2)
 
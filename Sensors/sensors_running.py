@@ -5,6 +5,7 @@ import os, sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from Catalog.config_loader import RoomConfigLoader
 from devices_sensor import Sensor 
+from devices_base import GenericDevice
 
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -41,10 +42,13 @@ def load_rooms():
     return rooms
 
 
-def run_sensor(room_id, device_index, device_type):
+def build_sensor(room_id, device_index, device_type):
     freq = 30 if device_type == "temperature" else 10
-    sensor = Sensor(room=room_id, index=device_index, sensor_type=device_type, frequency=freq, loader_instance=loader)
-    sensor.start()
+    return Sensor(room=room_id, index=device_index, sensor_type=device_type, frequency=freq, loader_instance=loader)
+
+
+def run_sensor(sensor, registered):
+    sensor.start(registered=registered)
 
 
 if __name__ == "__main__":
@@ -55,20 +59,34 @@ if __name__ == "__main__":
 
     print(f"[*] Starting sensors for rooms: {room_list}")
 
+    # 1. 先创建全部传感器 (服务发现)
+    sensors = []
     for room in room_list:
         for s_type in target_types:
             
             device_index = 1
             
-            t = threading.Thread(
-                target=run_sensor, 
-                args=(room, device_index, s_type)
-            )
-            t.daemon = True 
-            t.start()
-            threads.append(t)
-            
-            time.sleep(0.2) 
+            try:
+                sensors.append(build_sensor(room, device_index, s_type))
+            except Exception as e:
+                print(f"[-] Skip {room}/{s_type}: {e}")
+
+    # 2. 一次 _bulk 请求注册全部传感器；失败时退回到每个设备自己注册
+    registered = GenericDevice.register_many_to_catalog(sensors)
+
+    # 3. 一次批量查询拿到所有房间的执行器 topic
+    Sensor.prefetch_actuator_topics(sensors)
+
+    # 4. 每个传感器一个线程运行
+    for sensor in sensors:
+        t = threading.Thread(
+            target=run_sensor, 
+            args=(sensor, registered)
+        )
+        t.daemon = True 
+        t.start()
+        threads.append(t)
+
     print(f"[*] System running. Total sensors: {len(threads)}")
 
     try:
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def decide_hvac_status(temperature, occupancy, capacity):
     """
     解耦的温控判断逻辑 [坤浩的建议]
@@ -18,4 +21,22 @@ def decide_hvac_status(temperature, occupancy, capacity):
     if occupancy_rate > 0.8:
         return True
         
-    return False
\ No newline at end of file
+    return False
+
+
+def decide_hvac_status_batch(temperature, occupancy, capacity):
+    """
+    decide_hvac_status 的向量化版本：参数是所有房间的数组 (或标量)，返回 bool 数组
+    规则和顺序与 decide_hvac_status 相同
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    occupancy = np.asarray(occupancy, dtype=np.float64)
+    capacity = np.asarray(capacity, dtype=np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        occupancy_rate = np.where(capacity > 0, occupancy / capacity, 0)
+
+    # 规则 1 优先：没人就关；否则规则 2 (过热 / 过冷) 或规则 3 (上座率超过 80%) 开
+    comfort = (temperature > 26) | (temperature < 18)
+    crowded = occupancy_rate > 0.8
+    return (occupancy != 0) & (comfort | crowded)
@@ -0,0 +1,66 @@
+import re
+
+# ==========================================
+# TopicMatcher
+# 由 Catalog 发布的 topic_structure 模板编译出的 topic 解析器 / 订阅过滤器：
+#
+#   matcher = TopicMatcher("polito/smartcampus/{room_id}/{device_type}/{index_number}/value")
+#   matcher.match("polito/smartcampus/R1/wifi/1/value")
+#       -> {"room_id": "R1", "device_type": "wifi", "index_number": "1"}
+#   matcher.subscription(device_type="wifi")
+#       -> "polito/smartcampus/+/wifi/+/value"
+#
+# 前缀有多少层都可以 (不再写死 parts[2] / parts[-4])，模板只在构造时编译一次。
+# 同一批 topic 会反复出现，解析结果按 topic 缓存。
+# ==========================================
+_PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+
+class TopicMatcher:
+    def __init__(self, template: str, cache_size: int = 65536):
+        self.template = template
+        self.levels = template.split("/")
+        self.fields = []
+
+        pattern = []
+        for level in self.levels:
+            m = _PLACEHOLDER.fullmatch(level)
+            if m:
+                if m.group(1) in self.fields:
+                    raise ValueError(f"Duplicate placeholder {{{m.group(1)}}} in topic template {template!r}")
+                self.fields.append(m.group(1))
+                pattern.append("([^/]+)")
+            elif "{" in level or "+" in level or "#" in level:
+                # 占位符必须占满一整层，MQTT 通配符不能出现在模板里
+                raise ValueError(f"Unsupported topic template level {level!r} in {template!r}")
+            else:
+                pattern.append(re.escape(level))
+        self._regex = re.compile("/".join(pattern))
+
+        self.cache_size = cache_size
+        self._cache = {}
+
+    def match(self, topic: str):
+        """topic 符合模板时返回 {占位符: 值}，否则返回 None。"""
+        try:
+            return self._cache[topic]
+        except KeyError:
+            pass
+
+        m = self._regex.fullmatch(topic)
+        result = dict(zip(self.fields, m.groups())) if m else None
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+        self._cache[topic] = result
+        return result
+
+    def subscription(self, **fixed) -> str:
+        """MQTT 订阅过滤器：给出的占位符替换成固定值，其余替换成单层通配符 +。"""
+        unknown = set(fixed) - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown placeholder(s) {sorted(unknown)} for topic template {self.template!r}")
+        levels = []
+        for level in self.levels:
+            m = _PLACEHOLDER.fullmatch(level)
+            levels.append(str(fixed.get(m.group(1), "+")) if m else level)
+        return "/".join(levels)
@@ -0,0 +1,228 @@
+"""Catalog load test on a synthetic campus.
+
+Usage:
+    python benchmarks/catalog_load_test.py
+    python benchmarks/catalog_load_test.py --buildings 20 --rooms 50 --devices-per-room 6 --server asyncio
+    python benchmarks/catalog_load_test.py --url http://127.0.0.1:8080/api      # existing Catalog
+    python benchmarks/catalog_load_test.py --compare benchmarks/results/old.json
+
+Generates N buildings x M rooms x K devices per room, using the same ids
+and topic template ({base}/{room}/{type}/{index}) as Sensors/, then runs
+these phases against the Catalog, each with --concurrency client threads:
+
+    register         POST /api/devices, one request per device
+                     (or POST /api/devices/_bulk per room with --bulk)
+    lookup_by_id     GET /api/devices/{id}
+    filter_by_room   GET /api/devices?room=...
+    discovery        GET /api/services
+
+Without --url a Catalog is started in a subprocess on a temporary catalog
+file (server mode from --server, persistence from setting_config.json).
+The report (throughput and latency percentiles per phase, plus the git
+commit and parameters) is written as JSON to --out. --compare prints the
+change against an earlier report.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from catalog_server_bench import start_server, percentile
+
+# (type, role, resources)，和 Sensors/ 里每个房间的设备一致：温度传感器、wifi 传感器、空调执行器
+DEVICE_KINDS = [
+    ("temperature", "sensor", ("value",)),
+    ("wifi", "sensor", ("value",)),
+    ("temperature", "actuator", ("cmd", "status")),
+]
+
+
+def synthetic_campus(buildings, rooms, devices_per_room, base="polito/smartcampus"):
+    """返回 (devices, room_ids)。设备 id 格式与 GenericDevice 相同: {room}_{type}_{role}_{index}"""
+    devices = []
+    room_ids = []
+    for b in range(buildings):
+        building = f"B{b:02d}"
+        for r in range(rooms):
+            room = f"{building}R{r:03d}"
+            room_ids.append(room)
+            for k in range(devices_per_room):
+                dev_type, role, resources = DEVICE_KINDS[k % len(DEVICE_KINDS)]
+                index = k // len(DEVICE_KINDS) + 1
+                topic = f"{base}/{room}/{dev_type}/{index}"
+                mqtt_topics = {("val" if res == "value" else res): f"{topic}/{res}" for res in resources}
+                devices.append({
+                    "id": f"{room}_{dev_type}_{role}_{index}",
+                    "type": dev_type,
+                    "resources": list(mqtt_topics.keys()),
+                    "mqtt_topics": mqtt_topics,
+                    "update_interval": 10 if dev_type == "wifi" else 30,
+                    "location": {"campus": "SYNTH", "building": building, "floor": str(r // 20), "room": room},
+                })
+    return devices, room_ids
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.elapsed = 0.0
+
+    def record(self, latency, ok):
+        with self.lock:
+            self.latencies.append(latency)
+            if not ok:
+                self.errors += 1
+
+    def report(self):
+        lat = sorted(self.latencies)
+        return {
+            "requests": len(lat),
+            "errors": self.errors,
+            "seconds": round(self.elapsed, 3),
+            "rps": round(len(lat) / self.elapsed, 1) if self.elapsed else None,
+            "p50_ms": round(percentile(lat, 0.50) * 1000, 3),
+            "p90_ms": round(percentile(lat, 0.90) * 1000, 3),
+            "p99_ms": round(percentile(lat, 0.99) * 1000, 3),
+            "max_ms": round(lat[-1] * 1000, 3) if lat else None,
+        }
+
+
+def run_phase(name, jobs, concurrency, call):
+    """jobs 里的每一项调用一次 call(session, job)，返回 Phase。"""
+    phase = Phase(name)
+    local = threading.local()
+
+    def one(job):
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            ok = call(session, job).status_code < 400
+        except requests.RequestException:
+            ok = False
+        phase.record(time.perf_counter() - start, ok)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, jobs))
+    phase.elapsed = time.perf_counter() - start
+    return phase
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, previous=None):
+    print(f"{'phase':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in report["phases"].items():
+        line = (f"{name:<16}{r['requests']:>10}{r['errors']:>8}{r['rps'] or 0:>10.0f}"
+                f"{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['max_ms'] or 0:>10.2f}")
+        old = (previous or {}).get("phases", {}).get(name)
+        if old and old.get("rps"):
+            line += f"   req/s {(r['rps'] - old['rps']) / old['rps']:+.0%}, p99 {r['p99_ms'] - old['p99_ms']:+.2f} ms"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buildings", type=int, default=10)
+    parser.add_argument("--rooms", type=int, default=20, help="rooms per building")
+    parser.add_argument("--devices-per-room", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=5000, help="requests in each query phase")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--bulk", action="store_true", help="register one room per _bulk request")
+    parser.add_argument("--server", choices=["cherrypy", "asyncio"], default="cherrypy")
+    parser.add_argument("--url", help="use a running Catalog instead of starting one")
+    parser.add_argument("--port", type=int, default=18190)
+    parser.add_argument("--out", default=os.path.join(ROOT, "benchmarks", "results",
+                                                      f"catalog_load_{time.strftime('%Y%m%d_%H%M%S')}.json"))
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    devices, room_ids = synthetic_campus(args.buildings, args.rooms, args.devices_per_room)
+    rng = random.Random(args.seed)
+    print(f"Synthetic campus: {args.buildings} buildings x {args.rooms} rooms x {args.devices_per_room} devices "
+          f"= {len(devices)} devices")
+
+    tmp = proc = None
+    base = args.url.rstrip("/") if args.url else None
+    if base is None:
+        tmp = tempfile.TemporaryDirectory()
+        proc, base = start_server(args.server, args.port, tmp.name)
+
+    try:
+        phases = []
+        if args.bulk:
+            by_room = {}
+            for dev in devices:
+                by_room.setdefault(dev["location"]["room"], []).append(dev)
+            phases.append(run_phase("register", list(by_room.values()), args.concurrency,
+                                    lambda s, batch: s.post(base + "/devices/_bulk", json=batch, timeout=60)))
+        else:
+            phases.append(run_phase("register", devices, args.concurrency,
+                                    lambda s, dev: s.post(base + "/devices", json=dev, timeout=60)))
+
+        ids = [rng.choice(devices)["id"] for _ in range(args.lookups)]
+        phases.append(run_phase("lookup_by_id", ids, args.concurrency,
+                                lambda s, dev_id: s.get(base + "/devices/" + dev_id, timeout=60)))
+
+        rooms = [rng.choice(room_ids) for _ in range(args.lookups)]
+        phases.append(run_phase("filter_by_room", rooms, args.concurrency,
+                                lambda s, room: s.get(base + "/devices", params={"room": room}, timeout=60)))
+
+        phases.append(run_phase("discovery", range(args.lookups), args.concurrency,
+                                lambda s, _: s.get(base + "/services", timeout=60)))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+            tmp.cleanup()
+
+    report = {
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "target": args.url or f"local {args.server}",
+        "params": {
+            "buildings": args.buildings, "rooms": args.rooms, "devices_per_room": args.devices_per_room,
+            "devices": len(devices), "lookups": args.lookups, "concurrency": args.concurrency,
+            "bulk": args.bulk, "seed": args.seed,
+        },
+        "phases": {p.name: p.report() for p in phases},
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"Compared with {args.compare} (commit {previous.get('commit')})")
+    print_report(report, previous)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Catalog read latency under a registration storm.
+
+Usage:
+    python benchmarks/catalog_read_latency_bench.py
+    python benchmarks/catalog_read_latency_bench.py --readers 16 --devices 5000 --mode snapshot wal
+
+N reader threads run the same queries as DevicesAPI.GET (room filter,
+room+type filter, occasionally the full list, followed by JSON encoding)
+with a short pause between requests, while one writer thread keeps
+re-registering devices. Each run is done twice:
+
+    locked     readers take store.lock around every query, which is what
+               CatalogStore did before reads moved to immutable versions
+               (a reader waits for any write in progress, including its disk I/O)
+    lock-free  readers use the published version directly (current code)
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Catalog.catalog_store import CatalogStore
+from catalog_wal_bench import make_device
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_once(mode, n, readers, seconds, locked, think):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CatalogStore(os.path.join(tmp, "catalog_script.json"), persistence=mode)
+        devices = [make_device(i) for i in range(n)]
+        store.put_many("devices", devices)
+        rooms = sorted({d["location"]["room"] for d in devices})
+
+        stop = threading.Event()
+        latencies = [[] for _ in range(readers)]
+        writes = [0]
+
+        def query(rng):
+            r = rng.random()
+            if r < 0.7:
+                result = store.find_devices(room=rng.choice(rooms))
+            elif r < 0.99:
+                result = store.find_devices(room=rng.choice(rooms), device_type="temperature")
+            else:
+                result = store.list("devices")
+            return json.dumps(result)
+
+        def reader(i):
+            rng = random.Random(i)
+            out = latencies[i]
+            while not stop.is_set():
+                start = time.perf_counter()
+                if locked:
+                    with store.lock:
+                        query(rng)
+                else:
+                    query(rng)
+                out.append(time.perf_counter() - start)
+                # 真实的 GET 大部分时间花在网络收发上，这里用 sleep 代替
+                time.sleep(think)
+
+        def writer():
+            rng = random.Random(-1)
+            while not stop.is_set():
+                dev = dict(rng.choice(devices))
+                dev["update_interval"] = rng.randint(5, 60)
+                store.put("devices", dev)
+                writes[0] += 1
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        threads.append(threading.Thread(target=writer))
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        store.close()
+
+        all_latencies = [x for per_thread in latencies for x in per_thread]
+        return {
+            "reads": len(all_latencies) / seconds,
+            "writes": writes[0] / seconds,
+            "p50": percentile(all_latencies, 0.50) * 1000,
+            "p99": percentile(all_latencies, 0.99) * 1000,
+            "max": max(all_latencies) * 1000 if all_latencies else float("nan"),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--think", type=float, default=2.0, help="ms each reader sleeps between queries")
+    parser.add_argument("--mode", nargs="+", default=["snapshot", "wal"], help="persistence modes to test")
+    args = parser.parse_args()
+
+    print(f"{args.devices} devices, {args.readers} reader threads, 1 writer thread, {args.seconds:.0f}s per run")
+    print(f"{'mode':<10}{'read path':<11}{'reads/s':>10}{'writes/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for mode in args.mode:
+        for locked in (True, False):
+            r = run_once(mode, args.devices, args.readers, args.seconds, locked, args.think / 1000)
+            print(f"{mode:<10}{'locked' if locked else 'lock-free':<11}{r['reads']:>10.0f}{r['writes']:>10.0f}"
+                  f"{r['p50']:>10.2f}{r['p99']:>10.2f}{r['max']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Catalog HTTP front ends under mixed register/query load: CherryPy vs. asyncio.
+
+Usage:
+    python benchmarks/catalog_server_bench.py
+    python benchmarks/catalog_server_bench.py --clients 4x32 --seconds 20 --write-ratio 0.2
+    python benchmarks/catalog_server_bench.py --pollers 40      # plus idle long-poll watchers
+
+For each server mode a Catalog is started in a subprocess on a temporary
+catalog file (persistence mode from setting_config.json), pre-loaded with
+--devices devices through /api/devices/_bulk, and then hit by
+P processes x T threads (keep-alive requests.Session each) for --seconds:
+
+    write-ratio    POST /api/devices (re-registration of a random device)
+    rest, evenly   GET /api/devices?room=..   GET /api/devices/{id}
+                   GET /api/devices?limit=100 GET /api/services
+
+--pollers keeps that many /api/devices/_changes long-polls open during
+the run, like Controller instances watching the catalog.
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from catalog_wal_bench import make_device
+
+
+def start_server(mode, port, tmp):
+    code = (f"import sys; sys.path.insert(0, {ROOT!r}); from Catalog.Catalog_manage import run; "
+            f"run('127.0.0.1', {port}, server={mode!r}, catalog_path={os.path.join(tmp, 'catalog_script.json')!r})")
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}/api"
+    for _ in range(100):
+        try:
+            requests.get(base + "/stats", timeout=1)
+            return proc, base
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def client_process(base, threads, seconds, write_ratio, n, seed, out):
+    rooms = [f"R{i}" for i in range(min(n, 500))]
+    stop_at = time.perf_counter() + seconds
+    results = []
+
+    def worker(k):
+        rng = random.Random(seed * 1000 + k)
+        session = requests.Session()
+        latencies = []
+        errors = 0
+        while time.perf_counter() < stop_at:
+            r = rng.random()
+            start = time.perf_counter()
+            try:
+                if r < write_ratio:
+                    dev = make_device(rng.randrange(n))
+                    dev["update_interval"] = rng.randint(5, 60)
+                    res = session.post(base + "/devices", json=dev, timeout=30)
+                else:
+                    q = rng.randrange(4)
+                    if q == 0:
+                        res = session.get(base + "/devices", params={"room": rng.choice(rooms)}, timeout=30)
+                    elif q == 1:
+                        res = session.get(base + "/devices/" + make_device(rng.randrange(n))["id"], timeout=30)
+                    elif q == 2:
+                        res = session.get(base + "/devices", params={"limit": 100}, timeout=30)
+                    else:
+                        res = session.get(base + "/services", timeout=30)
+                if res.status_code >= 400:
+                    errors += 1
+            except requests.RequestException:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        results.append((latencies, errors))
+
+    ts = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    out.put(([x for lat, _ in results for x in lat], sum(e for _, e in results)))
+
+
+def hold_pollers(base, count, stop):
+    def poller():
+        session = requests.Session()
+        feed = session.get(base + "/devices/_changes", timeout=60).json()
+        while not stop.is_set():
+            try:
+                feed = session.get(base + "/devices/_changes", timeout=60, params={
+                    "since": feed["revision"], "epoch": feed["epoch"], "timeout": 25}).json()
+            except requests.RequestException:
+                return
+
+    ts = [threading.Thread(target=poller, daemon=True) for _ in range(count)]
+    for t in ts:
+        t.start()
+    return ts
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float("nan")
+
+
+def run_mode(mode, port, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        proc, base = start_server(mode, port, tmp)
+        try:
+            devices = [make_device(i) for i in range(args.devices)]
+            requests.post(base + "/devices/_bulk", json=devices, timeout=120).raise_for_status()
+
+            stop = threading.Event()
+            hold_pollers(base, args.pollers, stop)
+            time.sleep(0.5 if args.pollers else 0)
+
+            procs, threads = args.clients
+            out = multiprocessing.Queue()
+            workers = [multiprocessing.Process(target=client_process,
+                                               args=(base, threads, args.seconds, args.write_ratio,
+                                                     args.devices, i, out))
+                       for i in range(procs)]
+            for w in workers:
+                w.start()
+            collected = [out.get() for _ in workers]
+            for w in workers:
+                w.join()
+            stop.set()
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    latencies = sorted(x for lat, _ in collected for x in lat)
+    return {
+        "rps": len(latencies) / args.seconds,
+        "errors": sum(e for _, e in collected),
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p90": percentile(latencies, 0.90) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "max": latencies[-1] * 1000 if latencies else float("nan"),
+    }
+
+
+def parse_clients(value):
+    procs, _, threads = value.partition("x")
+    return int(procs), int(threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["cherrypy", "asyncio"])
+    parser.add_argument("--devices", type=int, default=2000)
+    parser.add_argument("--clients", type=parse_clients, default=(4, 16), help="processes x threads, e.g. 4x16")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--pollers", type=int, default=0)
+    parser.add_argument("--port", type=int, default=18180)
+    args = parser.parse_args()
+
+    procs, threads = args.clients
+    print(f"{args.devices} devices, {procs}x{threads} clients, {args.write_ratio:.0%} writes, "
+          f"{args.pollers} long-pollers, {args.seconds:.0f}s per mode")
+    print(f"{'server':<10}{'req/s':>10}{'errors':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for i, mode in enumerate(args.modes):
+        r = run_mode(mode, args.port + i, args)
+        print(f"{mode:<10}{r['rps']:>10.0f}{r['errors']:>8}{r['p50']:>10.2f}{r['p90']:>10.2f}"
+              f"{r['p99']:>10.2f}{r['max']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Registration throughput of CatalogStore: full-file snapshot vs. append-only WAL vs. SQLite.
+
+Usage:
+    python benchmarks/catalog_wal_bench.py
+    python benchmarks/catalog_wal_bench.py --sizes 1000 10000 --budget 60
+
+Snapshot mode rewrites the whole catalog on every registration (O(n^2) bytes
+for n devices), so each run is capped at --budget seconds; a capped run
+reports the throughput over the registrations it managed to finish.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from Catalog.catalog_store import CatalogStore
+
+
+def make_device(i, rooms=500):
+    room = f"R{i % rooms}"
+    dev_type = "temperature" if i % 2 == 0 else "wifi"
+    index = i // (rooms * 2) + 1
+    base = f"polito/smartcampus/{room}/{dev_type}/{index}"
+    return {
+        "id": f"{room}_{dev_type}_sensor_{index}",
+        "type": dev_type,
+        "resources": ["val"],
+        "mqtt_topics": {"val": base + "/value"},
+        "update_interval": 30 if dev_type == "temperature" else 10,
+        "location": {"campus": "POLITO", "building": "R", "floor": "0", "room": room},
+    }
+
+
+def run_once(mode, n, budget):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog_script.json")
+        store = CatalogStore(path, persistence=mode)
+        devices = [make_device(i) for i in range(n)]
+
+        done = 0
+        start = time.perf_counter()
+        for dev in devices:
+            store.put("devices", dev)
+            done += 1
+            if time.perf_counter() - start > budget:
+                break
+        elapsed = time.perf_counter() - start
+
+        # WAL 模式下把最终合并也算进去，保证比较公平
+        close_start = time.perf_counter()
+        store.close()
+        close_elapsed = time.perf_counter() - close_start
+
+        return {
+            "mode": mode,
+            "n": n,
+            "done": done,
+            "elapsed": elapsed,
+            "close": close_elapsed,
+            "rate": done / elapsed if elapsed > 0 else float("inf"),
+            "partial": done < n,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--modes", nargs="+", default=["snapshot", "wal", "sqlite"])
+    parser.add_argument("--budget", type=float, default=30.0, help="max seconds per run")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'devices':>10}{'done':>10}{'seconds':>10}{'final':>10}{'reg/s':>12}")
+    for n in args.sizes:
+        for mode in args.modes:
+            r = run_once(mode, n, args.budget)
+            note = "  (budget hit)" if r["partial"] else ""
+            print(f"{r['mode']:<10}{r['n']:>10}{r['done']:>10}{r['elapsed']:>10.2f}"
+                  f"{r['close']:>10.2f}{r['rate']:>12.0f}{note}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Response size and encode/decode time for each negotiated representation.
+
+Usage:
+    python benchmarks/content_encoding_bench.py
+    python benchmarks/content_encoding_bench.py --buildings 20 --rooms 50 --devices-per-room 6
+
+Payloads (built in-process, same shapes the servers return):
+
+    devices      GET /api/devices             full device documents
+    topics       GET /api/topics              routing table
+    debug_cache  Controller GET /debug/cache  snapshot[room][type][index] = {value, received_at}
+    dashboard    Controller GET /             one entry per room
+
+For every payload, content_codec.encode() is timed for JSON and
+MessagePack, each with and without gzip, plus the matching decode() on
+the client side.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from catalog_load_test import synthetic_campus
+from Catalog.catalog_store import device_routes
+from Catalog.content_codec import JSON_MIME, MSGPACK_MIME, encode, decode
+
+VARIANTS = [
+    ("json", (JSON_MIME, None)),
+    ("json+gzip", (JSON_MIME, "gzip")),
+    ("msgpack", (MSGPACK_MIME, None)),
+    ("msgpack+gzip", (MSGPACK_MIME, "gzip")),
+]
+
+
+def build_payloads(devices, room_ids, rng):
+    now = int(time.time())
+    topics = {}
+    for dev in devices:
+        topics.update(device_routes(dev))
+
+    snapshot = {}
+    for room in room_ids:
+        snapshot[room] = {
+            "temperature": {"1": {"value": round(rng.uniform(18, 30), 2), "received_at": now - rng.randrange(60)}},
+            "wifi": {"1": {"value": rng.randrange(300), "received_at": now - rng.randrange(60)}},
+        }
+
+    dashboard = [{
+        "room_id": room, "building": room[:3], "floor": "0", "type": "Aula", "capacity": 150,
+        "available": rng.random() < 0.5,
+        "temperature": snapshot[room]["temperature"]["1"]["value"],
+        "students": snapshot[room]["wifi"]["1"]["value"],
+    } for room in room_ids]
+
+    return {
+        "devices": devices,
+        "topics": {"epoch": "bench", "revision": len(devices), "topics": topics},
+        "debug_cache": snapshot,
+        "dashboard": dashboard,
+    }
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buildings", type=int, default=10)
+    parser.add_argument("--rooms", type=int, default=20, help="rooms per building")
+    parser.add_argument("--devices-per-room", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N")
+    args = parser.parse_args()
+
+    devices, room_ids = synthetic_campus(args.buildings, args.rooms, args.devices_per_room)
+    payloads = build_payloads(devices, room_ids, random.Random(42))
+    print(f"{len(room_ids)} rooms, {len(devices)} devices (best of {args.repeat})")
+    print(f"{'payload':<13}{'variant':<14}{'bytes':>10}{'ratio':>8}{'encode ms':>11}{'decode ms':>11}")
+
+    for name, obj in payloads.items():
+        baseline = None
+        for label, variant in VARIANTS:
+            encode_s, (body, headers) = timed(lambda: encode(obj, variant), args.repeat)
+            decode_s, decoded = timed(lambda: decode(body, headers["Content-Type"], headers.get("Content-Encoding")),
+                                      args.repeat)
+            assert decoded == obj, f"{name}/{label} does not round-trip"
+            baseline = baseline or len(body)
+            print(f"{name:<13}{label:<14}{len(body):>10}{len(body) / baseline:>8.2f}"
+                  f"{encode_s * 1000:>11.2f}{decode_s * 1000:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
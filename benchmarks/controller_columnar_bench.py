@@ -0,0 +1,121 @@
+"""Memory and query time: nested-dict snapshot vs ColumnarStore.
+
+Usage:
+    python benchmarks/controller_columnar_bench.py
+    python benchmarks/controller_columnar_bench.py --sensors 100000 --indexes 2
+
+Both layouts are filled with the same --sensors readings (rooms with
+wifi + temperature sensors, --indexes sensors of each type per room)
+through the same apply() the Controller ingest thread calls.
+
+    memory        bytes per sensor, measured with tracemalloc while the
+                  store is built (includes the slot table / interned keys)
+    pick_latest   OccupancyAnalyzer.pick_latest_value() for every room and
+                  both types (what the dashboard and decision loop do)
+    latest_values ColumnarSnapshot.latest_values(): all rooms in one call
+    ingest batch  apply() of --batch random updates (copy-on-write)
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Controller"))
+from snapshot_store import SnapshotStore
+from columnar_store import ColumnarStore
+from OccupancyAnalyzer import pick_latest_value
+
+TYPES = ("temperature", "wifi")
+
+
+def make_updates(keys, rng, now):
+    updates = []
+    for room_id, device_type, index_number in keys:
+        value = round(rng.uniform(18, 30), 2) if device_type == "temperature" else rng.randrange(300)
+        updates.append((room_id, device_type, index_number, {
+            "sensor_id": f"{room_id}_{device_type}_{index_number}",
+            "value": value,
+            "unit": "C" if device_type == "temperature" else "count",
+            "sensor_timestamp": now - rng.random(),
+            "received_at": now - rng.random(),
+        }))
+    return updates
+
+
+def build(cls, keys, now):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = cls()
+    # 消息在测量范围内生成：dict 布局会把每条 item 留下来，列式布局只留下数组里的值
+    store.apply(make_updates(keys, random.Random(42), now))
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, after - before
+
+
+def timed(fn, repeat, setup=lambda: None):
+    best = float("inf")
+    for _ in range(repeat):
+        arg = setup()
+        start = time.perf_counter()
+        result = fn() if arg is None else fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=10000)
+    parser.add_argument("--indexes", type=int, default=1, help="sensors of each type per room")
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5, help="best of N")
+    args = parser.parse_args()
+
+    per_room = len(TYPES) * args.indexes
+    n_rooms = max(1, args.sensors // per_room)
+    rooms = [f"R{i:05d}" for i in range(n_rooms)]
+    keys = [(room, t, str(i + 1)) for room in rooms for t in TYPES for i in range(args.indexes)]
+    rng = random.Random(42)
+    now = time.time()
+    batch = make_updates(rng.choices(keys, k=args.batch), rng, now + 1)
+
+    print(f"{len(keys)} sensors, {n_rooms} rooms, {args.indexes} per type per room (best of {args.repeat})")
+    print(f"{'layout':<10}{'bytes/sensor':>14}{'pick_latest ms':>16}{'latest_values ms':>18}{'ingest batch ms':>17}")
+
+    results = {}
+    for name, cls in (("dict", SnapshotStore), ("columnar", ColumnarStore)):
+        store, nbytes = build(cls, keys, now)
+
+        def new_version():
+            # 每次查询一个新发布的版本，列式快照里缓存的 latest_values 不会被重复利用
+            store.apply(batch[:1])
+            return store.current()
+
+        def pick_all(snap):
+            return {t: {room: pick_latest_value(snap, room, t) for room in rooms} for t in TYPES}
+
+        pick_s, picked = timed(pick_all, args.repeat, new_version)
+        results[name] = picked
+        if hasattr(store.current(), "latest_values"):
+            vec_s, vec = timed(lambda snap: {t: snap.latest_values(t) for t in TYPES}, args.repeat, new_version)
+            assert vec == picked, "latest_values() differs from pick_latest_value()"
+            vec_ms = f"{vec_s * 1000:.2f}"
+        else:
+            vec_ms = "-"
+        apply_s, _ = timed(lambda: store.apply(batch), args.repeat)
+
+        print(f"{name:<10}{nbytes / len(keys):>14.1f}{pick_s * 1000:>16.2f}{vec_ms:>18}{apply_s * 1000:>17.2f}")
+
+    assert results["dict"] == results["columnar"], "layouts disagree"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Decision loop cost and reaction latency: 5 s full sweep vs event-driven engine.
+
+Usage:
+    python benchmarks/controller_decision_bench.py
+    python benchmarks/controller_decision_bench.py --rooms 500 --rate 200 --seconds 20
+
+A temporary directory gets a setting_config.json with --rooms rooms and
+the real schedule.json (OccupancyAnalyzer.ROOM_CONFIG_PATH / SCHEDULE_PATH
+point there), then for each mode a Controller (no
+broker connection; publishes are dropped by paho) ingests synthetic
+wifi/temperature readings through its ingest queue at --rate msg/s.
+Temperatures jump across the heating thresholds so decisions keep
+flipping and commands are sent.
+
+    sweep   start_decision_loop(interval_seconds=5): every room every 5 s
+    event   start_decision_loop(mode="event"): only rooms with new data
+            (plus schedule boundaries, max_age timeouts, throttle rechecks)
+
+Reported from Controller.decision_stats(): rooms evaluated per second
+and input -> decision / input -> command latency.
+
+--month overrides the month seen by the analyzer (September/October have
+no heating or cooling mode, so no command would ever be sent) and
+--min-interval overrides Controller.CMD_MIN_INTERVAL so that every flip
+is published.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "Controller"))
+import OccupancyAnalyzer
+from Controller import Controller
+from TopicMatcher import TopicMatcher
+
+
+def write_config(workdir, n_rooms):
+    with open(os.path.join(ROOT, "setting_config.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    config["rooms"] = [{"room_id": f"B{i:04d}", "building": "B", "type": "Aula", "capacity": 100,
+                        "floor": str(i % 5)} for i in range(n_rooms)]
+    with open(os.path.join(workdir, "setting_config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+    shutil.copy(os.path.join(ROOT, "schedule.json"), workdir)
+    OccupancyAnalyzer.ROOM_CONFIG_PATH = os.path.join(workdir, "setting_config.json")
+    OccupancyAnalyzer.SCHEDULE_PATH = os.path.join(workdir, "schedule.json")
+    return [room["room_id"] for room in config["rooms"]]
+
+
+def message(room_id, device_type, value):
+    topic = f"polito/smartcampus/{room_id}/{device_type}/1/value"
+    payload = json.dumps({"id": f"{room_id}_{device_type}", "v": value, "u": "", "t": time.time()})
+    return topic, payload.encode(), time.time()
+
+
+def run(mode, rooms, args):
+    controller = Controller("localhost", 1883)
+    controller.CMD_MIN_INTERVAL = args.min_interval
+    # 不连 Catalog，直接用默认的 topic 模板
+    controller.topic_matcher = TopicMatcher(Controller.DEFAULT_TOPIC_STRUCTURE + Controller.SENSOR_VALUE_SUFFIX)
+    # 相当于 refresh_topics_from_catalog()：只有表里的 topic 会被 ingest 接受
+    controller.people_value_topic_by_room = {room_id: message(room_id, "wifi", 0)[0] for room_id in rooms}
+    controller.temperature_value_topic_by_room = {room_id: message(room_id, "temperature", 0)[0] for room_id in rooms}
+    controller.temperature_cmd_topic_by_room = {room_id: f"bench/{room_id}/cmd" for room_id in rooms}
+    controller._update_accepted_topics()
+    controller.ingest.start()
+
+    # 先让每个房间都有人数数据，否则决策都是 None
+    for room_id in rooms:
+        controller.ingest.put(message(room_id, "wifi", 50))
+    while controller.ingest.stats()["applied"] < len(rooms):
+        time.sleep(0.01)
+
+    stop = threading.Event()
+
+    def producer():
+        rng = random.Random(7)
+        interval = 1.0 / args.rate
+        next_at = time.time()
+        while not stop.is_set():
+            room_id = rng.choice(rooms)
+            if rng.random() < 0.8:
+                controller.ingest.put(message(room_id, "temperature", rng.choice((18.0, 21.0, 23.0))))
+            else:
+                controller.ingest.put(message(room_id, "wifi", rng.randrange(10, 90)))
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.time()))
+
+    thread = threading.Thread(target=producer)
+    with contextlib.redirect_stdout(io.StringIO()):
+        controller.start_decision_loop(interval_seconds=5, mode=mode, max_age=args.max_age)
+        thread.start()
+        time.sleep(args.seconds)
+        stop.set()
+        thread.join()
+        controller.stop()
+    stats = controller.decision_stats()
+    stats["decisions_per_s"] = round(stats["evaluations"] / args.seconds, 1)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="incoming messages per second")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--max-age", type=float, default=60)
+    parser.add_argument("--month", type=int, default=1, help="month used by the analyzer (0 = real month)")
+    parser.add_argument("--min-interval", type=float, default=0, help="Controller.CMD_MIN_INTERVAL")
+    args = parser.parse_args()
+
+    if args.month:
+        parse_timestamp = OccupancyAnalyzer.parse_timestamp
+        OccupancyAnalyzer.parse_timestamp = lambda ts: dict(parse_timestamp(ts), month=args.month)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rooms = write_config(workdir, args.rooms)
+        print(f"{args.rooms} rooms, {args.rate:.0f} msg/s, {args.seconds:.0f}s per mode, month {args.month or 'now'}")
+        print(f"{'mode':<7}{'decisions/s':>12}{'commands':>10}{'decide p50/p99 ms':>20}{'command p50/p99 ms':>21}")
+        for mode in ("sweep", "event"):
+            stats = run(mode, rooms, args)
+            decide = "{p50}/{p99}".format(**stats["input_to_decision_ms"])
+            command = "{p50}/{p99}".format(**stats["input_to_command_ms"])
+            print(f"{mode:<7}{stats['decisions_per_s']:>12}{stats['commands']:>10}{decide:>20}{command:>21}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Controller.get_snapshot() latency: deepcopy under a lock vs SnapshotStore.
+
+Usage:
+    python benchmarks/controller_snapshot_bench.py
+    python benchmarks/controller_snapshot_bench.py --sensors 50000 --batch 500 --readers 8
+
+The snapshot holds --sensors readings spread over rooms with one wifi and
+one temperature sensor per room (the shape the ingest thread writes).
+Each mode runs a writer applying --batch updates per ingest batch at
+about --rate msg/s, while N reader threads call get_snapshot() (the
+decision loop and every RestAPI.GET do this):
+
+    deepcopy   what Controller did before: data_lock + copy.deepcopy()
+               of latest_by_room, writes update the dict in place
+    cow        SnapshotStore: writes publish a new version per batch,
+               readers take the published dict without a lock or copy
+
+Reported: reader latency percentiles and writer cost per batch.
+"""
+
+import argparse
+import copy
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.join(ROOT, "Controller"))
+from snapshot_store import SnapshotStore
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def make_item(rng, index):
+    return {
+        "sensor_id": f"sensor_{index}",
+        "value": round(rng.uniform(18, 30), 2),
+        "unit": "Cel",
+        "sensor_timestamp": time.time(),
+        "received_at": time.time(),
+    }
+
+
+class DeepcopySnapshot:
+    """Controller.get_snapshot() before SnapshotStore."""
+
+    def __init__(self):
+        self.data_lock = threading.Lock()
+        self.latest_by_room = {}
+
+    def apply(self, updates):
+        with self.data_lock:
+            for room_id, device_type, index_number, item in updates:
+                self.latest_by_room.setdefault(room_id, {}).setdefault(device_type, {})[index_number] = item
+
+    def get_snapshot(self):
+        with self.data_lock:
+            return copy.deepcopy(self.latest_by_room)
+
+
+class CowSnapshot:
+    def __init__(self):
+        self.snapshots = SnapshotStore()
+
+    def apply(self, updates):
+        self.snapshots.apply(updates)
+
+    def get_snapshot(self):
+        return self.snapshots.current()
+
+
+def sensor_keys(n):
+    rooms = max(1, n // 2)
+    return [(f"R{i // 2:05d}", ("temperature", "wifi")[i % 2], "1") for i in range(min(n, rooms * 2))]
+
+
+def run(mode, keys, args):
+    rng = random.Random(0)
+    target = DeepcopySnapshot() if mode == "deepcopy" else CowSnapshot()
+    target.apply([(r, t, i, make_item(rng, n)) for n, (r, t, i) in enumerate(keys)])
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(args.readers)]
+    write_costs = []
+
+    def reader(i):
+        out = latencies[i]
+        while not stop.is_set():
+            start = time.perf_counter()
+            target.get_snapshot()
+            out.append(time.perf_counter() - start)
+            time.sleep(args.think)
+
+    def writer():
+        wrng = random.Random(1)
+        interval = args.batch / args.rate
+        while not stop.is_set():
+            batch = [(r, t, i, make_item(wrng, n)) for n, (r, t, i) in
+                     enumerate(wrng.choices(keys, k=args.batch))]
+            start = time.perf_counter()
+            target.apply(batch)
+            cost = time.perf_counter() - start
+            write_costs.append(cost)
+            time.sleep(max(0.0, interval - cost))
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads.append(threading.Thread(target=writer))
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    lat = [x for chunk in latencies for x in chunk]
+    return lat, write_costs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sensors", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=500, help="updates per ingest batch")
+    parser.add_argument("--rate", type=float, default=5000, help="incoming messages per second")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--think", type=float, default=0.01, help="pause between reads (s)")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    keys = sensor_keys(args.sensors)
+    print(f"{len(keys)} sensors in {len({k[0] for k in keys})} rooms, batch {args.batch}, "
+          f"{args.rate:.0f} msg/s, {args.readers} readers, {args.seconds:.0f}s per mode")
+    print(f"{'mode':<10}{'reads':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'write/batch ms':>16}")
+    for mode in ("deepcopy", "cow"):
+        lat, writes = run(mode, keys, args)
+        print(f"{mode:<10}{len(lat):>8}{percentile(lat, 0.5) * 1000:>10.3f}{percentile(lat, 0.99) * 1000:>10.3f}"
+              f"{max(lat) * 1000:>10.3f}{percentile(writes, 0.5) * 1000:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
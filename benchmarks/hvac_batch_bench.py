@@ -0,0 +1,96 @@
+"""Scalar vs vectorized HVAC decisions, with an equivalence check.
+
+Usage:
+    python benchmarks/hvac_batch_bench.py
+    python benchmarks/hvac_batch_bench.py --rooms 10000 100000 1000000 --repeat 3
+
+For each room count, random inputs are generated: temperatures across
+all thresholds (including exact threshold values), occupancy from 0 to
+above capacity, capacities including 0 and negative values, months 1-12
+plus out-of-range values, and some None inputs. Then:
+
+    decied_ac           per room in a Python loop vs decide_ac_batch()
+    decide_hvac_status  per room in a Python loop vs decide_hvac_status_batch()
+
+Each batch result must match the scalar loop element for element
+(True / False / None), otherwise the script exits with an error. Scalar
+decide_hvac_status does not accept None, so it gets no missing inputs.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from OccupancyAnalyzer import decied_ac, decide_ac_batch, ac_decisions_to_list
+from ThermalLogic import decide_hvac_status, decide_hvac_status_batch
+
+THRESHOLDS = [17, 18, 20, 21, 22, 24, 25, 26, 27]
+
+
+def make_inputs(n, rng, allow_none):
+    def maybe_none(value):
+        return None if allow_none and rng.random() < 0.02 else value
+
+    temperature = [maybe_none(rng.choice(THRESHOLDS) if rng.random() < 0.3 else round(rng.uniform(10, 35), 1))
+                   for _ in range(n)]
+    capacity = [maybe_none(rng.choice((0, -5)) if rng.random() < 0.01 else rng.choice((30, 60, 100, 150, 300)))
+                for _ in range(n)]
+    people = [maybe_none(0 if rng.random() < 0.1 else rng.randrange(0, 330)) for _ in range(n)]
+    month = [rng.choice(range(0, 14)) for _ in range(n)]
+    return temperature, people, capacity, month
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def check(name, expected, actual):
+    mismatches = [i for i, (e, a) in enumerate(zip(expected, actual)) if e is not a and e != a]
+    if len(expected) != len(actual) or mismatches:
+        sys.exit(f"{name}: batch result differs from scalar at {len(mismatches)} rooms, e.g. index {mismatches[:5]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="best of N")
+    args = parser.parse_args()
+
+    rng = random.Random(2024)
+    print(f"{'function':<20}{'rooms':>9}{'scalar ms':>12}{'batch ms':>11}{'speedup':>9}")
+    for n in args.rooms:
+        temperature, people, capacity, month = make_inputs(n, rng, allow_none=True)
+        arrays = (np.array(temperature, dtype=np.float64), np.array(people, dtype=np.float64),
+                  np.array(capacity, dtype=np.float64), np.array(month))
+
+        scalar_s, expected = timed(lambda: [decied_ac(*row) for row in zip(temperature, people, capacity, month)],
+                                   args.repeat)
+        batch_s, codes = timed(lambda: decide_ac_batch(*arrays), args.repeat)
+        check("decied_ac", expected, ac_decisions_to_list(codes))
+        print(f"{'decied_ac':<20}{n:>9}{scalar_s * 1000:>12.1f}{batch_s * 1000:>11.2f}{scalar_s / batch_s:>8.0f}x")
+
+        temperature, people, capacity, _ = make_inputs(n, rng, allow_none=False)
+        arrays = (np.array(temperature), np.array(people), np.array(capacity))
+        scalar_s, expected = timed(lambda: [decide_hvac_status(*row) for row in zip(temperature, people, capacity)],
+                                   args.repeat)
+        batch_s, result = timed(lambda: decide_hvac_status_batch(*arrays), args.repeat)
+        check("decide_hvac_status", expected, result.tolist())
+        print(f"{'decide_hvac_status':<20}{n:>9}{scalar_s * 1000:>12.1f}{batch_s * 1000:>11.2f}"
+              f"{scalar_s / batch_s:>8.0f}x")
+
+    print("batch results identical to the scalar functions")
+
+
+if __name__ == "__main__":
+    main()
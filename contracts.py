@@ -187,21 +187,97 @@ class CatalogDevice(TypedDict, total=False):
 
     - id: string id, used to filter sensor_1 / actuator_1
     - type: "wifi" or "temperature" (controller filters by these)
+    - role: "sensor" or "actuator" (older registrations may omit it)
     - location.room: used to map topics by room_id
     - mqtt_topics.val: subscribe topic for sensor values
     - mqtt_topics.cmd: publish topic for actuator commands
     """
     id: str
     type: str
+    role: str
     location: CatalogDeviceLocation
     mqtt_topics: CatalogDeviceMqttTopics
 
 
-# Controller fetches:
-#   GET {catalog_base_url}/devices
-# and expects the response to be:
+# GET {catalog_base_url}/devices returns:
 CatalogDevicesResponse = List[CatalogDevice]
-# (If the HTTP response is a dict, controller wraps it into a list in runtime.)
+# (If the HTTP response is a dict, CatalogClient wraps it into a list in runtime.)
+
+
+# Controller builds its topic maps from the routing table:
+#   GET {catalog_base_url}/topics?room=&type=&role=&resource=   (all filters optional)
+class CatalogTopicRoute(TypedDict):
+    """index is the last part of the device id ({room}_{type}_{role}_{index})."""
+    room: str
+    type: str
+    role: Optional[str]
+    index: Optional[str]
+    resource: str  # key in mqtt_topics: "val" / "cmd" / "status"
+    device: str
+
+
+class CatalogTopicsResponse(TypedDict):
+    """revision can be passed as since= to /devices/_changes; ETag follows the devices collection."""
+    epoch: str
+    revision: int
+    topics: Dict[str, CatalogTopicRoute]
+
+
+# Optional query parameters on GET /devices and GET /users:
+#   fields=id,type,location.room,mqtt_topics   only return these fields ("." = nested field)
+#   limit=<n>&cursor=<id>                      page ordered by id (n <= 1000)
+# With limit or cursor the response is a page instead of a plain list;
+# pass next_cursor as cursor to get the next page (null = last page).
+class CatalogDevicesPage(TypedDict):
+    items: List[CatalogDevice]
+    next_cursor: Optional[str]
+
+
+# Batch lookup for many rooms in one round trip:
+#   POST {catalog_base_url}/devices/_query
+# Each list is a set of accepted values (IN); omitted / null = no filter.
+class CatalogDeviceQuery(TypedDict, total=False):
+    ids: List[str]
+    rooms: List[str]
+    types: List[str]
+    roles: List[str]
+    fields: str  # same as ?fields=
+
+
+class CatalogDeviceQueryResponse(TypedDict):
+    """rooms: room_id -> matching devices; every requested room is present (maybe empty)."""
+    revision: int
+    count: int
+    rooms: Dict[str, List[CatalogDevice]]
+
+
+# Controller.start_catalog_watch() long-polls:
+#   GET {catalog_base_url}/devices/_changes?since=<revision>&epoch=<epoch>&timeout=<s>
+
+class CatalogChangeEvent(TypedDict, total=False):
+    """
+    - op: "register" / "update" / "remove"
+    - doc: the device after the change (for "remove": the removed device)
+    - previous: the device before an "update"
+    """
+    revision: int
+    op: Literal["register", "update", "remove"]
+    collection: str
+    id: str
+    doc: CatalogDevice
+    previous: CatalogDevice
+
+
+class CatalogChangesResponse(TypedDict):
+    """
+    reset=True means the events since the given revision are no longer
+    available (or no revision was given): re-fetch /devices, then continue
+    from `revision`.
+    """
+    epoch: str
+    revision: int
+    reset: bool
+    events: List[CatalogChangeEvent]
 
 
 # ============================================================
@@ -23,10 +23,24 @@ st.write("Last refresh:", datetime.datetime.now())
 st.markdown("---")
 
 
+@st.cache_resource
+def catalog_cache():
+    # 跨刷新保存 {"etag": ..., "devices": ...}，配合 If-None-Match 使用
+    return {}
+
+
 try:
-    resp = requests.get(CATALOG_URL, timeout=5)
-    resp.raise_for_status()
-    devices = resp.json()
+    cache = catalog_cache()
+    headers = {"If-None-Match": cache["etag"]} if "etag" in cache else {}
+    resp = requests.get(CATALOG_URL, headers=headers, timeout=5)
+    if resp.status_code == 304:
+        devices = cache["devices"]
+    else:
+        resp.raise_for_status()
+        devices = resp.json()
+        if "ETag" in resp.headers:
+            cache["etag"] = resp.headers["ETag"]
+            cache["devices"] = devices
 except Exception as e:
     st.error(f"Cannot connect to Catalog: {e}")
     st.stop()
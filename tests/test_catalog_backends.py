@@ -0,0 +1,223 @@
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from Catalog import catalog_backends
+from Catalog.catalog_backends import (JsonWalBackend, SqliteBackend, empty_document, make_backend,
+                                      migrate_json_to_sqlite, read_json_document, write_json_document)
+from Catalog.catalog_store import CatalogStore
+
+
+def device(device_id, room="R1", **extra):
+    return dict({"id": device_id, "type": "temperature", "location": {"room": room}}, **extra)
+
+
+def document(*devices, **collections):
+    doc = empty_document()
+    doc["project_info"] = {"name": "test"}
+    doc["devices"] = list(devices)
+    doc.update(collections)
+    return doc
+
+
+def write_log(path, *lines):
+    """手写 WAL 文件：dict 按 JSON 一行写入，str 原样写入 (模拟只写了一半的行)。"""
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line if isinstance(line, str) else json.dumps(line) + "\n")
+
+
+def put(doc, collection="devices"):
+    return {"op": "put", "collection": collection, "doc": doc}
+
+
+def remove(item_id, collection="devices"):
+    return {"op": "remove", "collection": collection, "id": item_id}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog_script.json")
+
+
+def open_wal(path):
+    # 不让后台线程在测试中途合并日志
+    return CatalogStore(path, backend=JsonWalBackend(path, compact_interval=3600))
+
+
+def device_ids(store):
+    return [dev["id"] for dev in store.list("devices")]
+
+
+# ==========================================
+# persistence="wal"：启动时的崩溃恢复
+# ==========================================
+def test_wal_skips_torn_last_line(path):
+    write_json_document(path, document(device("A")))
+    write_log(path + ".wal", put(device("B")), '{"op": "put", "collection": "devices", "doc": {"id": "C"')
+
+    store = open_wal(path)
+    try:
+        assert device_ids(store) == ["A", "B"]
+        assert store.catalog["project_info"] == {"name": "test"}
+        # 恢复完立即写回 JSON 并清空日志
+        assert [dev["id"] for dev in read_json_document(path)["devices"]] == ["A", "B"]
+        assert os.path.getsize(path + ".wal") == 0
+    finally:
+        store.close()
+
+
+def test_wal_replays_rotated_log_before_current_log(path):
+    # 合并时崩溃：.wal.1 已经轮换出来但 JSON 还没写，之后的写入在新的 .wal 里
+    write_json_document(path, document(device("A"), device("B")))
+    write_log(path + ".wal.1", put(device("A", room="R2")), remove("B"), put(device("C", value=1)))
+    write_log(path + ".wal", put(device("C", value=2)), put(device("B", room="R3")))
+
+    store = open_wal(path)
+    try:
+        assert device_ids(store) == ["A", "C", "B"]
+        assert store.get("devices", "A")["location"]["room"] == "R2"
+        assert store.get("devices", "C")["value"] == 2
+        assert [dev["id"] for dev in store.find_devices(room="R3")] == ["B"]
+        assert not os.path.exists(path + ".wal.1")
+    finally:
+        store.close()
+
+
+def test_wal_replay_of_already_applied_entries_is_idempotent(path):
+    # JSON 已经写完但还没删掉 .wal.1：日志里的写入在 JSON 里都已经生效
+    write_json_document(path, document(device("A", value=2), device("B")))
+    write_log(path + ".wal.1",
+              put(device("A", value=1)),
+              {"op": "put_many", "collection": "devices", "docs": [device("B"), device("A", value=2)]},
+              put(device("C")),
+              remove("C"),
+              remove("C"),
+              put({"id": "u1", "name": "n", "role": "student"}, collection="users"))
+
+    store = open_wal(path)
+    try:
+        assert device_ids(store) == ["A", "B"]
+        assert store.get("devices", "A")["value"] == 2
+        assert [user["id"] for user in store.list("users")] == ["u1"]
+        assert [dev["id"] for dev in store.find_devices(room="R1")] == ["A", "B"]
+    finally:
+        store.close()
+
+
+def test_wal_checkpoint_appends_to_leftover_rotated_log(path, monkeypatch):
+    write_json_document(path, document())
+    store = open_wal(path)
+    store.put("devices", device("A"))
+
+    # 第一次合并写 JSON 失败：.wal.1 留下来
+    real_write = catalog_backends.write_json_document
+
+    def failing_write(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(catalog_backends, "write_json_document", failing_write)
+    with pytest.raises(OSError):
+        store.save()
+    assert os.path.exists(path + ".wal.1")
+
+    # 之后的写入进新的 .wal，下一次合并把它追加到 .wal.1 后面，不能覆盖
+    store.put("devices", device("B"))
+    store.remove("devices", "A")
+    monkeypatch.setattr(catalog_backends, "write_json_document", real_write)
+    store.save()
+    assert not os.path.exists(path + ".wal.1")
+    assert [dev["id"] for dev in read_json_document(path)["devices"]] == ["B"]
+    store.close()
+
+    reopened = open_wal(path)
+    try:
+        assert device_ids(reopened) == ["B"]
+    finally:
+        reopened.close()
+
+
+def test_wal_crash_before_checkpoint_keeps_all_writes(path):
+    write_json_document(path, document(device("A")))
+    store = open_wal(path)
+    store.put("devices", device("B"))
+    store.put_many("devices", [device("C"), device("D")])
+    store.remove("devices", "A")
+    # 模拟崩溃：不调用 close()，JSON 里还是旧内容，所有写入都只在日志里
+    store.backend._closed.set()
+    store.backend._wal.close()
+    assert [dev["id"] for dev in read_json_document(path)["devices"]] == ["A"]
+
+    reopened = open_wal(path)
+    try:
+        assert device_ids(reopened) == ["B", "C", "D"]
+    finally:
+        reopened.close()
+
+
+# ==========================================
+# persistence="sqlite"：第一次启动从 JSON 导入，手动迁移
+# ==========================================
+def test_sqlite_imports_json_on_first_start(path):
+    users = [{"id": "u1", "name": "n", "role": "student"}]
+    write_json_document(path, document(device("B"), device("A", room="R2"), users=users))
+
+    store = CatalogStore(path, backend=make_backend("sqlite", path))
+    try:
+        assert device_ids(store) == ["B", "A"]
+        assert [user["id"] for user in store.list("users")] == ["u1"]
+        assert store.catalog["project_info"] == {"name": "test"}
+        store.put("devices", device("C"))
+        store.remove("devices", "B")
+    finally:
+        store.close()
+
+    # 数据库不为空：不再从 JSON 导入 (JSON 里的 B 不会回来)
+    store = CatalogStore(path, backend=make_backend("sqlite", path))
+    try:
+        assert device_ids(store) == ["A", "C"]
+        assert [dev["id"] for dev in store.find_devices(room="R2")] == ["A"]
+    finally:
+        store.close()
+
+
+def test_sqlite_without_json_starts_empty(path):
+    store = CatalogStore(path, backend=make_backend("sqlite", path))
+    try:
+        assert store.list("devices") == []
+    finally:
+        store.close()
+    assert not os.path.exists(path)
+
+
+def test_migrate_json_to_sqlite(path, tmp_path):
+    db_path = str(tmp_path / "catalog.db")
+    write_json_document(path, document(device("A"), device("B", room="R2"),
+                                       services=[{"id": "mqtt", "service_type": "mqtt", "endpoint": {}}]))
+
+    assert migrate_json_to_sqlite(path, db_path) == 3
+    # 再迁移一次：同 id 的记录被覆盖，不会重复
+    assert migrate_json_to_sqlite(path, db_path) == 3
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT collection, id, room FROM documents ORDER BY rowid").fetchall()
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    finally:
+        conn.close()
+    assert rows == [("devices", "A", "R1"), ("devices", "B", "R2"), ("services", "mqtt", None)]
+    assert json.loads(meta["project_info"]) == {"name": "test"}
+
+    backend = SqliteBackend(db_path)
+    try:
+        loaded, pending = backend.load()
+    finally:
+        backend.conn.close()
+    assert pending == []
+    assert [dev["id"] for dev in loaded["devices"]] == ["A", "B"]
+    assert loaded["project_info"] == {"name": "test"}
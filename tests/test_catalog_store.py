@@ -0,0 +1,218 @@
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from Catalog.catalog_backends import StorageBackend, empty_document
+from Catalog.catalog_store import CatalogStore
+
+
+class FailingBackend(StorageBackend):
+    """fail = True 时每次 write 都抛出 OSError (磁盘满 / 只读等)。"""
+    name = "failing"
+
+    def __init__(self):
+        super().__init__()
+        self.fail = False
+        self.writes = 0
+
+    def load(self):
+        return empty_document(), []
+
+    def write(self, entry, version):
+        if self.fail:
+            raise OSError("disk full")
+        self.writes += 1
+
+
+def device(device_id="R1_temperature_sensor_1", ttl=None, room="R1"):
+    dev = {"id": device_id, "type": "temperature", "location": {"room": room},
+           "mqtt_topics": {"val": f"polito/smartcampus/{room}/temperature/1/value"}}
+    if ttl is not None:
+        dev["ttl"] = ttl
+    return dev
+
+
+@pytest.fixture
+def store():
+    backend = FailingBackend()
+    store = CatalogStore("unused.json", backend=backend)
+    yield store
+    store.close()
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+# ==========================================
+# 落盘失败时租约表和 catalog 保持一致
+# ==========================================
+def test_failed_put_leaves_no_lease(store):
+    store.backend.fail = True
+    with pytest.raises(OSError):
+        store.put("devices", device(ttl=60))
+    assert store.get("devices", "R1_temperature_sensor_1") is None
+    assert store.lease_count() == 0
+    assert store.revision == 0
+
+
+def test_failed_put_many_leaves_no_lease(store):
+    store.backend.fail = True
+    with pytest.raises(OSError):
+        store.put_many("devices", [device(ttl=60), device("R2_temperature_sensor_1", ttl=60, room="R2")])
+    assert store.list("devices") == []
+    assert store.lease_count() == 0
+
+
+def test_failed_update_keeps_previous_lease(store):
+    store.put("devices", device(ttl=60))
+    store.backend.fail = True
+    # 去掉 ttl 的更新没有落盘，原来的租约不能被删掉
+    with pytest.raises(OSError):
+        store.put("devices", device())
+    assert store.get("devices", "R1_temperature_sensor_1")["ttl"] == 60
+    assert store.heartbeat("R1_temperature_sensor_1")["ttl"] == 60
+
+
+def test_failed_remove_keeps_lease(store):
+    store.put("devices", device(ttl=60))
+    store.backend.fail = True
+    with pytest.raises(OSError):
+        store.remove("devices", "R1_temperature_sensor_1")
+    assert store.get("devices", "R1_temperature_sensor_1") is not None
+    assert store.lease_count() == 1
+    assert store.heartbeat("R1_temperature_sensor_1")["ttl"] == 60
+
+
+def test_successful_writes_update_leases(store):
+    store.put("devices", device(ttl=60))
+    assert store.lease_count() == 1
+    store.put("devices", device())
+    assert store.lease_count() == 0
+    assert store.heartbeat("R1_temperature_sensor_1")["ttl"] is None
+    store.put("devices", device(ttl=60))
+    store.remove("devices", "R1_temperature_sensor_1")
+    assert store.lease_count() == 0
+
+
+def test_failed_expiry_keeps_device_tracked(store):
+    store.EXPIRY_RETRY = 0.05
+    store.put("devices", device(ttl=0.05))
+    store.backend.fail = True
+    time.sleep(0.2)
+    # 删除没有落盘：设备还在，租约也还在，心跳仍然有效
+    assert store.get("devices", "R1_temperature_sensor_1") is not None
+    assert store.expired_count == 0
+    assert store.heartbeat("R1_temperature_sensor_1")["ttl"] == 0.05
+
+    # 后端恢复后，下一次重试把设备删掉
+    store.backend.fail = False
+    assert wait_until(lambda: store.get("devices", "R1_temperature_sensor_1") is None)
+    assert store.expired_count == 1
+    assert store.lease_count() == 0
+
+
+# ==========================================
+# 重复的查询参数 (?room=R1&room=R2) 解析成 list，按 IN 过滤
+# ==========================================
+def test_find_devices_with_lists(store):
+    store.put_many("devices", [device("R1_temperature_sensor_1", room="R1"),
+                               device("R2_temperature_sensor_1", room="R2"),
+                               device("R3_temperature_sensor_1", room="R3")])
+
+    def ids(devices):
+        return [dev["id"] for dev in devices]
+
+    assert ids(store.find_devices(room=["R1", "R2"])) == ["R1_temperature_sensor_1", "R2_temperature_sensor_1"]
+    assert ids(store.find_devices(room=["R1", "R2"], device_type="temperature")) == \
+        ["R1_temperature_sensor_1", "R2_temperature_sensor_1"]
+    assert ids(store.find_devices(room="R3", device_type=["wifi", "temperature"])) == ["R3_temperature_sensor_1"]
+    assert ids(store.find_devices(device_id=["R3_temperature_sensor_1", "missing"], room="R3")) == \
+        ["R3_temperature_sensor_1"]
+    assert store.find_devices(room=["R9"]) == []
+    assert store.find_devices(room=[]) == []
+
+
+def test_devices_api_repeated_query_params(store):
+    from Catalog.Catalog_manage import DevicesAPI
+
+    store.put_many("devices", [device("R1_temperature_sensor_1", room="R1"),
+                               device("R2_temperature_sensor_1", room="R2")])
+    api = DevicesAPI(store)
+    assert [dev["id"] for dev in api._query((), {"room": ["R2", "R1"]})] == \
+        ["R2_temperature_sensor_1", "R1_temperature_sensor_1"]
+    assert api._query((), {"room": ["R1", "R1"], "type": ["wifi"]}) == []
+
+
+def test_topic_routes_with_lists(store):
+    store.put_many("devices", [device("R1_temperature_sensor_1", room="R1"),
+                               device("R2_temperature_sensor_1", room="R2"),
+                               device("R3_temperature_sensor_1", room="R3")])
+    _, table = store.topic_routes(room=["R1", "R3"], device_type=["temperature", "wifi"])
+    assert sorted(route["room"] for route in table.values()) == ["R1", "R3"]
+    _, table = store.topic_routes(room="R2", role="sensor")
+    assert [route["device"] for route in table.values()] == ["R2_temperature_sensor_1"]
+    assert store.topic_routes(room=["R9"])[1] == {}
+    assert store.topic_routes(resource=["cmd"])[1] == {}
+
+
+# ==========================================
+# 分页：按 id 排序，cursor 之后的一页
+# ==========================================
+def walk_pages(api, params, limit):
+    ids, cursor = [], None
+    while True:
+        page = api._query((), dict(params, limit=str(limit), **({"cursor": cursor} if cursor else {})))
+        ids.extend(dev["id"] for dev in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_devices_pagination_uses_sorted_index(store):
+    from Catalog.Catalog_manage import DevicesAPI
+
+    rooms = ["R1", "R2", "R3"]
+    devices = [device(f"{room}_{kind}_sensor_{i}", room=room) for i in range(7, 0, -1)
+               for room in rooms for kind in ("temperature", "wifi")]
+    for dev in devices:
+        dev["type"] = dev["id"].split("_")[1]
+    store.put_many("devices", devices)
+    api = DevicesAPI(store)
+
+    assert walk_pages(api, {}, 4) == sorted(dev["id"] for dev in devices)
+    assert walk_pages(api, {"room": "R2"}, 3) == sorted(d["id"] for d in devices if d["location"]["room"] == "R2")
+    assert walk_pages(api, {"room": "R2", "type": "wifi"}, 2) == \
+        sorted(d["id"] for d in devices if d["id"].startswith("R2_wifi"))
+    assert walk_pages(api, {"type": "wifi"}, 5) == sorted(d["id"] for d in devices if "_wifi_" in d["id"])
+    assert walk_pages(api, {"room": ["R1", "R3"]}, 5) == \
+        sorted(d["id"] for d in devices if d["location"]["room"] in ("R1", "R3"))
+    assert api._query((), {"room": "R9", "limit": "5"}) == {"items": [], "next_cursor": None}
+    page = api._query((), {"limit": "2", "fields": "id"})
+    assert page["items"] == [{"id": "R1_temperature_sensor_1"}, {"id": "R1_temperature_sensor_2"}]
+
+    # 翻页之间注册 / 删除的设备不影响 cursor 之后的位置
+    first = api._query((), {"limit": "3"})
+    store.remove("devices", "R1_temperature_sensor_1")
+    store.put("devices", device("R0_temperature_sensor_1", room="R0"))
+    second = api._query((), {"limit": "3", "cursor": first["next_cursor"]})
+    assert second["items"][0]["id"] == "R1_temperature_sensor_4"
+
+
+def test_sorted_listing_is_built_once_per_version(store):
+    store.put_many("devices", [device(f"R1_temperature_sensor_{i}") for i in range(5)])
+    assert store.sorted_listing("devices") is store.sorted_listing("devices")
+    before = store.sorted_listing("devices")
+    store.put("devices", device("R1_temperature_sensor_9"))
+    after = store.sorted_listing("devices")
+    assert after is not before and after[1][-1] == "R1_temperature_sensor_9"
+    assert store.sorted_listing("devices", room=["R1"]) is None
@@ -0,0 +1,190 @@
+import gzip
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from Catalog.content_codec import (GZIP_MIN_BYTES, JSON_MIME, MSGPACK_MIME, decode, encode, msgpack_dumps,
+                                   msgpack_loads, variant_etag)
+
+
+def roundtrip(obj, expected):
+    data = msgpack_dumps(obj)
+    assert data == expected
+    assert msgpack_loads(data) == obj
+
+
+# ==========================================
+# MessagePack：按规范 (spec.md) 的字节序列检查每种长度 / 宽度的边界
+# ==========================================
+@pytest.mark.parametrize("value, expected", [
+    (0, b"\x00"),
+    (127, b"\x7f"),
+    (128, b"\xcc\x80"),
+    (255, b"\xcc\xff"),
+    (256, b"\xcd\x01\x00"),
+    (0xFFFF, b"\xcd\xff\xff"),
+    (0x10000, b"\xce\x00\x01\x00\x00"),
+    (0xFFFFFFFF, b"\xce\xff\xff\xff\xff"),
+    (0x100000000, b"\xcf\x00\x00\x00\x01\x00\x00\x00\x00"),
+    (0xFFFFFFFFFFFFFFFF, b"\xcf" + b"\xff" * 8),
+    (-1, b"\xff"),
+    (-32, b"\xe0"),
+    (-33, b"\xd0\xdf"),
+    (-128, b"\xd0\x80"),
+    (-129, b"\xd1\xff\x7f"),
+    (-0x8000, b"\xd1\x80\x00"),
+    (-0x8001, b"\xd2\xff\xff\x7f\xff"),
+    (-0x80000000, b"\xd2\x80\x00\x00\x00"),
+    (-0x80000001, b"\xd3\xff\xff\xff\xff\x7f\xff\xff\xff"),
+    (-0x8000000000000000, b"\xd3\x80" + b"\x00" * 7),
+])
+def test_int_widths(value, expected):
+    roundtrip(value, expected)
+
+
+@pytest.mark.parametrize("value", [0x10000000000000000, -0x8000000000000001])
+def test_int_out_of_range(value):
+    with pytest.raises(OverflowError):
+        msgpack_dumps(value)
+
+
+def test_nil_bool_float():
+    roundtrip(None, b"\xc0")
+    roundtrip(False, b"\xc2")
+    roundtrip(True, b"\xc3")
+    roundtrip(1.5, b"\xcb\x3f\xf8\x00\x00\x00\x00\x00\x00")
+    roundtrip(-0.25, b"\xcb\xbf\xd0\x00\x00\x00\x00\x00\x00")
+    # float32 只需要能解码 (其他实现可能会发送)
+    assert msgpack_loads(b"\xca\x3f\xc0\x00\x00") == 1.5
+
+
+@pytest.mark.parametrize("length, header", [
+    (0, b"\xa0"),
+    (31, b"\xbf"),
+    (32, b"\xd9\x20"),
+    (255, b"\xd9\xff"),
+    (256, b"\xda\x01\x00"),
+    (0xFFFF, b"\xda\xff\xff"),
+    (0x10000, b"\xdb\x00\x01\x00\x00"),
+])
+def test_str_lengths(length, header):
+    value = "x" * length
+    roundtrip(value, header + value.encode())
+
+
+def test_str_length_counts_utf8_bytes():
+    # 16 个字符，32 个字节：用 str 8 而不是 fixstr
+    value = "é" * 16
+    roundtrip(value, b"\xd9\x20" + value.encode("utf-8"))
+    roundtrip("温度", b"\xa6" + "温度".encode("utf-8"))
+
+
+@pytest.mark.parametrize("length, header", [
+    (0, b"\xc4\x00"),
+    (255, b"\xc4\xff"),
+    (256, b"\xc5\x01\x00"),
+    (0x10000, b"\xc6\x00\x01\x00\x00"),
+])
+def test_bin_lengths(length, header):
+    value = b"\x01" * length
+    roundtrip(value, header + value)
+    assert msgpack_dumps(bytearray(value)) == header + value
+
+
+@pytest.mark.parametrize("length, header", [
+    (0, b"\x90"),
+    (15, b"\x9f"),
+    (16, b"\xdc\x00\x10"),
+    (0x10000, b"\xdd\x00\x01\x00\x00"),
+])
+def test_array_lengths(length, header):
+    roundtrip([None] * length, header + b"\xc0" * length)
+
+
+@pytest.mark.parametrize("length, header", [
+    (0, b"\x80"),
+    (15, b"\x8f"),
+    (16, b"\xde\x00\x10"),
+    (0x10000, b"\xdf\x00\x01\x00\x00"),
+])
+def test_map_lengths(length, header):
+    value = {i: None for i in range(length)}
+    assert msgpack_dumps(value) == header + b"".join(msgpack_dumps(i) + b"\xc0" for i in range(length))
+    assert msgpack_loads(msgpack_dumps(value)) == value
+
+
+def test_nested_maps():
+    roundtrip({"a": {"b": [1, {"c": None}]}},
+              b"\x81\xa1a\x81\xa1b\x92\x01\x81\xa1c\xc0")
+    # tuple 按 array 编码
+    assert msgpack_dumps((1, 2)) == b"\x92\x01\x02"
+
+
+def test_catalog_document_roundtrip():
+    devices = [{"id": f"R{i}_temperature_sensor_1", "type": "temperature", "ttl": 30.5, "enabled": i % 2 == 0,
+                "location": {"campus": "polito", "building": "B", "floor": i, "room": f"R{i}"},
+                "mqtt_topics": {"val": f"polito/smartcampus/R{i}/temperature/1/value"}, "note": None}
+               for i in range(300)]
+    doc = {"revision": 2 ** 40, "items": devices, "next_cursor": None}
+    assert msgpack_loads(msgpack_dumps(doc)) == json.loads(json.dumps(doc))
+
+
+def test_invalid_input():
+    with pytest.raises(TypeError):
+        msgpack_dumps({1, 2})
+    with pytest.raises(ValueError):
+        msgpack_loads(b"\xc0\xc0")
+    with pytest.raises(ValueError):
+        msgpack_loads(b"\xc1")
+
+
+def test_matches_reference_implementation():
+    msgpack = pytest.importorskip("msgpack")
+    values = [0, 127, 128, 255, 256, 0xFFFF, 0x10000, 0xFFFFFFFF, 0x100000000, -1, -32, -33, -128, -129,
+              -0x8000, -0x8001, -0x80000000, -0x80000001, 1.5, None, True, False,
+              "", "x" * 31, "x" * 32, "x" * 256, "x" * 0x10000, b"", b"\x00" * 256,
+              [None] * 16, {str(i): i for i in range(16)}, {"a": {"b": [1, {"c": None}]}}]
+    for value in values:
+        assert msgpack_dumps(value) == msgpack.packb(value, use_bin_type=True)
+        assert msgpack_loads(msgpack.packb(value, use_bin_type=True)) == value
+        assert msgpack.unpackb(msgpack_dumps(value), raw=False, strict_map_key=False) == value
+
+
+# ==========================================
+# encode / decode：gzip 阈值和 ETag 后缀
+# ==========================================
+@pytest.mark.parametrize("media, overhead", [
+    # json.dumps("xx...") 多两个引号；msgpack str 16 多 3 个字节的头
+    (JSON_MIME, 2),
+    (MSGPACK_MIME, 3),
+])
+def test_gzip_threshold(media, overhead):
+    below = "x" * (GZIP_MIN_BYTES - overhead - 1)
+    at = "x" * (GZIP_MIN_BYTES - overhead)
+
+    body, headers = encode(below, (media, "gzip"))
+    assert len(body) == GZIP_MIN_BYTES - 1
+    assert "Content-Encoding" not in headers
+    assert decode(body, headers["Content-Type"]) == below
+    assert variant_etag('"e-1"', (media, "gzip"), headers) == ('"e-1-mp"' if media == MSGPACK_MIME else '"e-1"')
+
+    body, headers = encode(at, (media, "gzip"))
+    assert headers["Content-Encoding"] == "gzip"
+    assert len(gzip.decompress(body)) == GZIP_MIN_BYTES
+    assert decode(body, headers["Content-Type"], headers["Content-Encoding"]) == at
+    assert variant_etag('"e-1"', (media, "gzip"), headers) == ('"e-1-mp-gz"' if media == MSGPACK_MIME else '"e-1-gz"')
+
+    # 没有 Accept-Encoding: gzip 时再大也不压缩
+    body, headers = encode(at * 4, (media, None))
+    assert "Content-Encoding" not in headers
+    assert decode(body, headers["Content-Type"]) == at * 4
+
+
+def test_gzip_output_is_deterministic():
+    # mtime=0：同一个内容两次编码结果相同 (ETag 对应的字节不变)
+    obj = {"items": ["x" * 100] * 50}
+    assert encode(obj, (JSON_MIME, "gzip"))[0] == encode(obj, (JSON_MIME, "gzip"))[0]
@@ -0,0 +1,206 @@
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+import OccupancyAnalyzer
+from OccupancyAnalyzer import (AC_NO_CHANGE, AC_OFF, AC_ON, COOL_MONTHS, HEAT_MONTHS, OCCUPANCY_THRESHOLD,
+                               SUMMER_LOWER, SUMMER_UPPER, WINTER_LOWER, WINTER_UPPER,
+                               ac_decisions_to_list, decide_ac_batch, decied_ac)
+from ThermalLogic import decide_hvac_status, decide_hvac_status_batch
+
+NAN = float("nan")
+CAPACITY = 100
+# 上座率刚好等于阈值 (不算 high) 和刚超过阈值
+LOW_PEOPLE = OCCUPANCY_THRESHOLD * CAPACITY
+HIGH_PEOPLE = LOW_PEOPLE + 1
+
+
+def batch(temperature, people, capacity, month):
+    return ac_decisions_to_list(decide_ac_batch(
+        np.array(temperature, dtype=np.float64), np.array(people, dtype=np.float64),
+        np.array(capacity, dtype=np.float64), np.array(month)))
+
+
+# ==========================================
+# decide_ac_batch vs decied_ac
+# ==========================================
+@pytest.mark.parametrize("people, temperature, expected", [
+    # 制冷，上座率不高：>= SUMMER_UPPER 开，<= SUMMER_LOWER 关，中间不变
+    (LOW_PEOPLE, SUMMER_UPPER, True),
+    (LOW_PEOPLE, SUMMER_UPPER - 0.1, None),
+    (LOW_PEOPLE, SUMMER_LOWER + 0.1, None),
+    (LOW_PEOPLE, SUMMER_LOWER, False),
+    # 制冷，上座率高：阈值是 SUMMER_UPPER - 1 / SUMMER_UPPER - 2
+    (HIGH_PEOPLE, SUMMER_UPPER - 1, True),
+    (HIGH_PEOPLE, SUMMER_UPPER - 1.1, None),
+    (HIGH_PEOPLE, SUMMER_UPPER - 2, False),
+])
+def test_cool_thresholds(people, temperature, expected):
+    for month in COOL_MONTHS:
+        assert decied_ac(temperature, people, CAPACITY, month) is expected
+        assert batch([temperature], [people], [CAPACITY], [month]) == [expected]
+
+
+@pytest.mark.parametrize("people, temperature, expected", [
+    (LOW_PEOPLE, WINTER_LOWER, True),
+    (LOW_PEOPLE, WINTER_LOWER + 0.1, None),
+    (LOW_PEOPLE, WINTER_UPPER - 0.1, None),
+    (LOW_PEOPLE, WINTER_UPPER, False),
+    (HIGH_PEOPLE, WINTER_LOWER + 1, True),
+    (HIGH_PEOPLE, WINTER_LOWER + 1.1, None),
+    (HIGH_PEOPLE, WINTER_LOWER + 2, False),
+])
+def test_heat_thresholds(people, temperature, expected):
+    for month in HEAT_MONTHS:
+        assert decied_ac(temperature, people, CAPACITY, month) is expected
+        assert batch([temperature], [people], [CAPACITY], [month]) == [expected]
+
+
+@pytest.mark.parametrize("month", [9, 10, 0, 13])
+def test_no_mode_months(month):
+    for temperature in (10, WINTER_LOWER, SUMMER_UPPER, 35):
+        assert decied_ac(temperature, LOW_PEOPLE, CAPACITY, month) is None
+        assert batch([temperature], [LOW_PEOPLE], [CAPACITY], [month]) == [None]
+
+
+@pytest.mark.parametrize("temperature, people, capacity", [
+    (None, 50, CAPACITY),
+    (NAN, 50, CAPACITY),
+    (22, None, CAPACITY),
+    (22, NAN, CAPACITY),
+    (22, 50, None),
+    (22, 50, 0),
+    (22, 50, -5),
+    # 没有温度时即使没人也不做决定
+    (None, 0, CAPACITY),
+    (NAN, 0, CAPACITY),
+])
+def test_missing_inputs(temperature, people, capacity):
+    for month in (1, 7):
+        assert decied_ac(temperature, people, capacity, month) is None
+        assert batch([temperature], [people], [capacity], [month]) == [None]
+
+
+def test_empty_room_turns_off():
+    for month in range(0, 14):
+        assert decied_ac(SUMMER_UPPER + 5, 0, CAPACITY, month) is False
+        assert batch([SUMMER_UPPER + 5], [0], [CAPACITY], [month]) == [False]
+
+
+def test_batch_matches_scalar_grid():
+    temperatures = [None, NAN, 17, 18, 20, 20.5, 21, 21.5, 22, 23, 24, 24.5, 25, 25.5, 26, 30]
+    people = [None, 0, 1, LOW_PEOPLE, HIGH_PEOPLE, 150]
+    capacities = [None, -5, 0, CAPACITY]
+    rows = [(t, p, c, m) for t in temperatures for p in people for c in capacities for m in range(0, 14)]
+    expected = [decied_ac(*row) for row in rows]
+    assert batch(*zip(*rows)) == expected
+    # month 是标量时广播
+    scalar_month = [row for row in rows if row[3] == 7]
+    assert batch(*list(zip(*scalar_month))[:3], 7) == [decied_ac(*row) for row in scalar_month]
+
+
+def test_batch_codes():
+    codes = decide_ac_batch([SUMMER_UPPER, SUMMER_LOWER, NAN], [50, 50, 50], [CAPACITY] * 3, 7)
+    assert codes.dtype == np.int8
+    assert codes.tolist() == [AC_ON, AC_OFF, AC_NO_CHANGE]
+
+
+def test_batch_empty():
+    codes = decide_ac_batch(np.array([], dtype=np.float64), np.array([], dtype=np.float64),
+                            np.array([], dtype=np.float64), 7)
+    assert codes.shape == (0,)
+    assert ac_decisions_to_list(codes) == []
+
+
+# ==========================================
+# decide_hvac_status_batch vs decide_hvac_status
+# ==========================================
+@pytest.mark.parametrize("temperature, occupancy, capacity, expected", [
+    (30, 0, CAPACITY, False),
+    (26, 10, CAPACITY, False),
+    (26.1, 10, CAPACITY, True),
+    (18, 10, CAPACITY, False),
+    (17.9, 10, CAPACITY, True),
+    (22, 80, CAPACITY, False),
+    (22, 81, CAPACITY, True),
+    (22, 10, 0, False),
+    (22, 10, -5, False),
+    (30, 10, 0, True),
+])
+def test_hvac_status_boundaries(temperature, occupancy, capacity, expected):
+    assert decide_hvac_status(temperature, occupancy, capacity) is expected
+    assert decide_hvac_status_batch([temperature], [occupancy], [capacity]).tolist() == [expected]
+
+
+def test_hvac_status_batch_matches_scalar_grid():
+    rows = [(t, o, c) for t in (10, 17.9, 18, 22, 26, 26.1, 35)
+            for o in (0, 1, 50, 80, 81, 120) for c in (-5, 0, 60, CAPACITY)]
+    result = decide_hvac_status_batch(*(np.array(column) for column in zip(*rows)))
+    assert result.dtype == np.bool_
+    assert result.tolist() == [decide_hvac_status(*row) for row in rows]
+    assert decide_hvac_status_batch([], [], []).tolist() == []
+
+
+# ==========================================
+# deciede_ac_from_room_info：房间配置 + 快照 -> 决策
+# ==========================================
+# 1 月 (制热)，UTC 10:20
+TIMESTAMP = datetime(2025, 1, 15, 10, 20, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def rooms(tmp_path, monkeypatch):
+    config = {"rooms": [{"room_id": room_id, "building": "B", "type": "Aula", "capacity": CAPACITY, "floor": "1"}
+                        for room_id in ("R1", "R2", "R3", "R4")]}
+    (tmp_path / "setting_config.json").write_text(json.dumps(config), encoding="utf-8")
+    (tmp_path / "schedule.json").write_text(json.dumps({"1": ["R1"], "2": ["R2"]}), encoding="utf-8")
+    monkeypatch.setattr(OccupancyAnalyzer, "ROOM_CONFIG_PATH", str(tmp_path / "setting_config.json"))
+    monkeypatch.setattr(OccupancyAnalyzer, "SCHEDULE_PATH", str(tmp_path / "schedule.json"))
+    return [room["room_id"] for room in config["rooms"]]
+
+
+def reading(value):
+    return {"1": {"value": value, "received_at": TIMESTAMP}}
+
+
+def snapshot():
+    return {
+        "R1": {"temperature": reading(WINTER_LOWER), "wifi": reading(LOW_PEOPLE)},  # 开
+        "R2": {"temperature": reading(WINTER_UPPER), "wifi": reading(LOW_PEOPLE)},  # 关
+        "R3": {"temperature": reading(NAN), "wifi": reading(LOW_PEOPLE)},           # 温度 NaN
+        "R4": {"wifi": reading(0)},                                                  # 没有温度
+    }
+
+
+def decisions(room_ids=None):
+    result = OccupancyAnalyzer.deciede_ac_from_room_info(TIMESTAMP, snapshot(), room_ids)
+    return {room_id: decision["should_on"] for room_id, decision in result.items()}
+
+
+def test_room_info_all_rooms(rooms):
+    assert decisions() == {"R1": True, "R2": False, "R3": None, "R4": None}
+
+
+def test_room_info_room_ids_filter(rooms):
+    assert decisions({"R2", "R3"}) == {"R2": False, "R3": None}
+    # 配置里没有的房间被忽略
+    assert decisions({"R1", "R9"}) == {"R1": True}
+
+
+def test_room_info_empty_room_set(rooms):
+    assert decisions(set()) == {}
+    assert decisions({"R9"}) == {}
+
+
+def test_room_info_matches_scalar(rooms):
+    month = OccupancyAnalyzer.parse_timestamp(TIMESTAMP)["month"]
+    for room_id, should_on in decisions().items():
+        temperature = OccupancyAnalyzer.pick_latest_value(snapshot(), room_id, "temperature")
+        people = OccupancyAnalyzer.pick_latest_value(snapshot(), room_id, "wifi")
+        assert should_on is decied_ac(temperature, people, CAPACITY, month), room_id